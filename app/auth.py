@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+from fastapi import HTTPException, status
+
+# Si se configura el ID de la aplicación, los tokens se validan localmente
+# contra las claves públicas de Microsoft; si no, se validan llamando a Graph.
+MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
+MICROSOFT_TENANT_ID = os.getenv("MICROSOFT_TENANT_ID", "common")
+MICROSOFT_JWKS_URL = os.getenv(
+    "MICROSOFT_JWKS_URL",
+    f"https://login.microsoftonline.com/{MICROSOFT_TENANT_ID}/discovery/v2.0/keys",
+)
+MICROSOFT_GRAPH_URL = os.getenv(
+    "MICROSOFT_GRAPH_URL", "https://graph.microsoft.com/v1.0/me"
+)
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+# Tiempo mínimo entre dos descargas del JWKS provocadas por un `kid` desconocido.
+JWKS_MIN_REFRESH_INTERVAL = 60
+TOKEN_ALGORITHMS = ["RS256"]
+TOKEN_LEEWAY = 60
+HTTP_TIMEOUT = 10
+
+# Cliente compartido: reutiliza conexiones entre peticiones. Se crea al
+# usarlo por primera vez y se descarta al apagar la aplicación, así que cada
+# arranque (varios ciclos de vida en el mismo proceso) usa uno nuevo.
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+    return _http_client
+
+
+def _authentication_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Authentication failed"
+    )
+
+
+class JwksCache:
+    """
+    Conjunto de claves públicas (JWKS) descargado y cacheado en memoria.
+
+    - **url**: URL del documento JWKS.
+    - **ttl**: Segundos que se reutiliza el JWKS antes de volver a descargarlo.
+
+    Si llega un token firmado con una clave desconocida (rotación de claves),
+    el JWKS se vuelve a descargar, como mucho una vez cada
+    `JWKS_MIN_REFRESH_INTERVAL` segundos.
+    """
+
+    def __init__(self, url: str, ttl: int):
+        self.url = url
+        self.ttl = ttl
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return (
+            self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl
+        )
+
+    def _can_refresh_early(self) -> bool:
+        return (
+            self._fetched_at is None
+            or time.monotonic() - self._fetched_at > JWKS_MIN_REFRESH_INTERVAL
+        )
+
+    async def _refresh(self) -> None:
+        response = await get_http_client().get(self.url)
+        response.raise_for_status()
+        keys = {}
+        for data in response.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(data)
+            except jwt.PyJWTError:
+                continue
+            if key.key_id:
+                keys[key.key_id] = key
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str) -> jwt.PyJWK:
+        """
+        Retorna la clave pública con el identificador `kid`.
+
+        Lanza una excepción HTTP 400 si la clave no existe.
+        """
+        if not self._is_stale() and kid in self._keys:
+            return self._keys[kid]
+
+        async with self._lock:
+            # Otra petición pudo haber refrescado el JWKS mientras se esperaba.
+            if self._is_stale() or (
+                kid not in self._keys and self._can_refresh_early()
+            ):
+                try:
+                    await self._refresh()
+                except (httpx.HTTPError, ValueError):
+                    # Sin conexión se siguen usando las claves que ya se tenían.
+                    if not self._keys:
+                        raise _authentication_failed()
+
+        if kid not in self._keys:
+            raise _authentication_failed()
+        return self._keys[kid]
+
+
+jwks_cache = JwksCache(MICROSOFT_JWKS_URL, JWKS_CACHE_TTL)
+
+
+def offline_validation_enabled() -> bool:
+    return bool(MICROSOFT_CLIENT_ID)
+
+
+def _valid_issuer(claims: Dict[str, Any]) -> bool:
+    tenant_id = claims.get("tid")
+    if MICROSOFT_TENANT_ID not in ("common", "organizations") and (
+        tenant_id != MICROSOFT_TENANT_ID
+    ):
+        return False
+    return claims.get("iss") in (
+        f"https://login.microsoftonline.com/{tenant_id}/v2.0",
+        f"https://sts.windows.net/{tenant_id}/",
+    )
+
+
+async def validate_microsoft_token(token: str) -> Dict[str, Any]:
+    """
+    Valida localmente un token de Microsoft y retorna sus claims.
+
+    Comprueba la firma contra el JWKS cacheado, la expiración, la audiencia
+    (`MICROSOFT_CLIENT_ID`) y el emisor. El token debe haber sido emitido para
+    esta aplicación: los tokens de acceso de Graph no se pueden validar fuera
+    de Graph.
+
+    Lanza una excepción HTTP 400 si el token no es válido.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        raise _authentication_failed()
+    if header.get("alg") not in TOKEN_ALGORITHMS or not header.get("kid"):
+        raise _authentication_failed()
+
+    key = await jwks_cache.get_key(header["kid"])
+    try:
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=TOKEN_ALGORITHMS,
+            audience=MICROSOFT_CLIENT_ID,
+            leeway=TOKEN_LEEWAY,
+            options={"require": ["exp", "iss", "aud", "oid"]},
+        )
+    except jwt.PyJWTError:
+        raise _authentication_failed()
+
+    if not _valid_issuer(claims):
+        raise _authentication_failed()
+    return claims
+
+
+async def fetch_microsoft_profile(token: str) -> Dict[str, Any]:
+    """
+    Obtiene el perfil del usuario desde Microsoft Graph (`/me`).
+
+    Lanza `httpx.HTTPError` si Graph rechaza el token o no responde.
+    """
+    response = await get_http_client().get(
+        MICROSOFT_GRAPH_URL, headers={"Authorization": f"Bearer {token}"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
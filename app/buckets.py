@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func
+
+from app.models.records import Records
+from app.schemas.records import BucketWidth
+
+BUCKET_FORMATS = {
+    BucketWidth.minute: ("%Y-%m-%d %H:%M:00",),
+    BucketWidth.hour: ("%Y-%m-%d %H:00:00",),
+    BucketWidth.day: ("%Y-%m-%d 00:00:00",),
+    BucketWidth.week: ("%Y-%m-%d 00:00:00", "-6 days", "weekday 1"),
+    BucketWidth.month: ("%Y-%m-01 00:00:00",),
+}
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Normaliza una fecha a UTC sin zona horaria, que es como SQLite guarda
+    `Records.created_at`. Las fechas sin zona se asumen ya en UTC.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_expression(column, bucket: BucketWidth):
+    """
+    Expresión SQL que trunca `column` al inicio de su bucket.
+
+    Las semanas comienzan el lunes.
+    """
+    fmt, *modifiers = BUCKET_FORMATS[bucket]
+    return func.strftime(fmt, column, *modifiers)
+
+
+def truncate_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def sample_count():
+    """
+    Número de registros originales, contando los compactados.
+    """
+    return func.sum(Records.sample_count)
+
+
+def sample_sum():
+    """
+    Suma de los valores originales, contando los compactados.
+    """
+    # total() siempre es real: value puede guardarse como entero.
+    return func.total(Records.value * Records.sample_count)
+
+
+def sample_avg():
+    """
+    Promedio de los valores originales, contando los compactados.
+    """
+    return sample_sum() / sample_count()
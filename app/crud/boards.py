@@ -1,16 +1,20 @@
-from typing import List
+from typing import Iterable, List, Set
 import uuid
 from app.models.boards import Board
 from app.models.dboards import DBoards
 from app.models.dashboards import Dashboard
 from app.models.users import User
-from sqlmodel import Session, select
+from sqlalchemy import delete, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
 
-from app.schemas.boards import BoardCreate, BoardCreateUsers
+from app.crud.stats import get_stats
+from app.loaders import BOARD_READ
+from app.schemas.boards import BoardCreate, BoardCreateUsers, BoardMembersDelta
 
 
-def create_board(board_data: BoardCreate, session: Session):
+async def create_board(board_data: BoardCreate, session: AsyncSession):
     """
     Crea un nuevo Board y lo asocia al usuario especificado en la tabla DBoards.
 
@@ -19,55 +23,166 @@ def create_board(board_data: BoardCreate, session: Session):
 
     Retorna el board creado.
     """
-    user = session.exec(select(User).where(User.id == board_data.user_id)).first()
+    user = (
+        await session.exec(select(User).where(User.id == board_data.user_id))
+    ).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    dashboard = session.exec(
-        select(Dashboard).where(Dashboard.user_id == board_data.user_id)
+    dashboard = (
+        await session.exec(
+            select(Dashboard).where(Dashboard.user_id == board_data.user_id)
+        )
     ).first()
     if not dashboard:
         raise HTTPException(status_code=404, detail="User has no dashboard")
 
     board = Board(**board_data.model_dump())
     session.add(board)
-    session.commit()
-    session.refresh(board)
+    await session.commit()
+    await session.refresh(board)
 
     session.add(DBoards(board_id=board.id, user_id=board_data.user_id))
-    session.commit()
+    await session.commit()
 
-    return board
+    return await get_board(board.id, session)
 
 
-def create_boards(board_data: BoardCreateUsers, session: Session):
+async def create_boards(board_data: BoardCreateUsers, session: AsyncSession):
     """
     Crea un único Board y lo asocia con cada uno de los usuarios especificados en la lista de user_ids.
+
+    Los usuarios se validan antes de crear el board, así que si alguno no
+    existe o no tiene dashboard no se crea nada.
     """
-    board = Board(**board_data.model_dump())
+    user_ids = set(board_data.user_ids)
+    await _validate_members(user_ids, session)
+
+    board = Board(**board_data.model_dump(exclude={"user_ids"}))
     session.add(board)
-    session.commit()
-    session.refresh(board)
+    await session.flush()
+    await _apply_members(board.id, user_ids, set(), session)
+    await session.commit()
+
+    return await get_board(board.id, session)
+
+
+async def _validate_members(user_ids: Set[uuid.UUID], session: AsyncSession) -> None:
+    """
+    Comprueba con una sola consulta que todos los usuarios existen y tienen
+    dashboard.
+
+    Lanza una excepción HTTP 404 con el primer usuario que no cumpla.
+    """
+    if not user_ids:
+        return
+    rows = (
+        await session.exec(
+            select(User.id, Dashboard.id)
+            .outerjoin(Dashboard, Dashboard.user_id == User.id)
+            .where(User.id.in_(user_ids))
+        )
+    ).all()
+    with_dashboard = {user_id for user_id, dashboard_id in rows if dashboard_id}
+    found = {user_id for user_id, _ in rows}
 
-    for user_id in board_data.user_ids:
-        user = session.exec(select(User).where(User.id == user_id)).first()
-        if not user:
+    for user_id in sorted(user_ids, key=str):
+        if user_id not in found:
             raise HTTPException(
                 status_code=404, detail=f"User with id {user_id} not found"
             )
-
-        dashboard = session.exec(
-            select(Dashboard).where(Dashboard.user_id == user_id)
-        ).first()
-        if not dashboard:
+        if user_id not in with_dashboard:
             raise HTTPException(
                 status_code=404, detail=f"User with id {user_id} has no dashboard"
             )
 
-    session.commit()
 
+async def _board_members(board_id: int, session: AsyncSession) -> Set[uuid.UUID]:
+    rows = await session.exec(
+        select(DBoards.user_id).where(DBoards.board_id == board_id)
+    )
+    return set(rows.all())
+
+
+async def _apply_members(
+    board_id: int,
+    to_add: Iterable[uuid.UUID],
+    to_remove: Iterable[uuid.UUID],
+    session: AsyncSession,
+) -> None:
+    # Un DELETE y un INSERT con executemany; no se hace commit. El índice
+    # único de (board_id, user_id) y OR IGNORE evitan duplicados si otra
+    # petición añadió el mismo usuario a la vez.
+    to_remove = list(to_remove)
+    if to_remove:
+        await session.execute(
+            delete(DBoards).where(
+                DBoards.board_id == board_id, DBoards.user_id.in_(to_remove)
+            )
+        )
+    to_add = [{"board_id": board_id, "user_id": user_id} for user_id in to_add]
+    if to_add:
+        await session.execute(insert(DBoards).prefix_with("OR IGNORE"), to_add)
+
+
+async def _get_board_id(board_id: int, session: AsyncSession) -> int:
+    found = (await session.exec(select(Board.id).where(Board.id == board_id))).first()
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
+        )
+    return found
 
-def get_board(board_id: int, session: Session):
+
+async def set_board_members(
+    board_id: int, user_ids: List[uuid.UUID], session: AsyncSession
+) -> None:
+    """
+    Reemplaza los usuarios de un board por el conjunto `user_ids`.
+
+    - **board_id**: ID del board.
+    - **user_ids**: Conjunto completo de usuarios que tendrán acceso al board.
+
+    Solo se insertan las asociaciones nuevas y se eliminan las que sobran, en
+    una única transacción.
+    """
+    await _get_board_id(board_id, session)
+    user_ids = set(user_ids)
+    await _validate_members(user_ids, session)
+
+    current = await _board_members(board_id, session)
+    await _apply_members(board_id, user_ids - current, current - user_ids, session)
+    await session.commit()
+
+
+async def update_board_members(
+    board_id: int, delta: BoardMembersDelta, session: AsyncSession
+) -> None:
+    """
+    Añade y quita usuarios de un board.
+
+    - **board_id**: ID del board.
+    - **delta**: Usuarios a añadir (`add`) y a quitar (`remove`).
+
+    Añadir un usuario que ya es miembro o quitar uno que no lo es no tiene
+    efecto. Lanza una excepción HTTP 400 si un usuario aparece en las dos
+    listas.
+    """
+    await _get_board_id(board_id, session)
+    to_add, to_remove = set(delta.add), set(delta.remove)
+    if to_add & to_remove:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A user cannot be both added and removed",
+        )
+    await _validate_members(to_add, session)
+
+    current = await _board_members(board_id, session)
+    await _apply_members(board_id, to_add - current, to_remove & current, session)
+    await session.commit()
+
+
+async def get_board(board_id: int, session: AsyncSession):
     """
     Obtiene un board por su ID.
 
@@ -75,7 +190,11 @@ def get_board(board_id: int, session: Session):
 
     Retorna el board encontrado o lanza una excepción si no se encuentra.
     """
-    board = session.exec(select(Board).where(Board.id == board_id)).first()
+    board = (
+        await session.exec(
+            select(Board).where(Board.id == board_id).options(*BOARD_READ)
+        )
+    ).first()
     if not board:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
@@ -83,89 +202,91 @@ def get_board(board_id: int, session: Session):
     return board
 
 
-def update_board(board_id: int, board_data, session: Session) -> None:
-    db_board = session.exec(select(Board).where(Board.id == board_id)).first()
+async def update_board(board_id: int, board_data, session: AsyncSession) -> None:
+    db_board = (await session.exec(select(Board).where(Board.id == board_id))).first()
     if not db_board:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
         )
 
-    db_board_data = board_data.model_dump(exclude_unset=True)
-    if "users" in db_board_data:
-        db_board_data["users"] = [
-            session.exec(select(User).where(User.id == uuid.UUID(user["id"]))).first()
-            for user in db_board_data["users"]
-        ]
-
+    db_board_data = board_data.model_dump(exclude_unset=True, exclude={"users"})
     for key, value in db_board_data.items():
         setattr(db_board, key, value)
 
-    session.commit()
-    session.refresh(db_board)
+    if "users" in board_data.model_fields_set:
+        # `User` es un modelo de tabla y no valida sus campos: el id llega
+        # como texto.
+        user_ids = {uuid.UUID(str(user.id)) for user in board_data.users}
+        await _validate_members(user_ids, session)
+        current = await _board_members(board_id, session)
+        await _apply_members(board_id, user_ids - current, current - user_ids, session)
+
+    await session.commit()
 
 
-def delete_board(board_id: int, session: Session) -> None:
+async def delete_board(board_id: int, session: AsyncSession) -> None:
     """
     Elimina un board de la base de datos.
 
     - **board_id**: ID del board a eliminar.
+
+    La base de datos elimina en cascada sus asociaciones en DBoards, sus
+    catálogos y los KPIs y registros de estos.
     """
-    db_board = session.exec(select(Board).where(Board.id == board_id)).first()
-    if not db_board:
+    result = await session.execute(delete(Board).where(Board.id == board_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
         )
-
-    session.delete(db_board)
-    session.commit()
+    await session.commit()
 
 
-def delete_dboard(board_id: int, session: Session):
+async def delete_dboard(board_id: int, session: AsyncSession):
     """
     Elimina los registros asociados en DBoards a un board.
 
     - **board_id**: ID del board cuyos registros en DBoards se eliminarán.
     """
-    db_dboards = session.exec(select(DBoards).where(DBoards.board_id == board_id)).all()
-    if not db_dboards:
+    result = await session.execute(delete(DBoards).where(DBoards.board_id == board_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No associated DBoards found"
         )
+    await session.commit()
 
-    for register in db_dboards:
-        session.delete(register)
 
-    session.commit()
-
-
-def list_boards(session: Session):
+async def list_boards(session: AsyncSession):
     """
     Lista todos los boards en la base de datos.
 
     Retorna una lista de los boards con la estructura definida en el esquema BoardRead.
     """
-    boards = session.exec(select(Board)).all()
+    boards = (await session.exec(select(Board).options(*BOARD_READ))).all()
     return boards
 
 
-def list_boards_user(user_id: uuid.UUID, session: Session) -> List[Board]:
+async def list_boards_user(user_id: uuid.UUID, session: AsyncSession) -> List[Board]:
     """
     Obtiene los boards asociados a un usuario específico.
     """
     boards = list(
-        session.exec(
-            select(Board).join(DBoards).join(User).where(User.id == user_id)
+        (
+            await session.exec(
+                select(Board)
+                .join(DBoards)
+                .where(DBoards.user_id == user_id)
+                .options(*BOARD_READ)
+            )
         ).all()
     )
     return boards
 
 
-def count_board(session: Session) -> int:
+async def count_board(session: AsyncSession) -> int:
     """
     Cuenta el número total de boards en la base de datos.
 
     - **session**: La sesión activa de la base de datos.
     - **response**: Retorna el número total de boards.
     """
-    boards = session.exec(select(Board)).all()
-    return len(boards)
+    return (await get_stats(session)).boards
@@ -1,19 +1,30 @@
 import uuid
-from sqlmodel import Session, select
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
+from app.models.boards import Board
+from app.models.catalogs import Catalog
+from app.models.dboards import DBoards
+from app.models.kpis import Kpi
+from app.models.records import Records
 from app.models.users import User
 from app.models.dashboards import Dashboard
+from app import reference_cache
+from app.schemas.dahboards import BoardTree, CatalogTree, DashboardTree, KpiTree
 
 
-def create_dashboard(user_id: uuid.UUID, session: Session) -> Dashboard:
+async def create_dashboard(user_id: uuid.UUID, session: AsyncSession) -> Dashboard:
     """
     Crea un nuevo dashboard para un usuario.
     """
-    user = session.exec(select(User).where(User.id == user_id)).first()
+    user = (await session.exec(select(User).where(User.id == user_id))).first()
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    if session.exec(select(Dashboard).where(Dashboard.user_id == user_id)).first():
+    if (
+        await session.exec(select(Dashboard).where(Dashboard.user_id == user_id))
+    ).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already has a dashboard",
@@ -21,41 +32,140 @@ def create_dashboard(user_id: uuid.UUID, session: Session) -> Dashboard:
 
     dashboard = Dashboard(user_id=user_id)
     session.add(dashboard)
-    session.commit()
-    session.refresh(dashboard)
+    await session.commit()
+    await session.refresh(dashboard)
 
     return dashboard
 
 
-def get_user_dashboard(user_id: uuid.UUID, session: Session) -> Dashboard:
+async def get_user_dashboard(user_id: uuid.UUID, session: AsyncSession) -> Dashboard:
     """
     Obtiene el Dashboard de un Usuario.
     """
-    user = session.exec(select(User).where(User.id == user_id)).first()
-    if not user or not user.dashboard:
+    dashboard = (
+        await session.exec(
+            select(Dashboard).join(User).where(Dashboard.user_id == user_id)
+        )
+    ).first()
+    if not dashboard:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User or Dashboard not found"
         )
-    return user.dashboard
+    return dashboard
 
 
-def delete_dashboard(dashboard_id: int, session: Session) -> None:
+async def get_dashboard_tree(
+    user_id: uuid.UUID, session: AsyncSession
+) -> DashboardTree:
     """
-    Elimina un Dashboard si no tiene ningún Board asociado.
+    Obtiene el Dashboard de un Usuario con todo su contenido: boards, catálogos
+    y KPIs (con su color, gráfico y último valor registrado).
+
+    Hace como máximo cinco consultas, una por nivel del árbol, sin importar
+    cuántos boards, catálogos o KPIs haya. El icono, el color y el gráfico
+    salen de `reference_cache` con las versiones de sus tablas leídas en la
+    primera consulta; solo si alguna cambió se recarga su copia en memoria.
     """
-    dashboard = session.exec(
-        select(Dashboard).where(Dashboard.id == dashboard_id)
+    row = (
+        await session.exec(
+            select(
+                Dashboard,
+                reference_cache.icons.version_column(),
+                reference_cache.colors.version_column(),
+                reference_cache.charts.version_column(),
+            ).where(Dashboard.user_id == user_id)
+        )
     ).first()
-    if not dashboard:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Dashboard not found")
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User or Dashboard not found"
+        )
+    dashboard, icon_version, color_version, chart_version = row
+    tree = DashboardTree(id=dashboard.id, user_id=dashboard.user_id)
 
-    session.delete(dashboard)
-    session.commit()
+    icons = await reference_cache.icons.by_id(session, icon_version)
+    boards = {}
+    for board in await session.exec(
+        select(Board)
+        .join(DBoards, DBoards.board_id == Board.id)
+        .where(DBoards.user_id == user_id)
+        .order_by(Board.id)
+    ):
+        if board.id not in boards:
+            boards[board.id] = BoardTree(
+                id=board.id,
+                name=board.name,
+                icon_id=board.icon_id,
+                icon=icons.get(board.icon_id),
+            )
+    tree.boards = list(boards.values())
+    if not boards:
+        return tree
+
+    catalogs = {}
+    for catalog in await session.exec(
+        select(Catalog).where(Catalog.board_id.in_(boards)).order_by(Catalog.id)
+    ):
+        catalogs[catalog.id] = CatalogTree(
+            id=catalog.id, name=catalog.name, board_id=catalog.board_id
+        )
+        boards[catalog.board_id].catalogs.append(catalogs[catalog.id])
+    if not catalogs:
+        return tree
+
+    colors = await reference_cache.colors.by_id(session, color_version)
+    charts = await reference_cache.charts.by_id(session, chart_version)
+    kpis = {}
+    for kpi in await session.exec(
+        select(Kpi)
+        .where(Kpi.catalog_id.in_(catalogs))
+        .order_by(Kpi.position_index, Kpi.id)
+    ):
+        kpis[kpi.id] = KpiTree(
+            **kpi.model_dump(include=KpiTree.model_fields.keys()),
+            color=colors.get(kpi.color_schema),
+            chart=charts.get(kpi.chart_type),
+        )
+        catalogs[kpi.catalog_id].kpis.append(kpis[kpi.id])
+    if not kpis:
+        return tree
+
+    # Último registro de cada KPI: una búsqueda en el índice (kpi_id, created_at)
+    # por KPI, dentro de una sola consulta.
+    latest_id = (
+        select(Records.id)
+        .where(Records.kpi_id == Kpi.id)
+        .order_by(Records.created_at.desc(), Records.id.desc())
+        .limit(1)
+        .correlate(Kpi)
+        .scalar_subquery()
+    )
+    for kpi_id, value, created_at in await session.exec(
+        select(Records.kpi_id, Records.value, Records.created_at)
+        .join(Kpi, Records.id == latest_id)
+        .where(Kpi.id.in_(kpis))
+    ):
+        kpis[kpi_id].latest_value = value
+        kpis[kpi_id].latest_at = created_at
+
+    return tree
+
+
+async def delete_dashboard(dashboard_id: int, session: AsyncSession) -> None:
+    """
+    Elimina un Dashboard si no tiene ningún Board asociado.
+    """
+    result = await session.execute(
+        delete(Dashboard).where(Dashboard.id == dashboard_id)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Dashboard not found")
+    await session.commit()
 
 
-def list_dashboards(session: Session):
+async def list_dashboards(session: AsyncSession):
     """
     Lista todos los dashboards con sus boards asociados.
     """
-    dashboards = session.exec(select(Dashboard)).all()
+    dashboards = (await session.exec(select(Dashboard))).all()
     return dashboards
@@ -0,0 +1,294 @@
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Row, and_, func, insert, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import live
+from app.buckets import (
+    bucket_expression,
+    sample_avg,
+    sample_count,
+    sample_sum,
+    to_utc_naive,
+)
+from app.db import async_engine
+from app.fast_json import row_columns
+from app.models.kpis import Kpi
+from app.models.records import Records
+from app.rollups import apply_records, rollup_aggregate_query
+from app.schemas.records import (
+    AggregateFunction,
+    BucketWidth,
+    ExportFormat,
+    RecordAggregate,
+    RecordBulkCreate,
+    RecordBulkItemStatus,
+    RecordBulkResult,
+)
+
+MAX_AGGREGATE_BUCKETS = 10000
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+EXPORT_FETCH_SIZE = 2000
+EXPORT_COLUMNS = ("id", "kpi_id", "value", "created_at")
+
+
+async def create_records_bulk(
+    bulk_data: RecordBulkCreate, session: AsyncSession
+) -> RecordBulkResult:
+    """
+    Inserta muchos registros, posiblemente de varios KPIs, en una sola transacción.
+
+    - **bulk_data**: Lista de registros `(kpi_id, value, created_at)`.
+
+    Valida todos los KPIs con una única consulta e inserta los registros válidos
+    con un único executemany. Retorna el estado de cada elemento.
+    """
+    kpi_ids = {item.kpi_id for item in bulk_data.records}
+    existing_kpis = set(
+        (await session.exec(select(Kpi.id).where(Kpi.id.in_(kpi_ids)))).all()
+    )
+
+    now = datetime.now(timezone.utc)
+    statuses = []
+    rows = []
+    for index, item in enumerate(bulk_data.records):
+        item_status = RecordBulkItemStatus(
+            index=index, kpi_id=item.kpi_id, created=item.kpi_id in existing_kpis
+        )
+        statuses.append(item_status)
+        if not item_status.created:
+            item_status.detail = "KPI no encontrado"
+            continue
+        rows.append(
+            {
+                "kpi_id": item.kpi_id,
+                "value": item.value,
+                "created_at": to_utc_naive(item.created_at or now),
+            }
+        )
+
+    if rows:
+        ids = (
+            await session.scalars(
+                insert(Records).returning(Records.id, sort_by_parameter_order=True),
+                rows,
+            )
+        ).all()
+        await apply_records(
+            ((row["kpi_id"], row["value"], row["created_at"]) for row in rows),
+            session,
+        )
+        await session.commit()
+        created = iter(ids)
+        for item_status in statuses:
+            if item_status.created:
+                item_status.id = next(created)
+        if live.listening():
+            live.publish(
+                [
+                    live.record_event(
+                        record_id, row["kpi_id"], row["value"], row["created_at"]
+                    )
+                    for record_id, row in zip(ids, rows)
+                ]
+            )
+
+    return RecordBulkResult(
+        created=len(rows), failed=len(statuses) - len(rows), items=statuses
+    )
+
+
+def encode_cursor(record: Row) -> str:
+    """
+    Codifica la posición `(created_at, id)` de un registro como cursor opaco.
+    """
+    raw = f"{record.created_at.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodifica un cursor generado por `encode_cursor`.
+
+    Lanza una excepción HTTP 400 si el cursor no es válido.
+    """
+    try:
+        created_at, record_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return to_utc_naive(datetime.fromisoformat(created_at)), int(record_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido"
+        )
+
+
+async def list_records(
+    kpi_id: int,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    cursor: Optional[str],
+    limit: int,
+    session: AsyncSession,
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Lista una página de registros de un KPI ordenados por `(created_at, id)`.
+
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+    - **cursor**: Cursor devuelto por la página anterior.
+    - **limit**: Número máximo de registros de la página.
+
+    Usa paginación por clave en lugar de OFFSET, así que cualquier página
+    cuesta lo mismo que la primera. Retorna las filas (columnas de `Records`
+    en el orden de `row_fields`, sin objetos ORM) y el cursor de la página
+    siguiente, o `None` si no hay más.
+    """
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    query = select(*row_columns(Records)).where(Records.kpi_id == kpi_id)
+    if since is not None:
+        query = query.where(Records.created_at >= since)
+    if until is not None:
+        query = query.where(Records.created_at < until)
+    if cursor is not None:
+        last_created_at, last_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Records.created_at > last_created_at,
+                and_(Records.created_at == last_created_at, Records.id > last_id),
+            )
+        )
+    query = query.order_by(Records.created_at, Records.id).limit(limit + 1)
+
+    records = list((await session.exec(query)).all())
+    if len(records) <= limit:
+        return records, None
+
+    records = records[:limit]
+    return records, encode_cursor(records[-1])
+
+
+async def export_records(
+    kpi_id: int,
+    export_format: ExportFormat,
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> AsyncIterator[str]:
+    """
+    Genera el historial de un KPI como NDJSON o CSV, por bloques.
+
+    Lee con un cursor del lado del servidor de `EXPORT_FETCH_SIZE` filas, así
+    que la memoria no depende del tamaño del historial. Abre su propia sesión
+    porque se consume mientras se envía la respuesta, después de que la sesión
+    de la petición se haya cerrado.
+    """
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    query = select(Records.id, Records.kpi_id, Records.value, Records.created_at).where(
+        Records.kpi_id == kpi_id
+    )
+    if since is not None:
+        query = query.where(Records.created_at >= since)
+    if until is not None:
+        query = query.where(Records.created_at < until)
+    query = query.order_by(Records.created_at, Records.id)
+
+    if export_format == ExportFormat.csv:
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(query)
+        async for rows in result.partitions(EXPORT_FETCH_SIZE):
+            if export_format == ExportFormat.csv:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for record_id, record_kpi_id, value, created_at in rows:
+                    writer.writerow(
+                        (record_id, record_kpi_id, value, created_at.isoformat())
+                    )
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(
+                        {
+                            "id": record_id,
+                            "kpi_id": record_kpi_id,
+                            "value": str(value),
+                            "created_at": created_at.isoformat(),
+                        }
+                    )
+                    + "\n"
+                    for record_id, record_kpi_id, value, created_at in rows
+                )
+
+
+async def aggregate_records(
+    kpi_id: int,
+    bucket: BucketWidth,
+    function: AggregateFunction,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    session: AsyncSession,
+) -> List[RecordAggregate]:
+    """
+    Agrega los registros de un KPI por intervalos de tiempo directamente en SQL.
+
+    - **bucket**: Ancho de cada intervalo.
+    - **function**: Función de agregación aplicada a los valores de cada intervalo.
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+
+    Si el intervalo y los límites del rango coinciden con un rollup, se lee de
+    los rollups en lugar de `Records`.
+
+    Retorna un punto por intervalo con datos, ordenados por fecha.
+    """
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    query = rollup_aggregate_query(kpi_id, bucket, function, since, until)
+
+    if query is None:
+        bucket_column = bucket_expression(Records.created_at, bucket).label("bucket")
+        # Los registros compactados por la retención cuentan por sus muestras;
+        # su mínimo y máximo son los de los promedios.
+        weighted = {
+            AggregateFunction.avg: sample_avg,
+            AggregateFunction.sum: sample_sum,
+            AggregateFunction.count: sample_count,
+        }
+        if function == AggregateFunction.last:
+            # SQLite toma las columnas sin agregar de la fila que produjo el max().
+            columns = [Records.value, func.max(Records.created_at)]
+        elif function in weighted:
+            columns = [weighted[function]()]
+        else:
+            columns = [getattr(func, function.value)(Records.value)]
+
+        query = select(bucket_column, *columns).where(Records.kpi_id == kpi_id)
+        if since is not None:
+            query = query.where(Records.created_at >= since)
+        if until is not None:
+            query = query.where(Records.created_at < until)
+        query = query.group_by(bucket_column).order_by(bucket_column)
+
+    rows = (await session.exec(query.limit(MAX_AGGREGATE_BUCKETS + 1))).all()
+    if len(rows) > MAX_AGGREGATE_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Demasiados intervalos: reduzca el rango o use un intervalo mayor",
+        )
+
+    return [
+        RecordAggregate(
+            bucket=datetime.fromisoformat(row[0]),
+            value=None if row[1] is None else float(row[1]),
+        )
+        for row in rows
+    ]
@@ -0,0 +1,71 @@
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.stats import TableCounter
+from app.schemas.stats import Stats
+
+# Segundos que se reutilizan los contadores antes de volver a leerlos. Con 0
+# (por defecto) siempre se leen de la base de datos.
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "0"))
+
+# Campo de `Stats` para cada tabla contada.
+STATS_TABLES = {
+    "users": "user",
+    "boards": "board",
+    "catalogs": "catalog",
+    "kpis": "kpi",
+    "dashboards": "dashboard",
+    "records": "records",
+}
+
+_cached: Optional[Tuple[float, Stats]] = None
+
+
+async def get_stats(session: AsyncSession) -> Stats:
+    """
+    Retorna el número de filas de las tablas principales.
+
+    Los contadores se mantienen con triggers al insertar y eliminar, así que
+    leerlos es una sola consulta por clave primaria, independiente del tamaño
+    de las tablas. Si `STATS_CACHE_TTL` es mayor que 0, el resultado se
+    reutiliza durante ese número de segundos.
+    """
+    global _cached
+    if _cached is not None and time.monotonic() - _cached[0] < STATS_CACHE_TTL:
+        return _cached[1]
+
+    counters = dict(
+        (
+            await session.exec(
+                select(TableCounter.name, TableCounter.rows).where(
+                    TableCounter.name.in_(STATS_TABLES.values())
+                )
+            )
+        ).all()
+    )
+    stats = Stats(
+        **{field: counters.get(table, 0) for field, table in STATS_TABLES.items()}
+    )
+    if STATS_CACHE_TTL > 0:
+        _cached = (time.monotonic(), stats)
+    return stats
+
+
+async def get_table_versions(tables: Sequence[str], session: AsyncSession) -> List[int]:
+    """
+    Retorna la versión actual de cada tabla de `tables`, en el mismo orden.
+    """
+    versions = dict(
+        (
+            await session.exec(
+                select(TableCounter.name, TableCounter.version).where(
+                    TableCounter.name.in_(tables)
+                )
+            )
+        ).all()
+    )
+    return [versions.get(table, 0) for table in tables]
@@ -1,10 +1,18 @@
-from sqlmodel import Session, select
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.users import User
 from app.schemas.users import UserCreate, UserInfoRead
 from pydantic import BaseModel
 from uuid import UUID
-import requests
+import httpx
 from fastapi import HTTPException, status
+from app.crud.stats import get_stats
+from app.auth import (
+    fetch_microsoft_profile,
+    offline_validation_enabled,
+    validate_microsoft_token,
+)
 
 
 class DeleteUserRequest(BaseModel):
@@ -15,7 +23,7 @@ class GetUserInfoRequest(BaseModel):
     user_id: str
 
 
-def create_user(user_data: UserCreate, session: Session) -> User:
+async def create_user(user_data: UserCreate, session: AsyncSession) -> User:
     """
     Crea un nuevo usuario en la base de datos.
 
@@ -25,56 +33,103 @@ def create_user(user_data: UserCreate, session: Session) -> User:
     """
     db_user = User(**user_data.model_dump())
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
-def authenticate_with_microsoft(token: str, session: Session) -> User:
-    microsoft_url = "https://graph.microsoft.com/v1.0/me"
-    headers = {"Authorization": f"Bearer {token}"}
-
+def _user_from_profile(user_info: dict) -> UserCreate:
+    return UserCreate(
+        id=UUID(user_info["id"]),
+        name=user_info.get("displayName"),
+        email=user_info.get("mail"),
+        given_name=user_info.get("givenName"),
+        surname=user_info.get("surname"),
+        job_title=user_info.get("jobTitle"),
+        business_phone=(user_info.get("businessPhones") or [None])[0],
+        mobile_phone=user_info.get("mobilePhone"),
+        office_location=user_info.get("officeLocation"),
+    )
+
+
+def _user_from_claims(claims: dict) -> UserCreate:
+    return UserCreate(
+        id=UUID(claims["oid"]),
+        name=claims.get("name"),
+        email=claims.get("email") or claims.get("preferred_username"),
+        given_name=claims.get("given_name"),
+        surname=claims.get("family_name"),
+    )
+
+
+async def _authenticate_offline(token: str, session: AsyncSession) -> User:
+    claims = await validate_microsoft_token(token)
     try:
-        response = requests.get(microsoft_url, headers=headers)
-        response.raise_for_status()
-        user_info = response.json()
-
-        user_data = {
-            "id": UUID(user_info["id"]),
-            "name": user_info.get("displayName"),
-            "email": user_info.get("mail"),
-            "given_name": user_info.get("givenName"),
-            "surname": user_info.get("surname"),
-            "job_title": user_info.get("jobTitle"),
-            "business_phone": user_info.get("businessPhones", [None])[0],
-            "mobile_phone": user_info.get("mobilePhone"),
-            "office_location": user_info.get("officeLocation"),
-        }
-
-        user = session.exec(select(User).where(User.id == user_data["id"])).first()
-
-        if not user:
-            user = create_user(UserCreate(**user_data), session)
+        user_id = UUID(claims["oid"])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Authentication failed"
+        )
 
+    user = await session.get(User, user_id)
+    if user:
         return user
 
-    except requests.exceptions.RequestException:
+    # Solo los usuarios nuevos consultan Graph, para completar el perfil. Si el
+    # token no sirve para Graph, el usuario se crea con los datos de los claims.
+    try:
+        user_data = _user_from_profile(await fetch_microsoft_profile(token))
+    except (httpx.HTTPError, ValueError, KeyError):
+        user_data = None
+    if user_data is None or user_data.id != user_id:
+        user_data = _user_from_claims(claims)
+    return await create_user(user_data, session)
+
+
+async def _authenticate_with_graph(token: str, session: AsyncSession) -> User:
+    try:
+        user_data = _user_from_profile(await fetch_microsoft_profile(token))
+    except httpx.HTTPError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Authentication failed"
         )
+
+    user = await session.get(User, user_data.id)
+    if not user:
+        user = await create_user(user_data, session)
+    return user
+
+
+async def authenticate_with_microsoft(token: str, session: AsyncSession) -> User:
+    """
+    Autentica a un usuario con un token de Microsoft y lo crea si no existe.
+
+    - **token**: Token bearer de Microsoft.
+
+    Si `MICROSOFT_CLIENT_ID` está configurado, el token se valida localmente
+    contra el JWKS cacheado y Graph solo se consulta para usuarios nuevos. Si
+    no, el token se valida llamando a Graph en cada inicio de sesión.
+    """
+    try:
+        if offline_validation_enabled():
+            return await _authenticate_offline(token, session)
+        return await _authenticate_with_graph(token, session)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
-def delete_user(user_id: str, session: Session) -> None:
+async def delete_user(user_id: str, session: AsyncSession) -> None:
     """
     Elimina un usuario de la base de datos.
 
     - **user_id**: ID del usuario a eliminar.
 
-    Si el usuario no se encuentra, lanza una excepción HTTP 404.
+    Su dashboard y sus asociaciones con boards se eliminan en cascada. Si el
+    usuario no se encuentra, lanza una excepción HTTP 404.
     """
     try:
         user_id = UUID(user_id)
@@ -83,18 +138,17 @@ def delete_user(user_id: str, session: Session) -> None:
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid UUID format"
         )
 
-    user = session.exec(select(User).where(User.id == user_id)).first()
-
-    if not user:
+    result = await session.execute(delete(User).where(User.id == user_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-
-    session.delete(user)
-    session.commit()
+    await session.commit()
 
 
-def get_user_info(request: GetUserInfoRequest, session: Session) -> UserInfoRead:
+async def get_user_info(
+    request: GetUserInfoRequest, session: AsyncSession
+) -> UserInfoRead:
     """
     Obtiene la información de un usuario a partir de su ID.
 
@@ -110,7 +164,7 @@ def get_user_info(request: GetUserInfoRequest, session: Session) -> UserInfoRead
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid UUID format"
         )
 
-    user = session.exec(select(User).where(User.id == user_id)).first()
+    user = (await session.exec(select(User).where(User.id == user_id))).first()
 
     if not user:
         raise HTTPException(
@@ -121,19 +175,18 @@ def get_user_info(request: GetUserInfoRequest, session: Session) -> UserInfoRead
     return UserInfoRead(**user_data)
 
 
-def get_all_users(session: Session):
+async def get_all_users(session: AsyncSession):
     """
     Devuelve todos los usuarios registrados en la base de datos.
     Utiliza exec para obtener los usuarios.
     """
-    users = session.exec(select(User)).all()
+    users = (await session.exec(select(User))).all()
     return users
 
 
-def count_users(session: Session):
+async def count_users(session: AsyncSession):
     """
     Devuelve el número de usuarios activos registrados en la base de datos.
-    Utiliza exec para obtener el conteo de usuarios.
+    Lee el contador mantenido en la base de datos.
     """
-    result = session.exec(select(User)).all()
-    return len(result)
+    return (await get_stats(session)).users
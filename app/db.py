@@ -1,17 +1,60 @@
 from fastapi import FastAPI
 from typing import Annotated
 from fastapi import Depends
-from sqlmodel import Session, create_engine, SQLModel
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import live, slow_queries
+from app.auth import close_http_client
+from app.migrations import upgrade
+from app.query_counter import instrument
 
 sqlite_name = "db.sqlite3"
 sqlite_url = f"sqlite:///{sqlite_name}"
+async_sqlite_url = f"sqlite+aiosqlite:///{sqlite_name}"
 
 engine = create_engine(sqlite_url)
+async_engine = create_async_engine(async_sqlite_url)
+instrument(engine)
+instrument(async_engine.sync_engine)
+slow_queries.instrument(engine)
+slow_queries.instrument(async_engine.sync_engine)
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+    # SQLite no aplica las claves foráneas (ni sus ON DELETE) si no se activan
+    # en cada conexión.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.close()
+
+
+event.listen(engine, "connect", _enable_foreign_keys)
+event.listen(async_engine.sync_engine, "connect", _enable_foreign_keys)
+
+
+def init_db() -> None:
+    """
+    Crea las tablas y actualiza el esquema de la base de datos existente.
+    """
+    upgrade(engine)
 
 
-def create_all_tables(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
+async def create_all_tables(app: FastAPI):
+    # Importados aquí porque usan los engines de este módulo.
+    from app import retention, write_behind
+
+    init_db()
+    live.start()
+    write_behind.start()
+    retention.start()
     yield
+    await retention.stop()
+    await write_behind.stop()
+    live.stop()
+    await close_http_client()
 
 
 def get_session():
@@ -19,4 +62,21 @@ def get_session():
         yield session
 
 
+async def get_async_session():
+    # Sin expirar al hacer commit: en async no se pueden recargar atributos
+    # de forma implícita al leerlos.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def begin_immediate(session: AsyncSession) -> None:
+    """
+    Abre la transacción de `session` con `BEGIN IMMEDIATE`: toma el bloqueo
+    de escritura antes de leer, así que otra escritura no puede cambiar lo
+    leído antes del commit. Debe ser la primera sentencia de la sesión.
+    """
+    await session.execute(text("BEGIN IMMEDIATE"))
+
+
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
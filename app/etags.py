@@ -0,0 +1,53 @@
+from typing import List
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.crud.stats import get_table_versions
+from app.db import AsyncSessionDep
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Comparación débil: se ignora el prefijo W/ de ambos lados.
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def ETag(*tables: str):
+    """
+    Dependencia que añade un ETag débil calculado a partir de la versión de
+    las tablas de las que depende la respuesta.
+
+    - **tables**: Tablas cuyas escrituras cambian la respuesta del endpoint.
+
+    Si la cabecera `If-None-Match` coincide con el ETag actual, responde 304
+    sin ejecutar el endpoint, así que las filas no se consultan.
+
+        @router.get("/colors/", dependencies=[ETag("color")])
+
+    Como parámetro del endpoint, la dependencia retorna las versiones que
+    leyó, en el orden de `tables`, para no volver a consultarlas:
+
+        async def get_colors(versions: List[int] = ETag("color")): ...
+    """
+
+    async def check_etag(
+        request: Request, response: Response, session: AsyncSessionDep
+    ) -> List[int]:
+        versions = await get_table_versions(tables, session)
+        etag = 'W/"' + ".".join(str(version) for version in versions) + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        response.headers.update(headers)
+        return versions
+
+    return Depends(check_etag)
@@ -0,0 +1,104 @@
+import os
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlmodel import SQLModel
+
+# Respuestas JSON que no pasan por la validación de `response_model`.
+#
+# Por defecto FastAPI valida lo que retorna el endpoint contra el
+# `response_model`, lo convierte con `jsonable_encoder` y lo codifica con
+# `json.dumps`. Para listas grandes de objetos que ya vienen validados de la
+# base de datos ese trabajo es redundante. Los endpoints que lo necesiten
+# retornan `json_response` o `rows_json_response` en su lugar; el
+# `response_model` del decorador se mantiene para que OpenAPI no cambie.
+#
+# Es opcional: solo se activa con `FAST_JSON=1`. Sin él, los helpers retornan
+# el contenido tal cual y FastAPI lo valida y serializa como siempre.
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+@lru_cache(maxsize=None)
+def row_fields(model: Type[SQLModel]) -> Tuple[str, ...]:
+    """
+    Campos de `model` en el orden en que los serializa `response_model`.
+    """
+    return tuple(model.model_fields)
+
+
+def row_columns(model: Type[SQLModel]) -> List[Any]:
+    """
+    Columnas de `model` en el orden de `row_fields`, para seleccionar filas sin
+    construir objetos ORM.
+    """
+    return [getattr(model, field) for field in row_fields(model)]
+
+
+def _finish(body: bytes, response: Optional[Response]) -> FastJSONResponse:
+    fast_response = FastJSONResponse(body)
+    if response is not None:
+        # Cabeceras añadidas por el endpoint o sus dependencias (ETag, cursor...).
+        fast_response.raw_headers.extend(response.raw_headers)
+    return fast_response
+
+
+def json_response(
+    schema: Any,
+    content: Any,
+    response: Optional[Response] = None,
+    from_attributes: bool = False,
+) -> Any:
+    """
+    Serializa objetos con el serializador precompilado de `schema`. Sin
+    `FAST_JSON`, retorna `content` para el `response_model`.
+
+    - **schema**: Tipo del `response_model`, por ejemplo `List[Kpi]`.
+    - **response**: Respuesta inyectada en el endpoint, para conservar sus cabeceras.
+    - **from_attributes**: Si los objetos no son instancias de `schema` (por
+      ejemplo `Board` para `BoardRead`), se convierten leyendo sus atributos.
+    """
+    if not FAST_JSON:
+        return content
+    adapter = _adapter(schema)
+    if from_attributes:
+        content = adapter.validate_python(content, from_attributes=True)
+    return _finish(adapter.dump_json(content), response)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+def rows_json_response(
+    model: Type[SQLModel], rows: Iterable[tuple], response: Optional[Response] = None
+) -> Any:
+    """
+    Serializa filas seleccionadas con `row_columns(model)` con orjson.
+
+    Produce el mismo JSON que `List[model]` sin construir objetos ORM ni
+    modelos de Pydantic: los `Decimal` se escriben como texto y las fechas en
+    ISO 8601. Sin `FAST_JSON`, retorna las filas como diccionarios para el
+    `response_model`.
+    """
+    fields = row_fields(model)
+    content = [dict(zip(fields, row)) for row in rows]
+    if not FAST_JSON:
+        return content
+    body = orjson.dumps(content, default=_default)
+    return _finish(body, response)
@@ -0,0 +1,279 @@
+import ast
+import hashlib
+import operator
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.buckets import bucket_expression, sample_avg, to_utc_naive
+from app.crud.records import MAX_AGGREGATE_BUCKETS
+from app.models.records import Records
+from app.schemas.records import BucketWidth, RecordAggregate
+
+MAX_FORMULA_LENGTH = 1000
+FORMULA_CACHE_SIZE = 256
+FORMULA_BATCH_SIZE = 1000
+
+KPI_VARIABLE = re.compile(r"^kpi_(\d+)$")
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+# Nombre: (función, mínimo de argumentos, máximo de argumentos)
+FUNCTIONS = {
+    "abs": (abs, 1, 1),
+    "min": (min, 2, 16),
+    "max": (max, 2, 16),
+    "round": (lambda value, digits=0: round(value, int(digits)), 1, 2),
+}
+
+# Una columna es una lista de valores alineados por intervalo; las constantes
+# se mantienen como escalares para no expandirlas.
+Column = Union[float, List[Optional[float]]]
+
+
+class CompiledFormula:
+    """
+    Fórmula validada y compilada a una función que opera sobre columnas.
+
+    - **kpi_ids**: IDs de los KPIs referenciados como `kpi_<id>`.
+    - **evaluate**: Recibe un diccionario `{kpi_id: columna}` y retorna la columna resultante.
+    """
+
+    def __init__(self, kpi_ids: Tuple[int, ...], evaluate: Callable[[Dict], Column]):
+        self.kpi_ids = kpi_ids
+        self.evaluate = evaluate
+
+
+_cache: "OrderedDict[Tuple[int, str], CompiledFormula]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail=f"Fórmula inválida: {detail}"
+    )
+
+
+def _safe(function: Callable) -> Callable:
+    def wrapper(*args):
+        if any(arg is None for arg in args):
+            return None
+        try:
+            return float(function(*args))
+        except (ArithmeticError, ValueError, TypeError):
+            return None
+
+    return wrapper
+
+
+def _vectorize(function: Callable) -> Callable[..., Column]:
+    """
+    Aplica `function` elemento a elemento sobre columnas y escalares.
+    """
+    safe = _safe(function)
+
+    def apply(*args: Column) -> Column:
+        columns = [arg for arg in args if isinstance(arg, list)]
+        if not columns:
+            return safe(*args)
+        if len(columns) == len(args):
+            return [safe(*values) for values in zip(*args)]
+        size = len(columns[0])
+        expanded = [arg if isinstance(arg, list) else [arg] * size for arg in args]
+        return [safe(*values) for values in zip(*expanded)]
+
+    return apply
+
+
+def _compile_node(node: ast.AST, kpi_ids: List[int]) -> Callable[[Dict], Column]:
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body, kpi_ids)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise _invalid("solo se permiten constantes numéricas")
+        # En coma flotante: con enteros, `10 ** 10 ** 10` no terminaría.
+        value = float(node.value)
+        return lambda columns: value
+
+    if isinstance(node, ast.Name):
+        match = KPI_VARIABLE.match(node.id)
+        if not match:
+            raise _invalid(f"variable desconocida '{node.id}', use kpi_<id>")
+        kpi_id = int(match.group(1))
+        if kpi_id not in kpi_ids:
+            kpi_ids.append(kpi_id)
+        return lambda columns: columns[kpi_id]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        apply = _vectorize(BINARY_OPERATORS[type(node.op)])
+        left = _compile_node(node.left, kpi_ids)
+        right = _compile_node(node.right, kpi_ids)
+        return lambda columns: apply(left(columns), right(columns))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        apply = _vectorize(UNARY_OPERATORS[type(node.op)])
+        operand = _compile_node(node.operand, kpi_ids)
+        return lambda columns: apply(operand(columns))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise _invalid(
+                f"solo se permiten las funciones {', '.join(sorted(FUNCTIONS))}"
+            )
+        function, min_args, max_args = FUNCTIONS[node.func.id]
+        if node.keywords or not min_args <= len(node.args) <= max_args:
+            raise _invalid(f"argumentos no válidos para '{node.func.id}'")
+        apply = _vectorize(function)
+        arguments = [_compile_node(arg, kpi_ids) for arg in node.args]
+        return lambda columns: apply(*(argument(columns) for argument in arguments))
+
+    raise _invalid(f"expresión no permitida '{type(node).__name__}'")
+
+
+def compile_formula(formula: str) -> CompiledFormula:
+    """
+    Valida una fórmula contra la lista de operaciones permitidas y la compila.
+
+    - **formula**: Expresión aritmética sobre variables `kpi_<id>`, por ejemplo
+      `(kpi_3 - kpi_4) / kpi_4 * 100`.
+
+    Lanza una excepción HTTP 400 si la fórmula no es válida.
+    """
+    if len(formula) > MAX_FORMULA_LENGTH:
+        raise _invalid(f"supera los {MAX_FORMULA_LENGTH} caracteres")
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError:
+        raise _invalid("error de sintaxis")
+
+    kpi_ids: List[int] = []
+    evaluate = _compile_node(tree, kpi_ids)
+    if not kpi_ids:
+        raise _invalid("debe referenciar al menos un KPI")
+    return CompiledFormula(tuple(kpi_ids), evaluate)
+
+
+def get_compiled_formula(kpi_id: int, formula: str) -> CompiledFormula:
+    """
+    Retorna la fórmula compilada de un KPI, compilándola solo la primera vez.
+
+    La caché se indexa por ID del KPI y hash de la fórmula.
+    """
+    key = (kpi_id, hashlib.sha256(formula.encode()).hexdigest())
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = compile_formula(formula)
+    with _cache_lock:
+        _cache[key] = compiled
+        while len(_cache) > FORMULA_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def invalidate_formula(kpi_id: int) -> None:
+    """
+    Elimina de la caché las fórmulas compiladas de un KPI.
+    """
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == kpi_id]:
+            del _cache[key]
+
+
+def _evaluate_batch(
+    compiled: CompiledFormula, buckets: List[datetime], columns: Dict[int, List]
+) -> List[RecordAggregate]:
+    values = compiled.evaluate(columns)
+    if not isinstance(values, list):
+        values = [values] * len(buckets)
+    return [
+        RecordAggregate(bucket=bucket, value=value)
+        for bucket, value in zip(buckets, values)
+    ]
+
+
+async def evaluate_formula_series(
+    kpi_id: int,
+    formula: str,
+    bucket: BucketWidth,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    session: AsyncSession,
+) -> List[RecordAggregate]:
+    """
+    Calcula la serie derivada de un KPI a partir de los registros de otros KPIs.
+
+    Los registros de cada KPI referenciado se promedian por intervalo en SQL y
+    se alinean por intervalo; solo se evalúan los intervalos con datos de todos
+    los KPIs. La fórmula se evalúa por lotes de `FORMULA_BATCH_SIZE` intervalos,
+    columna a columna.
+    """
+    compiled = get_compiled_formula(kpi_id, formula)
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    bucket_column = bucket_expression(Records.created_at, bucket).label("bucket")
+
+    query = select(bucket_column, Records.kpi_id, sample_avg()).where(
+        Records.kpi_id.in_(compiled.kpi_ids)
+    )
+    if since is not None:
+        query = query.where(Records.created_at >= since)
+    if until is not None:
+        query = query.where(Records.created_at < until)
+    query = query.group_by(bucket_column, Records.kpi_id).order_by(bucket_column)
+
+    series: List[RecordAggregate] = []
+    buckets: List[datetime] = []
+    columns: Dict[int, List] = {ref_id: [] for ref_id in compiled.kpi_ids}
+    current_bucket, current_values = None, {}
+
+    def close_bucket():
+        if len(current_values) == len(compiled.kpi_ids):
+            buckets.append(datetime.fromisoformat(current_bucket))
+            for ref_id, value in current_values.items():
+                columns[ref_id].append(float(value))
+
+    for row_bucket, row_kpi_id, value in await session.exec(query):
+        if row_bucket != current_bucket:
+            if current_bucket is not None:
+                close_bucket()
+            current_bucket, current_values = row_bucket, {}
+            if len(buckets) >= FORMULA_BATCH_SIZE:
+                series.extend(_evaluate_batch(compiled, buckets, columns))
+                buckets = []
+                columns = {ref_id: [] for ref_id in compiled.kpi_ids}
+                if len(series) > MAX_AGGREGATE_BUCKETS:
+                    break
+        current_values[row_kpi_id] = value
+    if current_bucket is not None:
+        close_bucket()
+    if buckets:
+        series.extend(_evaluate_batch(compiled, buckets, columns))
+
+    if len(series) > MAX_AGGREGATE_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Demasiados intervalos: reduzca el rango o use un intervalo mayor",
+        )
+    return series
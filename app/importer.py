@@ -0,0 +1,338 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Connection
+
+from app.buckets import to_utc_naive
+from app.rollups import merge_text_records
+from app.schemas.records import ImportFormat
+
+# Importación masiva de históricos de registros desde CSV o Parquet.
+#
+# El archivo se lee por bloques de `IMPORT_CHUNK_ROWS` filas: cada bloque se
+# valida (KPIs con una consulta, fechas y valores en Python), se inserta con
+# un executemany y se suma a los rollups, todo en una transacción.
+# Después de cada bloque se informa del progreso y de los errores por fila,
+# así que la memoria no depende del tamaño del archivo.
+#
+#     python -m app.importer historico.csv
+#
+# Columnas: `kpi_id` (o `kpi`, con el nombre del KPI), `created_at` y `value`.
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "50000"))
+# Errores por fila que se detallan; a partir de ahí solo se cuentan.
+IMPORT_MAX_ERRORS = 1000
+
+KPI_COLUMNS = {"kpi_id": "id", "kpi": "name"}
+INSERT_RECORDS = "INSERT INTO records (kpi_id, created_at, value) VALUES (?, ?, ?)"
+# Límite de parámetros por consulta al resolver KPIs.
+LOOKUP_CHUNK = 500
+
+# (número de línea, KPI, created_at, value) tal como vienen del archivo.
+RawRow = Tuple[int, Any, Any, Any]
+# (kpi_id, created_at como texto, value), en el orden de `INSERT_RECORDS`.
+InsertRow = Tuple[int, str, float]
+
+
+class ImportFileError(ValueError):
+    """
+    El archivo no se puede importar: formato o columnas incorrectos.
+    """
+
+
+def _kpi_column(columns: List[str]) -> Tuple[str, str]:
+    for column, key in KPI_COLUMNS.items():
+        if column in columns:
+            break
+    else:
+        raise ImportFileError("Falta la columna kpi_id o kpi")
+    for required in ("created_at", "value"):
+        if required not in columns:
+            raise ImportFileError(f"Falta la columna {required}")
+    return column, key
+
+
+def _csv_rows(file: BinaryIO, chunk_rows: int) -> Tuple[str, Iterator[List[RawRow]]]:
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    try:
+        header = [column.strip() for column in next(reader, [])]
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFileError(f"CSV inválido: {exc}")
+    column, key = _kpi_column(header)
+    positions = [header.index(name) for name in (column, "created_at", "value")]
+    width = max(positions) + 1
+
+    def chunks() -> Iterator[List[RawRow]]:
+        kpi_at, created_at, value = positions
+        chunk: List[RawRow] = []
+        # La cabecera es la línea 1.
+        line = 1
+        try:
+            for line, row in enumerate(reader, start=2):
+                if len(row) < width:
+                    if not row:
+                        continue
+                    chunk.append((line, None, None, None))
+                else:
+                    chunk.append((line, row[kpi_at], row[created_at], row[value]))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ImportFileError(f"CSV inválido después de la línea {line}: {exc}")
+        if chunk:
+            yield chunk
+
+    return key, chunks()
+
+
+def _parquet_rows(
+    file: BinaryIO, chunk_rows: int
+) -> Tuple[str, Iterator[List[RawRow]]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportFileError("La importación de Parquet requiere pyarrow")
+    try:
+        parquet = pq.ParquetFile(file)
+    except Exception as exc:
+        raise ImportFileError(f"Archivo Parquet inválido: {exc}")
+    column, key = _kpi_column(parquet.schema_arrow.names)
+
+    def chunks() -> Iterator[List[RawRow]]:
+        # Sin cabecera: la línea es el número de fila, desde 1.
+        line = 1
+        for batch in parquet.iter_batches(
+            batch_size=chunk_rows, columns=[column, "created_at", "value"]
+        ):
+            kpis, created_at, values = (
+                batch.column(index).to_pylist() for index in range(3)
+            )
+            yield list(zip(range(line, line + len(kpis)), kpis, created_at, values))
+            line += len(kpis)
+
+    return key, chunks()
+
+
+def read_records(
+    file: BinaryIO,
+    file_format: ImportFormat = ImportFormat.csv,
+    chunk_rows: int = IMPORT_CHUNK_ROWS,
+) -> Tuple[str, Iterator[List[RawRow]]]:
+    """
+    Abre un archivo de registros y comprueba sus columnas.
+
+    Retorna cómo se identifica el KPI (`"id"` o `"name"`) y un iterador de
+    bloques de filas sin validar. Lanza `ImportFileError` si faltan columnas.
+    """
+    if file_format == ImportFormat.parquet:
+        return _parquet_rows(file, chunk_rows)
+    return _csv_rows(file, chunk_rows)
+
+
+def _kpi_key(key: str, value: Any) -> Any:
+    if key == "name":
+        return value.strip() if isinstance(value, str) else value
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return int(value)
+
+
+def _resolve_kpis(
+    connection: Connection, key: str, values: set, kpis: Dict[Any, Optional[int]]
+) -> None:
+    """
+    Añade a `kpis` el id de cada valor de la columna del KPI de `values` que
+    no estuviera ya: `None` si no existe y `0` si el nombre es ambiguo.
+    """
+    pending: Dict[Any, List[Any]] = {}
+    for value in values:
+        if value in kpis:
+            continue
+        kpis[value] = None
+        try:
+            pending.setdefault(_kpi_key(key, value), []).append(value)
+        except (TypeError, ValueError):
+            pass
+
+    keys = list(pending)
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        batch = keys[start : start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in batch)
+        for found, kpi_id in connection.exec_driver_sql(
+            f"SELECT {key}, id FROM kpi WHERE {key} IN ({placeholders})",
+            tuple(batch),
+        ):
+            for value in pending[found]:
+                kpis[value] = 0 if kpis[value] is not None else kpi_id
+
+
+def _validate(
+    chunk: List[RawRow],
+    key: str,
+    connection: Connection,
+    kpis: Dict[Any, Optional[int]],
+) -> Tuple[List[InsertRow], List[Dict[str, Any]]]:
+    """
+    Convierte un bloque en filas `(kpi_id, created_at, value)` válidas y en
+    los errores de las filas descartadas.
+
+    `kpis` guarda entre bloques el id de cada valor ya visto de la columna
+    del KPI, así que solo se consultan los nuevos.
+    """
+    _resolve_kpis(connection, key, {row[1] for row in chunk}, kpis)
+
+    rows = []
+    errors = []
+    for line, kpi, created_at, value in chunk:
+        kpi_id = kpis.get(kpi)
+        if not kpi_id:
+            if kpi is None and created_at is None and value is None:
+                detail = "Faltan columnas"
+            elif kpi_id == 0:
+                detail = "Nombre de KPI ambiguo"
+            else:
+                detail = "KPI no encontrado"
+            errors.append({"line": line, "detail": detail})
+            continue
+        try:
+            if not isinstance(created_at, datetime):
+                created_at = datetime.fromisoformat(created_at)
+            if created_at.tzinfo is not None:
+                created_at = to_utc_naive(created_at)
+        except (TypeError, ValueError):
+            errors.append({"line": line, "detail": "Fecha inválida"})
+            continue
+        try:
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError(value)
+        except (TypeError, ValueError):
+            errors.append({"line": line, "detail": "Valor inválido"})
+            continue
+        # Mismo formato con el que SQLAlchemy guarda los datetime en SQLite.
+        rows.append((kpi_id, created_at.isoformat(" ", "microseconds"), value))
+    return rows, errors
+
+
+def _insert(connection: Connection, rows: List[InsertRow]) -> None:
+    # En el orden del índice (kpi_id, created_at), que se actualiza mucho más
+    # rápido que con filas desordenadas.
+    rows.sort()
+    # Con el trigger del contador: cada fila suma 1 a una sola fila de
+    # `tablecounter` que ya está en caché, y no se modifica el esquema.
+    connection.exec_driver_sql(INSERT_RECORDS, rows)
+    merge_text_records(rows, connection)
+
+
+def import_records(
+    key: str, chunks: Iterator[List[RawRow]], connection: Connection
+) -> Iterator[Dict[str, Any]]:
+    """
+    Valida e inserta los bloques de `read_records`, con una transacción
+    `BEGIN IMMEDIATE` por bloque. `connection` debe estar en modo
+    AUTOCOMMIT (ver `import_connection`).
+
+    Genera el progreso después de cada bloque (filas leídas, creadas y
+    fallidas, y los errores del bloque) y al final un resumen con `done`.
+    Los bloques ya confirmados se quedan aunque falle uno posterior. Si el
+    archivo deja de poderse leer, el último elemento es `{"error": ...}`.
+
+    Los registros importados no se publican en `/live/records`: son
+    históricos.
+    """
+    started = time.perf_counter()
+    kpis: Dict[Any, Optional[int]] = {}
+    total = created = failed = reported = 0
+    chunks = iter(chunks)
+    while True:
+        try:
+            chunk = next(chunks, None)
+        except ImportFileError as exc:
+            yield {"error": str(exc), "rows": total, "created": created}
+            return
+        if chunk is None:
+            break
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            rows, errors = _validate(chunk, key, connection, kpis)
+            if rows:
+                _insert(connection, rows)
+            connection.exec_driver_sql("COMMIT")
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        total += len(chunk)
+        created += len(rows)
+        failed += len(errors)
+        errors = errors[: max(0, IMPORT_MAX_ERRORS - reported)]
+        reported += len(errors)
+        yield {"rows": total, "created": created, "failed": failed, "errors": errors}
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "done": True,
+        "rows": total,
+        "created": created,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed) if elapsed else 0,
+    }
+
+
+@contextmanager
+def import_connection() -> Iterator[Connection]:
+    """
+    Conexión para `import_records`, que gestiona sus propias transacciones.
+    """
+    from app.db import engine
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        yield connection
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Importa registros históricos desde CSV o Parquet"
+    )
+    parser.add_argument("path", help="Archivo a importar")
+    parser.add_argument(
+        "--format",
+        choices=[f.value for f in ImportFormat],
+        default=None,
+        help="Por defecto, según la extensión del archivo",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=IMPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+    file_format = ImportFormat(
+        args.format or ("parquet" if args.path.lower().endswith(".parquet") else "csv")
+    )
+
+    import app.main  # noqa: F401  registra todos los modelos
+    from app.db import init_db
+
+    init_db()
+    with open(args.path, "rb") as file, import_connection() as connection:
+        try:
+            key, chunks = read_records(file, file_format, args.chunk_rows)
+        except ImportFileError as exc:
+            parser.error(str(exc))
+        for progress in import_records(key, chunks, connection):
+            for error in progress.pop("errors", ()):
+                print(f"línea {error['line']}: {error['detail']}", file=sys.stderr)
+            print(json.dumps(progress), file=sys.stderr)
+            if "error" in progress:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import asyncio
+import os
+import socket
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from app import metrics
+
+# Registros nuevos enviados en vivo a los clientes suscritos (Server-Sent
+# Events), en lugar de que cada pestaña vuelva a descargar el historial.
+#
+# Cada worker tiene un `Broadcaster` en memoria. Si se define
+# `LIVE_SOCKET_DIR`, cada worker abre además un socket Unix de datagramas en
+# ese directorio y reenvía a los demás los registros que escribe, así que un
+# cliente conectado a un worker recibe los registros escritos en cualquier
+# otro.
+
+# Eventos pendientes por suscriptor antes de considerarlo atrasado.
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "1000"))
+# Segundos entre comentarios de keep-alive en la conexión SSE.
+LIVE_HEARTBEAT = 15
+LIVE_SOCKET_DIR = os.getenv("LIVE_SOCKET_DIR")
+# Registros por datagrama: mantiene cada mensaje por debajo del tamaño máximo
+# de un datagrama Unix.
+SOCKET_BATCH_SIZE = 500
+# Segundos entre relecturas del directorio de sockets y reintentos de los
+# avisos de `resync` a los workers que perdieron eventos.
+LIVE_PEER_REFRESH = 1.0
+# Con más KPIs afectados, el aviso de `resync` va a todos los suscriptores.
+RESYNC_MAX_KPIS = 5000
+
+
+def record_event(
+    record_id: int,
+    kpi_id: int,
+    value: Decimal,
+    created_at: datetime,
+    sample_count: int = 1,
+) -> Dict[str, Any]:
+    """
+    Registro en el mismo formato JSON que `GET /kpis/{kpi_id}/records`.
+    """
+    return {
+        "value": str(value),
+        "created_at": created_at.isoformat(),
+        "id": record_id,
+        "kpi_id": kpi_id,
+        "sample_count": sample_count,
+    }
+
+
+class Subscription:
+    """
+    Cola acotada de eventos de un cliente.
+
+    Si el cliente no consume lo bastante rápido y la cola se llena, se
+    descartan sus eventos pendientes y se le envía un único evento `resync`:
+    el cliente debe volver a pedir los registros por la API paginada. Así un
+    cliente lento no retiene memoria ni frena a quien escribe.
+    """
+
+    def __init__(self, kpi_ids: Set[int], max_size: int):
+        self.kpi_ids = kpi_ids
+        self.max_size = max_size
+        self.overflowed = False
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, events: List[Dict[str, Any]]) -> None:
+        if self.overflowed:
+            return
+        if len(self._events) + len(events) > self.max_size:
+            self.resync()
+        else:
+            self._events.extend(events)
+            self._ready.set()
+
+    def resync(self) -> None:
+        """
+        Descarta los eventos pendientes y envía un `resync` al cliente.
+        """
+        self._events.clear()
+        self.overflowed = True
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        Espera eventos durante `timeout` segundos y retorna todos los
+        pendientes, o una lista vacía si no llegó ninguno.
+
+        Retorna None si la suscripción se desbordó.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        if self.overflowed:
+            self.overflowed = False
+            return None
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class Broadcaster:
+    """
+    Reparte los registros nuevos entre las suscripciones del proceso,
+    indexadas por KPI.
+    """
+
+    def __init__(self):
+        self._by_kpi: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, kpi_ids: Iterable[int], max_size: int) -> Subscription:
+        subscription = Subscription(set(kpi_ids), max_size)
+        for kpi_id in subscription.kpi_ids:
+            self._by_kpi.setdefault(kpi_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for kpi_id in subscription.kpi_ids:
+            subscribers = self._by_kpi.get(kpi_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_kpi[kpi_id]
+
+    def has_subscribers(self) -> bool:
+        return bool(self._by_kpi)
+
+    def resync(self, kpi_ids: Optional[Iterable[int]] = None) -> None:
+        """
+        Envía un `resync` a las suscripciones de `kpi_ids`, o a todas.
+        """
+        if kpi_ids is None:
+            groups = self._by_kpi.values()
+        else:
+            groups = [self._by_kpi.get(kpi_id, ()) for kpi_id in kpi_ids]
+        for subscription in {s for group in groups for s in group}:
+            subscription.resync()
+
+    def publish_local(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Entrega los eventos a las suscripciones de este proceso. Nunca
+        bloquea: agrupa los eventos por suscripción y los encola de una vez.
+        """
+        if not self._by_kpi:
+            return
+        batches: Dict[Subscription, List[Dict[str, Any]]] = {}
+        for event in events:
+            for subscription in self._by_kpi.get(event["kpi_id"], ()):
+                batches.setdefault(subscription, []).append(event)
+        for subscription, batch in batches.items():
+            subscription.push(batch)
+
+
+class SocketRelay:
+    """
+    Reenvía eventos entre los workers de la misma máquina.
+
+    Cada worker se enlaza a `{directory}/{name}.sock` (por defecto, su pid) y
+    envía los eventos a todos los demás sockets del directorio. La lista de
+    sockets se relee cada `LIVE_PEER_REFRESH` segundos; los de workers que ya
+    no existen se eliminan al fallar el envío.
+
+    Si el buffer de un worker está lleno, sus datagramas se descartan para no
+    bloquear la escritura, se cuentan en `live_relay_dropped_events_total` y
+    se anotan sus KPIs. En cuanto ese worker vuelve a aceptar datagramas
+    recibe un aviso de `resync` para esos KPIs, antes que cualquier evento
+    nuevo, y lo reenvía a sus suscriptores, igual que si se hubiera
+    desbordado su propia cola.
+    """
+
+    def __init__(
+        self, directory: str, broadcaster: Broadcaster, name: Optional[str] = None
+    ):
+        self.directory = directory
+        self.broadcaster = broadcaster
+        self.name = name
+        self.path: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+        self._peers: List[str] = []
+        # KPIs de los eventos que no llegaron a cada worker.
+        self._lagging: Dict[str, Set[int]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        # El pid se toma al arrancar: los workers pueden crearse con fork
+        # después de importar el módulo.
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{self.name or os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self.path)
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._receive)
+        self._refresh()
+
+    def stop(self) -> None:
+        if self._socket is None:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        self._peers = []
+        self._lagging = {}
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data = self._socket.recv(1 << 20)
+            except BlockingIOError:
+                return
+            try:
+                message = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(message, dict):
+                self.broadcaster.resync(message.get("resync"))
+            else:
+                self.broadcaster.publish_local(message)
+
+    def _refresh(self) -> None:
+        self._peers = [
+            entry.path
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".sock") and entry.path != self.path
+        ]
+        for peer in list(self._lagging):
+            if peer not in self._peers:
+                del self._lagging[peer]
+            else:
+                self._send_resync(peer)
+        self._timer = asyncio.get_running_loop().call_later(
+            LIVE_PEER_REFRESH, self._refresh
+        )
+
+    def _forget(self, peer: str) -> None:
+        if peer in self._peers:
+            self._peers.remove(peer)
+        self._lagging.pop(peer, None)
+        try:
+            os.unlink(peer)
+        except FileNotFoundError:
+            pass
+
+    def _sendto(self, message: bytes, peer: str) -> Optional[bool]:
+        """
+        Retorna True si se envió, False si el buffer de `peer` está lleno y
+        None si el worker ya no existe.
+        """
+        try:
+            self._socket.sendto(message, peer)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            self._forget(peer)
+            return None
+        except BlockingIOError:
+            return False
+
+    def _send_resync(self, peer: str) -> bool:
+        kpi_ids = self._lagging[peer]
+        message = orjson.dumps(
+            {"resync": sorted(kpi_ids) if len(kpi_ids) <= RESYNC_MAX_KPIS else None}
+        )
+        sent = self._sendto(message, peer)
+        if sent:
+            del self._lagging[peer]
+        return bool(sent)
+
+    def send(self, events: List[Dict[str, Any]]) -> None:
+        if self._socket is None:
+            return
+        batches = [
+            events[start : start + SOCKET_BATCH_SIZE]
+            for start in range(0, len(events), SOCKET_BATCH_SIZE)
+        ]
+        messages = [orjson.dumps(batch) for batch in batches]
+        for peer in list(self._peers):
+            # Un worker atrasado recibe el `resync` antes que eventos nuevos.
+            sent = 0
+            if peer not in self._lagging or self._send_resync(peer):
+                for message in messages:
+                    if not self._sendto(message, peer):
+                        break
+                    sent += 1
+            if sent < len(batches) and peer in self._peers:
+                dropped = [event for batch in batches[sent:] for event in batch]
+                self._lagging.setdefault(peer, set()).update(
+                    event["kpi_id"] for event in dropped
+                )
+                metrics.live_relay_dropped.inc((), len(dropped))
+
+
+broadcaster = Broadcaster()
+relay: Optional[SocketRelay] = (
+    SocketRelay(LIVE_SOCKET_DIR, broadcaster) if LIVE_SOCKET_DIR else None
+)
+
+
+def listening() -> bool:
+    """
+    Indica si hay algún destinatario posible para los eventos: permite no
+    construirlos cuando nadie los va a recibir.
+    """
+    return relay is not None or broadcaster.has_subscribers()
+
+
+def publish(events: List[Dict[str, Any]]) -> None:
+    """
+    Publica registros ya confirmados en la base de datos a los clientes
+    suscritos de este worker y de los demás.
+    """
+    if not events:
+        return
+    broadcaster.publish_local(events)
+    if relay is not None:
+        relay.send(events)
+
+
+def start() -> None:
+    if relay is not None:
+        relay.start()
+
+
+def stop() -> None:
+    if relay is not None:
+        relay.stop()
+
+
+async def stream_events(kpi_ids: Iterable[int]) -> AsyncIterator[bytes]:
+    """
+    Genera la respuesta SSE de una suscripción a los registros de `kpi_ids`.
+
+    Envía eventos `records` con una lista JSON de registros, eventos `resync`
+    si el cliente se atrasó y un comentario cada `LIVE_HEARTBEAT` segundos.
+    """
+    subscription = broadcaster.subscribe(kpi_ids, LIVE_QUEUE_SIZE)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            events = await subscription.get(LIVE_HEARTBEAT)
+            if events is None:
+                yield b"event: resync\ndata: {}\n\n"
+            elif events:
+                yield b"event: records\ndata: " + orjson.dumps(events) + b"\n\n"
+            else:
+                yield b": keep-alive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,23 @@
+from sqlalchemy.orm import raiseload, selectinload
+
+from app.models.boards import Board
+from app.models.kpis import Kpi
+
+# Perfiles de carga de cada esquema de lectura. Las relaciones que serializa
+# el esquema se cargan con una consulta por relación (selectin), sin importar
+# cuántas filas haya; cualquier otra relación lanza un error en lugar de
+# cargarse de forma perezosa, así que un N+1 nuevo falla en lugar de pasar
+# desapercibido.
+
+# BoardRead: users y catalogs.
+BOARD_READ = (
+    selectinload(Board.users),
+    selectinload(Board.catalogs),
+    raiseload("*"),
+)
+
+# KpiRead: records.
+KPI_READ = (
+    selectinload(Kpi.records),
+    raiseload("*"),
+)
@@ -2,17 +2,42 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.db import create_all_tables
-from app.routers import boards, records, users, catalogs, dashboards, kpis, utils
+from app.metrics import METRICS_ENABLED, MetricsMiddleware
+from app.query_counter import QUERY_COUNT_HEADER_ENABLED, QueryCountMiddleware
+from app.slow_queries import SLOW_QUERY_MS, SlowQueryMiddleware
+from app.routers import (
+    boards,
+    records,
+    users,
+    catalogs,
+    dashboards,
+    kpis,
+    live,
+    metrics,
+    stats,
+    utils,
+)
 
 app = FastAPI(lifespan=create_all_tables)
 
+expose_headers = ["ETag", "X-Next-Cursor"]
+if QUERY_COUNT_HEADER_ENABLED:
+    expose_headers.append("X-Query-Count")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=expose_headers,
 )
+if QUERY_COUNT_HEADER_ENABLED:
+    app.add_middleware(QueryCountMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if SLOW_QUERY_MS > 0:
+    app.add_middleware(SlowQueryMiddleware)
 
 routers = [
     users.router,
@@ -21,6 +46,9 @@ routers = [
     dashboards.router,
     kpis.router,
     records.router,
+    live.router,
+    metrics.router,
+    stats.router,
     utils.router,
 ]
 
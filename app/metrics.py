@@ -0,0 +1,193 @@
+import bisect
+import os
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from app.query_counter import count_queries
+
+# Métricas de la aplicación en formato de texto de Prometheus.
+#
+# Se guardan en memoria de cada proceso: con varios workers, cada uno expone
+# las suyas en `/metrics`.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# Las peticiones que no coinciden con ninguna ruta se agrupan en una sola
+# etiqueta para no crear una serie por cada URL desconocida.
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, labels: Labels, amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """
+    Histograma con límites fijos. Cada observación es una búsqueda binaria y
+    un incremento; los contadores acumulados se calculan al exportar.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # Por etiqueta: [cuenta por límite..., cuenta > último límite], suma
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                bucket_labels = _format_labels(labels + (("le", le),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+requests_total = Counter("http_requests_total", "Peticiones HTTP atendidas.")
+requests_in_progress = Gauge("http_requests_in_progress", "Peticiones HTTP en curso.")
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta.",
+    LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_sql_queries",
+    "Sentencias SQL ejecutadas por petición.",
+    QUERY_BUCKETS,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds",
+    "Tiempo en la base de datos por petición.",
+    DB_TIME_BUCKETS,
+)
+live_relay_dropped = Counter(
+    "live_relay_dropped_events_total",
+    "Registros en vivo que no se pudieron reenviar a otro worker.",
+)
+REGISTRY = (
+    requests_total,
+    requests_in_progress,
+    request_duration,
+    request_queries,
+    request_db_time,
+    live_relay_dropped,
+)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP: duración, sentencias SQL,
+    tiempo en la base de datos y peticiones en curso.
+
+    La ruta es la plantilla de la ruta de FastAPI (`/kpis/{kpi_id}`), no la
+    URL. Las respuestas de Server-Sent Events dejan de contarse como en curso
+    al enviar las cabeceras y no se incluyen en los histogramas, porque duran
+    lo que dure la conexión.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = (("method", method),)
+        requests_in_progress.inc(in_progress)
+        status_code = 500
+        streaming = False
+        started = time.perf_counter()
+
+        async def send_with_metrics(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(
+                        b"text/event-stream"
+                    ):
+                        streaming = True
+                        requests_in_progress.dec(in_progress)
+            await send(message)
+
+        try:
+            with count_queries() as queries:
+                await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = scope.get("route")
+            labels = (
+                ("method", method),
+                ("route", route.path if route is not None else UNMATCHED_ROUTE),
+            )
+            requests_total.inc(labels + (("status", str(status_code)),))
+            if not streaming:
+                requests_in_progress.dec(in_progress)
+                request_duration.observe(labels, time.perf_counter() - started)
+                request_queries.observe(labels, queries.count)
+                request_db_time.observe(labels, queries.duration)
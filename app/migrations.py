@@ -0,0 +1,270 @@
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Connection, Engine, Table
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+from sqlmodel import SQLModel
+
+import app.models.stats  # noqa: F401  registra TableCounter
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def _sql(*statements: str) -> Callable[[Connection], None]:
+    def apply(connection: Connection) -> None:
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+    return apply
+
+
+# Tablas cuyo número de filas se mantiene en `tablecounter`.
+COUNTED_TABLES = ("user", "board", "catalog", "kpi", "dashboard", "records")
+
+
+def _counter_statements(table: str) -> List[str]:
+    """
+    Sentencias que inicializan el contador de `table` y crean sus triggers.
+    """
+    return [
+        f"INSERT OR REPLACE INTO tablecounter (name, rows)"
+        f" SELECT '{table}', COUNT(*) FROM \"{table}\"",
+        *_counter_triggers(table),
+    ]
+
+
+def _counter_triggers(table: str) -> List[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS tablecounter_{table}_insert"
+        f' AFTER INSERT ON "{table}" BEGIN'
+        f" UPDATE tablecounter SET rows = rows + 1 WHERE name = '{table}'; END",
+        f"CREATE TRIGGER IF NOT EXISTS tablecounter_{table}_delete"
+        f' AFTER DELETE ON "{table}" BEGIN'
+        f" UPDATE tablecounter SET rows = rows - 1 WHERE name = '{table}'; END",
+    ]
+
+
+# Tablas con contador de versión, incrementado en cada escritura. Se usa para
+# generar ETags de los endpoints de lectura.
+VERSIONED_TABLES = (
+    "user",
+    "board",
+    "catalog",
+    "kpi",
+    "dashboard",
+    "dboards",
+    "color",
+    "chart",
+    "icon",
+)
+
+
+def _version_statements(table: str) -> List[str]:
+    """
+    Sentencias que crean los triggers que incrementan la versión de `table`.
+    """
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS tableversion_{table}_{event.lower()}"
+        f' AFTER {event} ON "{table}" BEGIN'
+        f" UPDATE tablecounter SET version = version + 1 WHERE name = '{table}'; END"
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+def _add_table_versions(connection: Connection) -> None:
+    columns = [
+        row[1] for row in connection.exec_driver_sql("PRAGMA table_info(tablecounter)")
+    ]
+    if "version" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE tablecounter ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+        )
+    for table in VERSIONED_TABLES:
+        statements = _version_statements(table)
+        if table not in COUNTED_TABLES:
+            statements = _counter_statements(table) + statements
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+
+# Índices creados por la migración 1.
+INDEX_STATEMENTS = (
+    "CREATE INDEX IF NOT EXISTS ix_records_kpi_id_created_at"
+    " ON records (kpi_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_kpi_catalog_id_position_index"
+    " ON kpi (catalog_id, position_index)",
+    "CREATE INDEX IF NOT EXISTS ix_kpi_color_schema ON kpi (color_schema)",
+    "CREATE INDEX IF NOT EXISTS ix_kpi_chart_type ON kpi (chart_type)",
+    "CREATE INDEX IF NOT EXISTS ix_catalog_board_id ON catalog (board_id)",
+    "CREATE INDEX IF NOT EXISTS ix_board_icon_id ON board (icon_id)",
+    "CREATE INDEX IF NOT EXISTS ix_dboards_user_id_board_id"
+    " ON dboards (user_id, board_id)",
+    "CREATE INDEX IF NOT EXISTS ix_dboards_board_id ON dboards (board_id)",
+    "CREATE INDEX IF NOT EXISTS ix_dashboard_user_id ON dashboard (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_color_abbrev ON color (abbrev)",
+    "CREATE INDEX IF NOT EXISTS ix_chart_abbrev ON chart (abbrev)",
+    "CREATE INDEX IF NOT EXISTS ix_icon_abbrev ON icon (abbrev)",
+)
+
+# Migración 6: una sola asociación por board y usuario. Se conserva la más
+# antigua de cada par repetido. El índice único también sirve para buscar por
+# board, así que reemplaza a `ix_dboards_board_id`.
+UNIQUE_MEMBERSHIP_STATEMENTS = (
+    "DELETE FROM dboards WHERE id NOT IN"
+    " (SELECT MIN(id) FROM dboards GROUP BY board_id, user_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_dboards_board_id_user_id"
+    " ON dboards (board_id, user_id)",
+    "DROP INDEX IF EXISTS ix_dboards_board_id",
+)
+
+
+def _outdated_foreign_keys(connection: Connection, table: Table) -> bool:
+    on_delete = {
+        row[3]: row[6].upper()
+        for row in connection.exec_driver_sql(
+            f'PRAGMA foreign_key_list("{table.name}")'
+        )
+    }
+    return any(
+        on_delete.get(fk.parent.name, "NO ACTION") != (fk.ondelete or "NO ACTION")
+        for fk in table.foreign_keys
+    )
+
+
+def _remove_orphans(connection: Connection, table: Table) -> None:
+    # Deja los datos como habrían quedado si las claves foráneas hubieran
+    # existido: se borran o se ponen a NULL las filas cuyo padre ya no existe.
+    for fk in table.foreign_keys:
+        if fk.ondelete not in ("CASCADE", "SET NULL"):
+            continue
+        column, parent = fk.parent.name, fk.column
+        orphan = (
+            f'"{column}" IS NOT NULL AND "{column}" NOT IN'
+            f' (SELECT "{parent.name}" FROM "{parent.table.name}")'
+        )
+        if fk.ondelete == "CASCADE":
+            connection.exec_driver_sql(f'DELETE FROM "{table.name}" WHERE {orphan}')
+        else:
+            connection.exec_driver_sql(
+                f'UPDATE "{table.name}" SET "{column}" = NULL WHERE {orphan}'
+            )
+
+
+def _rebuild_table(connection: Connection, table: Table) -> None:
+    # SQLite no permite modificar claves foráneas: se crea la tabla nueva, se
+    # copian las filas y se reemplaza la anterior. Al borrar la tabla se
+    # borran también sus índices y triggers, que se vuelven a crear.
+    name, new_name = table.name, f"{table.name}__new"
+    quoted = connection.dialect.identifier_preparer.quote(name)
+    create = str(CreateTable(table).compile(connection)).strip()
+    create = create.replace(f"CREATE TABLE {quoted}", f'CREATE TABLE "{new_name}"', 1)
+
+    old_columns = {
+        row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{name}")')
+    }
+    columns = ", ".join(
+        f'"{column.name}"' for column in table.columns if column.name in old_columns
+    )
+    connection.exec_driver_sql(create)
+    connection.exec_driver_sql(
+        f'INSERT INTO "{new_name}" ({columns}) SELECT {columns} FROM "{name}"'
+    )
+    connection.exec_driver_sql(f'DROP TABLE "{name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{new_name}" RENAME TO "{name}"')
+
+    for index in table.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+    triggers = []
+    if name in COUNTED_TABLES or name in VERSIONED_TABLES:
+        triggers += _counter_triggers(name)
+    if name in VERSIONED_TABLES:
+        triggers += _version_statements(name)
+    for statement in triggers:
+        connection.exec_driver_sql(statement)
+
+
+def _add_foreign_key_actions(connection: Connection) -> None:
+    tables = [
+        table
+        for table in SQLModel.metadata.sorted_tables
+        if _outdated_foreign_keys(connection, table)
+    ]
+    # Padres antes que hijos: un KPI huérfano que se borra deja huérfanos a
+    # sus registros.
+    for table in tables:
+        _remove_orphans(connection, table)
+    for table in tables:
+        _rebuild_table(connection, table)
+    for statement in INDEX_STATEMENTS:
+        connection.exec_driver_sql(statement)
+
+    if connection.exec_driver_sql("PRAGMA foreign_key_check").first() is not None:
+        raise RuntimeError("Foreign key check failed after rebuilding tables")
+
+
+def _add_missing_columns(connection: Connection) -> None:
+    # Columnas nuevas de los modelos que una base de datos existente no tiene.
+    # Las tablas recién creadas ya las tienen.
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {
+            row[1]
+            for row in connection.exec_driver_sql(f'PRAGMA table_info("{table.name}")')
+        }
+        for column in table.columns:
+            if column.name not in existing:
+                definition = str(CreateColumn(column).compile(connection))
+                connection.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN {definition}'
+                )
+
+
+# Cada migración se aplica una sola vez, en orden. La versión aplicada se
+# guarda en `PRAGMA user_version`. No se deben modificar migraciones ya
+# publicadas: los cambios nuevos van en una migración nueva.
+MIGRATIONS: List[Migration] = [
+    (
+        1,
+        "Índices para las consultas frecuentes",
+        _sql(*INDEX_STATEMENTS),
+    ),
+    (
+        2,
+        "Contadores de filas mantenidos por triggers",
+        _sql(*(sql for table in COUNTED_TABLES for sql in _counter_statements(table))),
+    ),
+    (3, "Versiones por tabla para ETags", _add_table_versions),
+    (4, "Borrado en cascada en las claves foráneas", _add_foreign_key_actions),
+    (5, "Retención de registros", _add_missing_columns),
+    (6, "Asociaciones únicas de boards", _sql(*UNIQUE_MEMBERSHIP_STATEMENTS)),
+]
+
+
+def upgrade(engine: Engine) -> int:
+    """
+    Crea las tablas que falten y aplica las migraciones pendientes.
+
+    Todo ocurre en una transacción `BEGIN IMMEDIATE`, así que si varios
+    workers arrancan a la vez solo uno migra y los demás esperan y no
+    encuentran nada pendiente. Retorna la versión final del esquema.
+
+    Las claves foráneas se desactivan durante la migración (no se puede hacer
+    dentro de la transacción) para poder reconstruir tablas sin que borrar la
+    tabla anterior dispare los borrados en cascada.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            SQLModel.metadata.create_all(connection)
+            version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            for number, _, apply in MIGRATIONS:
+                if number > version:
+                    apply(connection)
+                    connection.exec_driver_sql(f"PRAGMA user_version = {number}")
+                    version = number
+            connection.exec_driver_sql("COMMIT")
+        except Exception:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        finally:
+            connection.exec_driver_sql("PRAGMA foreign_keys = ON")
+    return version
@@ -8,11 +8,15 @@ from app.models.utils import Icon
 
 class BoardBase(SQLModel):
     name: str
-    icon_id: Optional[int] = Field(foreign_key="icon.id")
+    icon_id: Optional[int] = Field(foreign_key="icon.id", ondelete="SET NULL")
 
 
 class Board(BoardBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    users: List["User"] = Relationship(back_populates="boards", link_model=DBoards)
-    catalogs: List["Catalog"] = Relationship(back_populates="board")
+    users: List["User"] = Relationship(
+        back_populates="boards", link_model=DBoards, passive_deletes=True
+    )
+    catalogs: List["Catalog"] = Relationship(
+        back_populates="board", passive_deletes=True
+    )
     icon: Optional["Icon"] = Relationship(back_populates="board")
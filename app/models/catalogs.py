@@ -1,13 +1,18 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 
+from app.schemas.records import BucketWidth
+
 
 class CatalogBase(SQLModel):
     name: str
+    # Retención por defecto de los KPIs del catálogo (ver `KpiBase`).
+    retention_days: Optional[int] = Field(default=None, ge=1)
+    retention_bucket: Optional[BucketWidth] = None
 
 
 class Catalog(CatalogBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    board_id: Optional[int] = Field(foreign_key="board.id")
+    board_id: Optional[int] = Field(foreign_key="board.id", ondelete="CASCADE")
     board: Optional["Board"] = Relationship(back_populates="catalogs")
-    kpis: List["Kpi"] = Relationship(back_populates="catalog")
+    kpis: List["Kpi"] = Relationship(back_populates="catalog", passive_deletes=True)
@@ -6,7 +6,9 @@ from app.models.users import User
 
 
 class DashboardBase(SQLModel):
-    user_id: uuid.UUID = Field(default_factory=uuid.uuid4, foreign_key="user.id")
+    user_id: uuid.UUID = Field(
+        default_factory=uuid.uuid4, foreign_key="user.id", ondelete="CASCADE"
+    )
 
 
 class Dashboard(DashboardBase, table=True):
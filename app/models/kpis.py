@@ -4,6 +4,7 @@ from typing import List, Optional
 from app.models.catalogs import Catalog
 from app.models.records import Records
 from app.models.utils import Chart, Color
+from app.schemas.records import BucketWidth
 
 
 class KpiBase(SQLModel):
@@ -11,14 +12,18 @@ class KpiBase(SQLModel):
     description: Optional[str] = None
     formula: Optional[str] = None
     position_index: Optional[int] = Field(default=None)
+    # Retención: días que se guardan los registros tal cual; los anteriores se
+    # compactan a un registro por intervalo. Si es None se usa la del catálogo.
+    retention_days: Optional[int] = Field(default=None, ge=1)
+    retention_bucket: Optional[BucketWidth] = None
 
 
 class Kpi(KpiBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    catalog_id: Optional[int] = Field(foreign_key="catalog.id")
-    color_schema: Optional[int] = Field(foreign_key="color.id")
-    chart_type: Optional[int] = Field(foreign_key="chart.id")
+    catalog_id: Optional[int] = Field(foreign_key="catalog.id", ondelete="CASCADE")
+    color_schema: Optional[int] = Field(foreign_key="color.id", ondelete="SET NULL")
+    chart_type: Optional[int] = Field(foreign_key="chart.id", ondelete="SET NULL")
     catalog: Optional["Catalog"] = Relationship(back_populates="kpis")
     color: Optional["Color"] = Relationship(back_populates="kpi")
     chart: Optional["Chart"] = Relationship(back_populates="kpi")
-    records: List["Records"] = Relationship(back_populates="kpi")
+    records: List["Records"] = Relationship(back_populates="kpi", passive_deletes=True)
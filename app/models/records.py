@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from sqlalchemy import text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 from decimal import Decimal
@@ -11,5 +12,8 @@ class RecordBase(SQLModel):
 
 class Records(RecordBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    kpi_id: Optional[int] = Field(foreign_key="kpi.id")
+    kpi_id: Optional[int] = Field(foreign_key="kpi.id", ondelete="CASCADE")
+    # Registros originales que representa: más de 1 en los registros que la
+    # retención compacta (el promedio de un intervalo).
+    sample_count: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
     kpi: Optional["Kpi"] = Relationship(back_populates="records")
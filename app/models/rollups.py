@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class RecordRollupBase(SQLModel):
+    kpi_id: int = Field(foreign_key="kpi.id", primary_key=True, ondelete="CASCADE")
+    bucket: datetime = Field(primary_key=True)
+    count: int
+    sum: float
+    min: float
+    max: float
+
+
+class RecordRollupHourly(RecordRollupBase, table=True):
+    pass
+
+
+class RecordRollupDaily(RecordRollupBase, table=True):
+    pass
@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+
+
+class TableCounter(SQLModel, table=True):
+    """
+    Número de filas y versión de una tabla, mantenidos por triggers.
+
+    - **rows**: Se actualiza al insertar y eliminar.
+    - **version**: Se incrementa en cada inserción, actualización o eliminación.
+    """
+
+    name: str = Field(primary_key=True)
+    rows: int = 0
+    # Con valor por defecto en SQL porque los triggers insertan sin `version`.
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
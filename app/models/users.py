@@ -17,5 +17,7 @@ class UserBase(SQLModel):
 
 class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    dashboard: "Dashboard" = Relationship(back_populates="users")
-    boards: List["Board"] = Relationship(back_populates="users", link_model=DBoards)
+    dashboard: "Dashboard" = Relationship(back_populates="users", passive_deletes=True)
+    boards: List["Board"] = Relationship(
+        back_populates="users", link_model=DBoards, passive_deletes=True
+    )
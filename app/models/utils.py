@@ -10,7 +10,7 @@ class ColorBase(SQLModel):
 
 class Color(ColorBase, table=True):
     id: int = Field(default=None, primary_key=True)
-    kpi: Optional["Kpi"] = Relationship(back_populates="color")
+    kpi: Optional["Kpi"] = Relationship(back_populates="color", passive_deletes=True)
 
 
 class ChartBase(SQLModel):
@@ -21,7 +21,7 @@ class ChartBase(SQLModel):
 
 class Chart(ChartBase, table=True):
     id: int = Field(default=None, primary_key=True)
-    kpi: Optional["Kpi"] = Relationship(back_populates="chart")
+    kpi: Optional["Kpi"] = Relationship(back_populates="chart", passive_deletes=True)
 
 
 class IconBase(SQLModel):
@@ -32,4 +32,4 @@ class IconBase(SQLModel):
 
 class Icon(IconBase, table=True):
     id: int = Field(default=None, primary_key=True)
-    board: Optional["Board"] = Relationship(back_populates="icon")
+    board: Optional["Board"] = Relationship(back_populates="icon", passive_deletes=True)
@@ -0,0 +1,97 @@
+import bisect
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.kpis import Kpi
+
+# Separación entre posiciones consecutivas al numerar desde cero. Deja sitio
+# para insertar elementos entre dos vecinos sin tocar el resto.
+POSITION_GAP = 1024
+
+
+def _longest_increasing(positions: List[Optional[int]]) -> List[int]:
+    """
+    Índices de la subsecuencia estrictamente creciente más larga de `positions`
+    (ignorando los `None`).
+    """
+    tails: List[int] = []
+    tail_indexes: List[int] = []
+    previous: List[Optional[int]] = [None] * len(positions)
+    for index, position in enumerate(positions):
+        if position is None:
+            continue
+        slot = bisect.bisect_left(tails, position)
+        if slot > 0:
+            previous[index] = tail_indexes[slot - 1]
+        if slot == len(tails):
+            tails.append(position)
+            tail_indexes.append(index)
+        else:
+            tails[slot] = position
+            tail_indexes[slot] = index
+
+    result = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        result.append(index)
+        index = previous[index]
+    return result[::-1]
+
+
+def rebalance(count: int) -> List[int]:
+    """
+    Posiciones equiespaciadas para `count` elementos.
+    """
+    return [POSITION_GAP * (index + 1) for index in range(count)]
+
+
+def plan_positions(positions: List[Optional[int]]) -> List[int]:
+    """
+    Calcula las posiciones para un nuevo orden cambiando las menos posibles.
+
+    - **positions**: Posición actual de cada elemento, ya en el orden deseado.
+
+    Los elementos de la subsecuencia creciente más larga conservan su
+    posición; el resto recibe posiciones en el hueco entre sus vecinos. Mover
+    un solo elemento cambia una sola posición. Si algún hueco no alcanza, se
+    renumeran todos con `rebalance`.
+    """
+    kept = _longest_increasing(positions)
+    if not kept:
+        return rebalance(len(positions))
+
+    planned: List[int] = [0] * len(positions)
+    for index in kept:
+        planned[index] = positions[index]
+
+    anchors = [-1] + kept + [len(positions)]
+    for lower, upper in zip(anchors, anchors[1:]):
+        count = upper - lower - 1
+        if count == 0:
+            continue
+        if upper == len(positions):
+            start = planned[lower]
+            step = POSITION_GAP
+        else:
+            start = planned[lower] if lower >= 0 else 0
+            step = (planned[upper] - start) // (count + 1)
+            if step < 1:
+                return rebalance(len(positions))
+        for offset in range(count):
+            planned[lower + 1 + offset] = start + step * (offset + 1)
+    return planned
+
+
+async def next_position(catalog_id: int, session: AsyncSession) -> int:
+    """
+    Posición para añadir un KPI al final de un catálogo.
+    """
+    last = (
+        await session.exec(
+            select(func.max(Kpi.position_index)).where(Kpi.catalog_id == catalog_id)
+        )
+    ).one()
+    return (last or 0) + POSITION_GAP
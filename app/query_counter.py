@@ -0,0 +1,107 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import Engine, event
+
+# Cabecera de depuración: desactivada por defecto en producción.
+QUERY_COUNT_HEADER_ENABLED = os.getenv("QUERY_COUNT_HEADER", "0") == "1"
+QUERY_COUNT_HEADER = b"x-query-count"
+
+
+class QueryCount:
+    """
+    Número de sentencias SQL ejecutadas dentro de un `count_queries()` y
+    segundos que tardaron.
+
+    Los bloques anidados también cuentan en el bloque exterior.
+    """
+
+    def __init__(self, parent: Optional["QueryCount"] = None):
+        self.count = 0
+        self.duration = 0.0
+        self.parent = parent
+
+
+_current: ContextVar[Optional[QueryCount]] = ContextVar("query_count", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        context._query_started = time.perf_counter()
+    while counter is not None:
+        counter.count += 1
+        counter = counter.parent
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    started = getattr(context, "_query_started", None)
+    if counter is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    while counter is not None:
+        counter.duration += elapsed
+        counter = counter.parent
+
+
+def instrument(engine: Engine) -> None:
+    """
+    Registra el contador de consultas en un engine síncrono (para un engine
+    asíncrono, pasar `async_engine.sync_engine`).
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCount]:
+    """
+    Cuenta las sentencias SQL ejecutadas dentro del bloque.
+
+        with count_queries() as queries:
+            ...
+        assert queries.count == 3
+
+    Cuenta las consultas hechas en el mismo contexto, incluidas las de
+    sesiones asíncronas y las de tareas creadas dentro del bloque.
+    """
+    counter = QueryCount(_current.get())
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+class QueryCountMiddleware:
+    """
+    Middleware ASGI que añade la cabecera `X-Query-Count` con el número de
+    consultas ejecutadas por la petición antes de enviar la respuesta. Solo
+    se instala con `QUERY_COUNT_HEADER=1`.
+
+    En respuestas en streaming solo cuenta las consultas previas a las
+    cabeceras.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as queries:
+
+            async def send_with_count(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((QUERY_COUNT_HEADER, str(queries.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
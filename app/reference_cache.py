@@ -0,0 +1,99 @@
+import asyncio
+from typing import Dict, Generic, List, Optional, Type, TypeVar
+
+from sqlalchemy import ColumnElement, func
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud.stats import get_table_versions
+from app.models.stats import TableCounter
+from app.models.utils import Chart, Color, Icon
+
+Model = TypeVar("Model", bound=SQLModel)
+
+
+class ReferenceCache(Generic[Model]):
+    """
+    Copia en memoria de una tabla de referencia pequeña, indexada por `id` y
+    por `abbrev`.
+
+    Antes de cada lectura se compara la versión guardada con la de
+    `tablecounter` (una búsqueda por clave primaria); si otra petición u otro
+    worker escribió en la tabla, la copia se recarga completa. Así la caché es
+    correcta con varios workers sin necesidad de invalidarla entre procesos.
+
+    Si quien llama ya leyó la versión (el ETag del endpoint o
+    `version_column` en otra consulta), la pasa como `version` y la lectura
+    no hace ninguna consulta mientras la tabla no cambie.
+    """
+
+    def __init__(self, model: Type[Model], table: str):
+        self.model = model
+        self.table = table
+        self._version: Optional[int] = None
+        self._by_id: Dict[int, Model] = {}
+        self._by_abbrev: Dict[str, Model] = {}
+        self._lock = asyncio.Lock()
+
+    def version_column(self) -> ColumnElement[int]:
+        """
+        Subconsulta con la versión actual de la tabla, para leerla junto con
+        otra consulta.
+        """
+        return func.coalesce(
+            select(TableCounter.version)
+            .where(TableCounter.name == self.table)
+            .scalar_subquery(),
+            0,
+        )
+
+    async def _refresh(self, session: AsyncSession, version: Optional[int]) -> None:
+        if version is None:
+            (version,) = await get_table_versions([self.table], session)
+        if version == self._version:
+            return
+        async with self._lock:
+            if version == self._version:
+                return
+            # Solo las columnas: las filas se copian a instancias fuera de la
+            # sesión para compartirlas entre peticiones.
+            rows = await session.exec(select(*self.model.__table__.columns))
+            copies = [self.model(**row._mapping) for row in rows]
+            self._by_id = {row.id: row for row in copies}
+            self._by_abbrev = {}
+            for row in copies:
+                self._by_abbrev.setdefault(row.abbrev, row)
+            self._version = version
+
+    async def all(
+        self, session: AsyncSession, version: Optional[int] = None
+    ) -> List[Model]:
+        await self._refresh(session, version)
+        return list(self._by_id.values())
+
+    async def by_id(
+        self, session: AsyncSession, version: Optional[int] = None
+    ) -> Dict[int, Model]:
+        """
+        Filas por `id`, para resolver muchas referencias con una sola
+        comprobación de la versión.
+        """
+        await self._refresh(session, version)
+        return self._by_id
+
+    async def get_by_abbrev(
+        self, abbrev: str, session: AsyncSession, version: Optional[int] = None
+    ) -> Optional[Model]:
+        await self._refresh(session, version)
+        return self._by_abbrev.get(abbrev)
+
+    def invalidate(self) -> None:
+        """
+        Descarta la copia local; la siguiente lectura recarga la tabla.
+        """
+        self._version = None
+
+
+colors = ReferenceCache(Color, "color")
+charts = ReferenceCache(Chart, "chart")
+icons = ReferenceCache(Icon, "icon")
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Connection, delete, func, insert, literal, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.types import DateTime
+
+from app.buckets import bucket_expression, sample_avg, sample_count, to_utc_naive
+from app.models.catalogs import Catalog
+from app.models.kpis import Kpi
+from app.models.records import Records
+from app.schemas.records import BucketWidth
+
+# Retención de registros.
+#
+# Cada KPI (o, si no lo define, su catálogo) puede fijar `retention_days`:
+# los registros más antiguos se compactan a un registro por intervalo de
+# `retention_bucket` (por defecto una hora) con el promedio de sus valores y
+# `sample_count` con el número de registros originales. Los rollups no
+# cambian: siguen teniendo el conteo, la suma, el mínimo y el máximo exactos.
+#
+# La compactación avanza por lotes de intervalos completos con como mucho
+# `RETENTION_BATCH_ROWS` registros, cada uno en su propia transacción, así
+# que nunca retiene el bloqueo de escritura más que unos milisegundos. No
+# guarda estado: un intervalo ya compactado tiene un solo registro y no se
+# vuelve a tocar, así que se puede interrumpir y reanudar en cualquier punto.
+#
+#     python -m app.retention
+#
+# Con `RETENTION_INTERVAL` (segundos, por defecto 0: desactivado) cada
+# worker ejecuta además una pasada completa en segundo plano a ese intervalo.
+
+logger = logging.getLogger(__name__)
+
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "0"))
+RETENTION_BATCH_ROWS = int(os.getenv("RETENTION_BATCH_ROWS", "1000"))
+# Pausa entre lotes para dejar pasar a otros escritores.
+RETENTION_PAUSE_MS = int(os.getenv("RETENTION_PAUSE_MS", "50"))
+DEFAULT_RETENTION_BUCKET = BucketWidth.hour
+
+# (kpi_id, días de retención, intervalo de compactación)
+Policy = Tuple[int, int, BucketWidth]
+
+
+def retention_policies(connection: Connection) -> List[Policy]:
+    """
+    Retención efectiva de cada KPI que tiene una: la del KPI o, si no, la de
+    su catálogo.
+    """
+    days = func.coalesce(Kpi.retention_days, Catalog.retention_days)
+    bucket = func.coalesce(Kpi.retention_bucket, Catalog.retention_bucket)
+    rows = connection.execute(
+        select(Kpi.id, days, bucket)
+        .outerjoin(Catalog, Catalog.id == Kpi.catalog_id)
+        .where(days.is_not(None))
+        .order_by(Kpi.id)
+    )
+    return [
+        (kpi_id, kpi_days, BucketWidth(kpi_bucket or DEFAULT_RETENTION_BUCKET))
+        for kpi_id, kpi_days, kpi_bucket in rows
+    ]
+
+
+def _bucket_start(connection: Connection, value: datetime, width: BucketWidth):
+    # Inicio del intervalo que contiene `value`, con las mismas reglas de
+    # SQLite que las agregaciones.
+    start = connection.execute(
+        select(bucket_expression(literal(value, DateTime()), width))
+    ).scalar()
+    return datetime.fromisoformat(start)
+
+
+def _batch_end(
+    connection: Connection,
+    kpi_id: int,
+    width: BucketWidth,
+    start: datetime,
+    cutoff: datetime,
+    batch_rows: int,
+) -> datetime:
+    """
+    Fin del siguiente lote: el inicio del intervalo de la fila `batch_rows`
+    desde `start`, para no partir intervalos. Si un solo intervalo tiene más
+    filas, el lote es ese intervalo.
+    """
+    in_range = (
+        Records.kpi_id == kpi_id,
+        Records.created_at >= start,
+        Records.created_at < cutoff,
+    )
+    bucket_column = bucket_expression(Records.created_at, width)
+    boundary = connection.execute(
+        select(bucket_column)
+        .where(*in_range)
+        .order_by(Records.created_at)
+        .offset(batch_rows)
+        .limit(1)
+    ).scalar()
+    if boundary is None:
+        return cutoff
+    end = datetime.fromisoformat(boundary)
+    if end > start:
+        return end
+    following = connection.execute(
+        select(bucket_column)
+        .where(*in_range, bucket_column > start.isoformat(" "))
+        .order_by(Records.created_at)
+        .limit(1)
+    ).scalar()
+    return cutoff if following is None else datetime.fromisoformat(following)
+
+
+def _compact_range(
+    connection: Connection,
+    kpi_id: int,
+    width: BucketWidth,
+    start: datetime,
+    end: datetime,
+) -> Tuple[int, int]:
+    """
+    Reemplaza los registros de cada intervalo de [start, end) que tenga más
+    de uno por un registro con su promedio. Retorna (eliminados, creados).
+    """
+    bucket_column = bucket_expression(Records.created_at, width)
+    in_range = (
+        Records.kpi_id == kpi_id,
+        Records.created_at >= start,
+        Records.created_at < end,
+    )
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        last_id = connection.execute(select(func.max(Records.id))).scalar() or 0
+        created = connection.execute(
+            insert(Records).from_select(
+                ["kpi_id", "value", "created_at", "sample_count"],
+                select(
+                    Records.kpi_id,
+                    sample_avg(),
+                    # Mismo formato con el que SQLAlchemy guarda los datetime.
+                    bucket_column.concat(".000000"),
+                    sample_count(),
+                )
+                .where(*in_range)
+                .group_by(bucket_column)
+                .having(func.count() > 1),
+            )
+        ).rowcount
+        removed = 0
+        if created:
+            # Alias: sin él, la subconsulta se correlaciona con la tabla del DELETE.
+            new = aliased(Records)
+            compacted = select(bucket_expression(new.created_at, width)).where(
+                new.kpi_id == kpi_id, new.id > last_id
+            )
+            removed = connection.execute(
+                delete(Records).where(
+                    *in_range, Records.id <= last_id, bucket_column.in_(compacted)
+                )
+            ).rowcount
+        connection.exec_driver_sql("COMMIT")
+    except BaseException:
+        connection.exec_driver_sql("ROLLBACK")
+        raise
+    return removed, created
+
+
+def compact(
+    connection: Connection,
+    now: Optional[datetime] = None,
+    batch_rows: int = RETENTION_BATCH_ROWS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Compacta los registros de todos los KPIs con retención.
+
+    `connection` debe estar en modo AUTOCOMMIT: cada lote abre su propia
+    transacción `BEGIN IMMEDIATE`. Genera un elemento por lote con el KPI, el
+    rango, los registros eliminados y creados, y los milisegundos que duró la
+    transacción.
+    """
+    now = now or to_utc_naive(datetime.now(timezone.utc))
+    for kpi_id, days, width in retention_policies(connection):
+        cutoff = _bucket_start(connection, now - timedelta(days=days), width)
+        oldest = connection.execute(
+            select(func.min(Records.created_at)).where(
+                Records.kpi_id == kpi_id, Records.created_at < cutoff
+            )
+        ).scalar()
+        if oldest is None:
+            continue
+        start = _bucket_start(connection, oldest, width)
+        while start < cutoff:
+            end = _batch_end(connection, kpi_id, width, start, cutoff, batch_rows)
+            started = time.perf_counter()
+            removed, created = _compact_range(connection, kpi_id, width, start, end)
+            yield {
+                "kpi_id": kpi_id,
+                "since": start.isoformat(),
+                "until": end.isoformat(),
+                "removed": removed,
+                "created": created,
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+            start = end
+
+
+def _connect():
+    from app.db import engine
+
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+async def compact_in_background() -> Dict[str, int]:
+    """
+    Ejecuta una pasada de `compact` sin bloquear el event loop: cada lote en
+    un hilo, con una pausa de `RETENTION_PAUSE_MS` entre lotes.
+    """
+    totals = {"batches": 0, "removed": 0, "created": 0}
+    with _connect() as connection:
+        batches = compact(connection)
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                return totals
+            totals["batches"] += 1
+            totals["removed"] += batch["removed"]
+            totals["created"] += batch["created"]
+            await asyncio.sleep(RETENTION_PAUSE_MS / 1000)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _run(interval: int) -> None:
+    while True:
+        try:
+            totals = await compact_in_background()
+            if totals["removed"]:
+                logger.info("Retención: %s", totals)
+        except Exception:
+            logger.exception("Error en la compactación de registros")
+        await asyncio.sleep(interval)
+
+
+def start() -> None:
+    global _task
+    if RETENTION_INTERVAL > 0 and _task is None:
+        _task = asyncio.get_running_loop().create_task(_run(RETENTION_INTERVAL))
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compacta los registros según la retención de cada KPI"
+    )
+    parser.add_argument("--batch-rows", type=int, default=RETENTION_BATCH_ROWS)
+    parser.add_argument("--verbose", action="store_true", help="Muestra cada lote")
+    args = parser.parse_args()
+
+    import app.main  # noqa: F401  registra todos los modelos
+    from app.db import init_db
+
+    init_db()
+    started = time.perf_counter()
+    batches = removed = created = 0
+    slowest = 0.0
+    with _connect() as connection:
+        for batch in compact(connection, batch_rows=args.batch_rows):
+            batches += 1
+            removed += batch["removed"]
+            created += batch["created"]
+            slowest = max(slowest, batch["ms"])
+            if args.verbose:
+                print(batch)
+    print(
+        f"{batches} lotes, {removed} registros compactados en {created}"
+        f" en {time.perf_counter() - started:.1f} s"
+        f" (lote más lento: {slowest} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
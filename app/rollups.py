@@ -0,0 +1,312 @@
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Connection, delete, func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.buckets import (
+    bucket_expression,
+    sample_count,
+    sample_sum,
+    to_utc_naive,
+    truncate_day,
+    truncate_hour,
+)
+from app.models.records import Records
+from app.models.rollups import RecordRollupDaily, RecordRollupHourly
+from app.schemas.records import AggregateFunction, BucketWidth
+
+# (modelo, truncado en Python, duración del intervalo, ancho equivalente)
+ROLLUPS = (
+    (RecordRollupHourly, truncate_hour, timedelta(hours=1), BucketWidth.hour),
+    (RecordRollupDaily, truncate_day, timedelta(days=1), BucketWidth.day),
+)
+
+# Intervalos de lectura que se pueden componer a partir de cada rollup.
+ROLLUP_READS = {
+    RecordRollupDaily: (BucketWidth.day, BucketWidth.week, BucketWidth.month),
+    RecordRollupHourly: (
+        BucketWidth.hour,
+        BucketWidth.day,
+        BucketWidth.week,
+        BucketWidth.month,
+    ),
+}
+
+RecordRow = Tuple[int, float, datetime]
+
+# Intervalo de cada rollup sobre la fecha como texto ("2024-05-01
+# 13:45:00.000000"): longitud del prefijo que lo identifica y resto del
+# inicio del intervalo.
+TEXT_BUCKETS = {
+    RecordRollupHourly: (13, ":00:00.000000"),
+    RecordRollupDaily: (10, " 00:00:00.000000"),
+}
+
+
+def _group(
+    rows: List[RecordRow], truncate, samples: int = 1
+) -> Dict[Tuple[int, datetime], List]:
+    """
+    Agrupa filas `(kpi_id, value, created_at)` en `[count, sum, min, max]` por
+    intervalo. Cada fila cuenta como `samples` registros con su valor.
+    """
+    groups: Dict[Tuple[int, datetime], List] = {}
+    for kpi_id, value, created_at in rows:
+        key = (kpi_id, truncate(to_utc_naive(created_at)))
+        value = float(value)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [samples, value * samples, value, value]
+        else:
+            group[0] += samples
+            group[1] += value * samples
+            group[2] = min(group[2], value)
+            group[3] = max(group[3], value)
+    return groups
+
+
+async def apply_records(rows: Iterable[RecordRow], session: AsyncSession) -> None:
+    """
+    Suma registros recién insertados a los rollups horarios y diarios.
+
+    - **rows**: Filas `(kpi_id, value, created_at)` de los registros insertados.
+
+    Se ejecuta dentro de la transacción del llamador, con un upsert por tabla.
+    """
+    rows = list(rows)
+    for model, truncate, _, _ in ROLLUPS:
+        groups = _group(rows, truncate)
+        if not groups:
+            continue
+        table = model.__table__
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.kpi_id, table.c.bucket],
+            set_={
+                "count": table.c.count + statement.excluded.count,
+                "sum": table.c.sum + statement.excluded.sum,
+                "min": func.min(table.c.min, statement.excluded.min),
+                "max": func.max(table.c.max, statement.excluded.max),
+            },
+        )
+        await session.execute(
+            statement,
+            [
+                {
+                    "kpi_id": kpi_id,
+                    "bucket": bucket,
+                    "count": count,
+                    "sum": total,
+                    "min": low,
+                    "max": high,
+                }
+                for (kpi_id, bucket), (count, total, low, high) in groups.items()
+            ],
+        )
+
+
+async def remove_records(
+    rows: Iterable[RecordRow], session: AsyncSession, samples: int = 1
+) -> None:
+    """
+    Resta registros eliminados de los rollups horarios y diarios.
+
+    - **rows**: Filas `(kpi_id, value, created_at)` de los registros ya eliminados.
+    - **samples**: Registros originales que representa cada fila
+      (`Records.sample_count`, más de 1 en los compactados).
+
+    El mínimo y el máximo solo se recalculan desde `Records` cuando el valor
+    eliminado era uno de ellos.
+    """
+    rows = list(rows)
+    for model, truncate, width, _ in ROLLUPS:
+        for (kpi_id, bucket), (count, total, low, high) in _group(
+            rows, truncate, samples
+        ).items():
+            rollup = await session.get(model, (kpi_id, bucket))
+            if rollup is None:
+                continue
+            rollup.count -= count
+            if rollup.count <= 0:
+                await session.delete(rollup)
+                continue
+            rollup.sum -= total
+            if low <= rollup.min or high >= rollup.max:
+                rollup.min, rollup.max = (
+                    await session.exec(
+                        select(func.min(Records.value), func.max(Records.value)).where(
+                            Records.kpi_id == kpi_id,
+                            Records.created_at >= bucket,
+                            Records.created_at < bucket + width,
+                        )
+                    )
+                ).one()
+            session.add(rollup)
+
+
+def _merge_text(table: str) -> str:
+    # El mismo upsert que `apply_records`, en SQL directo para ejecutarlo con
+    # un executemany sin el procesado de parámetros de SQLAlchemy.
+    return (
+        f'INSERT INTO "{table}" (kpi_id, bucket, count, sum, min, max)'
+        " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (kpi_id, bucket) DO UPDATE SET"
+        " count = count + excluded.count, sum = sum + excluded.sum,"
+        " min = min(min, excluded.min), max = max(max, excluded.max)"
+    )
+
+
+def merge_text_records(
+    rows: Iterable[Tuple[int, str, float]], connection: Connection
+) -> None:
+    """
+    Suma registros recién insertados a los rollups, sobre una conexión síncrona.
+
+    - **rows**: Filas `(kpi_id, created_at, value)`, con `created_at` como
+      texto en el formato en que se guarda en SQLite.
+
+    Para inserciones masivas: agrupa por hora cortando el texto de la fecha,
+    mucho más rápido que truncar un datetime por fila, y cada rollup se
+    calcula a partir de esos grupos. Se ejecuta dentro de la transacción del
+    llamador.
+    """
+    finest = max(length for length, _ in TEXT_BUCKETS.values())
+    hours: Dict[Tuple[int, str], List] = {}
+    for kpi_id, created_at, value in rows:
+        key = (kpi_id, created_at[:finest])
+        group = hours.get(key)
+        if group is None:
+            hours[key] = [1, value, value, value]
+        else:
+            group[0] += 1
+            group[1] += value
+            if value < group[2]:
+                group[2] = value
+            elif value > group[3]:
+                group[3] = value
+
+    for model, (length, suffix) in TEXT_BUCKETS.items():
+        groups: Dict[Tuple[int, str], List] = {}
+        for (kpi_id, hour), (count, total, low, high) in hours.items():
+            key = (kpi_id, hour[:length])
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [count, total, low, high]
+            else:
+                group[0] += count
+                group[1] += total
+                group[2] = min(group[2], low)
+                group[3] = max(group[3], high)
+        connection.exec_driver_sql(
+            _merge_text(model.__tablename__),
+            [
+                (kpi_id, bucket + suffix, count, total, low, high)
+                for (kpi_id, bucket), (count, total, low, high) in groups.items()
+            ],
+        )
+
+
+def rebuild_rollups(session: Session, kpi_id: Optional[int] = None) -> None:
+    """
+    Reconstruye los rollups desde `Records`, para todos los KPIs o para uno.
+
+    Se usa para poblar los rollups de una base de datos existente. En los
+    intervalos compactados por la retención, el conteo y la suma son exactos
+    pero el mínimo y el máximo pasan a ser los de los promedios.
+    """
+    for model, _, _, width in ROLLUPS:
+        bucket_column = bucket_expression(Records.created_at, width)
+        clear = delete(model)
+        source = select(
+            Records.kpi_id,
+            # Mismo formato con el que SQLAlchemy guarda los datetime en SQLite.
+            bucket_column.concat(".000000"),
+            sample_count(),
+            sample_sum(),
+            func.min(Records.value),
+            func.max(Records.value),
+        )
+        if kpi_id is not None:
+            clear = clear.where(model.kpi_id == kpi_id)
+            source = source.where(Records.kpi_id == kpi_id)
+        session.exec(clear)
+        session.exec(
+            insert(model).from_select(
+                ["kpi_id", "bucket", "count", "sum", "min", "max"],
+                source.group_by(Records.kpi_id, bucket_column),
+            )
+        )
+    session.commit()
+
+
+def _aligned(value: Optional[datetime], truncate) -> bool:
+    return value is None or truncate(value) == value
+
+
+def rollup_aggregate_query(
+    kpi_id: int,
+    bucket: BucketWidth,
+    function: AggregateFunction,
+    since: Optional[datetime],
+    until: Optional[datetime],
+):
+    """
+    Construye la consulta de agregación sobre un rollup, si el rango lo permite.
+
+    - **since** y **until**: Ya normalizados a UTC sin zona horaria.
+
+    Retorna `None` cuando la función es `last` o cuando el intervalo o los
+    límites del rango no coinciden con ningún rollup; en ese caso hay que
+    leer de `Records`.
+    """
+    if function == AggregateFunction.last:
+        return None
+
+    for model, truncate, _, _ in reversed(ROLLUPS):
+        if bucket not in ROLLUP_READS[model]:
+            continue
+        if not (_aligned(since, truncate) and _aligned(until, truncate)):
+            continue
+
+        bucket_column = bucket_expression(model.bucket, bucket).label("bucket")
+        aggregates = {
+            AggregateFunction.avg: func.sum(model.sum) / func.sum(model.count),
+            AggregateFunction.min: func.min(model.min),
+            AggregateFunction.max: func.max(model.max),
+            AggregateFunction.sum: func.sum(model.sum),
+            AggregateFunction.count: func.sum(model.count),
+        }
+        query = select(bucket_column, aggregates[function]).where(
+            model.kpi_id == kpi_id
+        )
+        if since is not None:
+            query = query.where(model.bucket >= since)
+        if until is not None:
+            query = query.where(model.bucket < until)
+        return query.group_by(bucket_column).order_by(bucket_column)
+
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mantenimiento de rollups de registros"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Reconstruye los rollups")
+    rebuild.add_argument("--kpi-id", type=int, default=None)
+    args = parser.parse_args()
+
+    import app.main  # noqa: F401  registra todos los modelos
+    from app.db import engine, init_db
+
+    init_db()
+    with Session(engine) as session:
+        rebuild_rollups(session, kpi_id=args.kpi_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
 
 from app.crud.boards import (
     count_board,
@@ -8,16 +8,21 @@ from app.crud.boards import (
     create_boards,
     get_board,
     list_boards,
+    set_board_members,
     update_board,
+    update_board_members,
     delete_board,
-    delete_dboard,
 )
-from app.db import SessionDep
+from app.db import AsyncSessionDep
+from app.etags import ETag
+from app.fast_json import json_response
 from app.models.boards import Board
 from app.models.catalogs import Catalog, CatalogBase
 from app.schemas.boards import (
     BoardCreate,
     BoardCreateUsers,
+    BoardMembers,
+    BoardMembersDelta,
     BoardRead,
     BoardUpdate,
 )
@@ -32,8 +37,10 @@ router = APIRouter(tags=["Boards"], prefix="/boards")
     summary="Create a board for a single user",
     description="Creates a new board and associates it with the specified user.",
 )
-def create_board_for_single_user(board_data: BoardCreate, session: SessionDep) -> Board:
-    return create_board(board_data, session)
+async def create_board_for_single_user(
+    board_data: BoardCreate, session: AsyncSessionDep
+) -> Board:
+    return await create_board(board_data, session)
 
 
 @router.post(
@@ -43,23 +50,26 @@ def create_board_for_single_user(board_data: BoardCreate, session: SessionDep) -
     summary="Create a board for multiple users",
     description="Creates a new board and associates it with the specified list of users.",
 )
-def create_board_for_users(board_data: BoardCreateUsers, session: SessionDep):
+async def create_board_for_users(
+    board_data: BoardCreateUsers, session: AsyncSessionDep
+):
     """
     Crea un nuevo Board y lo asocia con los usuarios especificados.
     Una lista de user_ids deben ser enviados como parte del cuerpo del JSON.
     """
-    return create_boards(board_data, session)
+    return [await create_boards(board_data, session)]
 
 
 @router.get(
     "/{board_id}",
     response_model=BoardRead,
     status_code=status.HTTP_200_OK,
+    dependencies=[ETag("board", "dboards", "user", "catalog")],
     summary="Get a board by ID",
     description="Retrieves a board by its ID.",
 )
-def get_board_handler(board_id: int, session: SessionDep) -> Board:
-    return get_board(board_id, session)
+async def get_board_handler(board_id: int, session: AsyncSessionDep) -> Board:
+    return await get_board(board_id, session)
 
 
 @router.put(
@@ -69,36 +79,68 @@ def get_board_handler(board_id: int, session: SessionDep) -> Board:
     summary="Update a board",
     description="Updates an existing board with the provided data.",
 )
-def update_board_handler(
-    board_id: int, board: BoardUpdate, session: SessionDep
+async def update_board_handler(
+    board_id: int, board: BoardUpdate, session: AsyncSessionDep
+) -> Board:
+    await update_board(board_id, board, session)
+    return await get_board(board_id, session)
+
+
+@router.put(
+    "/{board_id}/users",
+    response_model=BoardRead,
+    status_code=status.HTTP_200_OK,
+    summary="Set the users of a board",
+    description="Replaces the users of a board with the given set of user IDs.",
+)
+async def set_board_users(
+    board_id: int, members: BoardMembers, session: AsyncSessionDep
+) -> Board:
+    """
+    Solo se insertan o eliminan las asociaciones que cambian.
+    """
+    await set_board_members(board_id, members.user_ids, session)
+    return await get_board(board_id, session)
+
+
+@router.patch(
+    "/{board_id}/users",
+    response_model=BoardRead,
+    status_code=status.HTTP_200_OK,
+    summary="Add or remove users of a board",
+    description="Adds the users in `add` and removes the users in `remove`.",
+)
+async def update_board_users(
+    board_id: int, delta: BoardMembersDelta, session: AsyncSessionDep
 ) -> Board:
-    update_board(board_id, board, session)
-    return get_board(board_id, session)
+    await update_board_members(board_id, delta, session)
+    return await get_board(board_id, session)
 
 
 @router.delete(
     "/{board_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete a board",
-    description="Deletes a board and its associated records in DBoards.",
+    description="Deletes a board with its users, catalogs, KPIs and records.",
 )
-def delete_board_handler(board_id: int, session: SessionDep) -> None:
-    delete_dboard(board_id, session)
-    delete_board(board_id, session)
+async def delete_board_handler(board_id: int, session: AsyncSessionDep) -> None:
+    await delete_board(board_id, session)
 
 
 @router.get(
     "/",
     response_model=List[BoardRead],
     status_code=status.HTTP_200_OK,
+    dependencies=[ETag("board", "dboards", "user", "catalog")],
     summary="List all boards",
     description="Retrieves a list of all boards in the database.",
 )
-def list_boards_handler(session: SessionDep):
+async def list_boards_handler(session: AsyncSessionDep, response: Response):
     """
     Lista todos los boards en la base de datos, incluyendo los usuarios asociados.
     """
-    return list_boards(session)
+    boards = await list_boards(session)
+    return json_response(List[BoardRead], boards, response, from_attributes=True)
 
 
 @router.get(
@@ -108,8 +150,8 @@ def list_boards_handler(session: SessionDep):
     summary="Count boards",
     description="Returns the total number of boards in the database.",
 )
-def count_boards(session: SessionDep) -> int:
-    return count_board(session)
+async def count_boards(session: AsyncSessionDep) -> int:
+    return await count_board(session)
 
 
 @router.post(
@@ -119,12 +161,12 @@ def count_boards(session: SessionDep) -> int:
     summary="Create a catalog for a board",
     description="Creates a new catalog and associates it with the specified board.",
 )
-def create_catalog(
+async def create_catalog(
     board_id: int,
     catalog: CatalogBase,
-    session: SessionDep,
+    session: AsyncSessionDep,
 ) -> Catalog:
-    board = get_board(board_id, session)
+    board = await get_board(board_id, session)
     if not board:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
@@ -132,6 +174,6 @@ def create_catalog(
 
     new_catalog = Catalog(**catalog.model_dump(), board_id=board_id)
     session.add(new_catalog)
-    session.commit()
-    session.refresh(new_catalog)
+    await session.commit()
+    await session.refresh(new_catalog)
     return new_catalog
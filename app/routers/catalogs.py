@@ -1,53 +1,77 @@
 from typing import List
 
 from fastapi import APIRouter, HTTPException, status
+from sqlalchemy import delete, update
 from sqlmodel import select
 
-from app.db import SessionDep
+from app.db import AsyncSessionDep, begin_immediate
+from app.etags import ETag
+from app.formulas import compile_formula
+from app.loaders import KPI_READ
+from app.positions import next_position, plan_positions
 from app.models.boards import Board
 from app.models.catalogs import Catalog, CatalogBase
 from app.models.kpis import Kpi
-from app.schemas.kpis import KpiCreate, KpiRead
+from app.schemas.kpis import KpiCreate, KpiRead, KpiReorder
 
 router = APIRouter(prefix="/catalogs", tags=["Catalogs"])
 
 
-@router.get("/", response_model=List[Catalog], status_code=status.HTTP_200_OK)
-def get_catalogs(session: SessionDep):
+@router.get(
+    "/",
+    response_model=List[Catalog],
+    status_code=status.HTTP_200_OK,
+    dependencies=[ETag("catalog")],
+)
+async def get_catalogs(session: AsyncSessionDep):
     """
     Obtiene todos los catálogos disponibles.
     """
-    catalogs = session.exec(select(Catalog)).all()
+    catalogs = (await session.exec(select(Catalog))).all()
     return catalogs
 
 
 @router.get(
-    "/boards/{board_id}/", response_model=List[Catalog], status_code=status.HTTP_200_OK
+    "/boards/{board_id}/",
+    response_model=List[Catalog],
+    status_code=status.HTTP_200_OK,
+    dependencies=[ETag("board", "catalog")],
 )
-def get_catalogs_by_board(board_id: int, session: SessionDep):
+async def get_catalogs_by_board(board_id: int, session: AsyncSessionDep):
     """
     Obtiene todos los catálogos de un board específico.
 
     - **board_id**: ID del board para filtrar los catálogos.
     """
-    board_exists = session.exec(select(Board.id).where(Board.id == board_id)).first()
+    board_exists = (
+        await session.exec(select(Board.id).where(Board.id == board_id))
+    ).first()
     if not board_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
         )
 
-    catalogs = session.exec(select(Catalog).where(Catalog.board_id == board_id)).all()
+    catalogs = (
+        await session.exec(select(Catalog).where(Catalog.board_id == board_id))
+    ).all()
     return catalogs
 
 
-@router.get("/{catalog_id}", response_model=Catalog, status_code=status.HTTP_200_OK)
-def get_catalog(catalog_id: int, session: SessionDep):
+@router.get(
+    "/{catalog_id}",
+    response_model=Catalog,
+    status_code=status.HTTP_200_OK,
+    dependencies=[ETag("catalog")],
+)
+async def get_catalog(catalog_id: int, session: AsyncSessionDep):
     """
     Obtiene un catálogo por su ID.
 
     - **catalog_id**: ID del catálogo.
     """
-    catalog = session.exec(select(Catalog).where(Catalog.id == catalog_id)).first()
+    catalog = (
+        await session.exec(select(Catalog).where(Catalog.id == catalog_id))
+    ).first()
     if not catalog:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Catalog not found"
@@ -56,15 +80,17 @@ def get_catalog(catalog_id: int, session: SessionDep):
 
 
 @router.patch("/{catalog_id}", response_model=Catalog, status_code=status.HTTP_200_OK)
-def update_catalog(catalog_id: int, catalog: CatalogBase, session: SessionDep):
+async def update_catalog(
+    catalog_id: int, catalog: CatalogBase, session: AsyncSessionDep
+):
     """
     Actualiza un catálogo por su ID.
 
     - **catalog_id**: ID del catálogo a actualizar.
     - **catalog**: Objeto CatalogBase con los datos actualizados.
     """
-    catalog_to_update = session.exec(
-        select(Catalog).where(Catalog.id == catalog_id)
+    catalog_to_update = (
+        await session.exec(select(Catalog).where(Catalog.id == catalog_id))
     ).first()
     if not catalog_to_update:
         raise HTTPException(
@@ -76,28 +102,29 @@ def update_catalog(catalog_id: int, catalog: CatalogBase, session: SessionDep):
         setattr(catalog_to_update, key, value)
 
     session.add(catalog_to_update)
-    session.commit()
-    session.refresh(catalog_to_update)
+    await session.commit()
+    await session.refresh(catalog_to_update)
     return catalog_to_update
 
 
 @router.delete("/{catalog_id}", response_model=Catalog, status_code=status.HTTP_200_OK)
-def delete_catalog(catalog_id: int, session: SessionDep):
+async def delete_catalog(catalog_id: int, session: AsyncSessionDep):
     """
-    Elimina un catálogo por su ID.
+    Elimina un catálogo por su ID, junto con sus KPIs y los registros de
+    estos.
 
     - **catalog_id**: ID del catálogo a eliminar.
     """
-    catalog_to_delete = session.exec(
-        select(Catalog).where(Catalog.id == catalog_id)
+    catalog_to_delete = (
+        await session.exec(select(Catalog).where(Catalog.id == catalog_id))
     ).first()
     if not catalog_to_delete:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Catalog not found"
         )
 
-    session.delete(catalog_to_delete)
-    session.commit()
+    await session.execute(delete(Catalog).where(Catalog.id == catalog_id))
+    await session.commit()
     return catalog_to_delete
 
 
@@ -107,25 +134,32 @@ def delete_catalog(catalog_id: int, session: SessionDep):
     status_code=status.HTTP_201_CREATED,
     tags=["KPIs"],
 )
-def create_catalog_kpi(catalog_id: int, kpi_data: KpiCreate, session: SessionDep):
+async def create_catalog_kpi(
+    catalog_id: int, kpi_data: KpiCreate, session: AsyncSessionDep
+):
     """
     Crea un nuevo KPI y lo asocia a un catálogo existente.
 
     - **catalog_id**: ID del catálogo al que se asociará el KPI.
     - **kpi_data**: Objeto KpiBase con los datos del KPI.
     """
-    catalog_exists = session.exec(
-        select(Catalog.id).where(Catalog.id == catalog_id)
+    catalog_exists = (
+        await session.exec(select(Catalog.id).where(Catalog.id == catalog_id))
     ).first()
     if not catalog_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Catalog not found"
         )
 
+    if kpi_data.formula:
+        compile_formula(kpi_data.formula)
+
     kpi = Kpi(**kpi_data.model_dump(), catalog_id=catalog_id)
+    if kpi.position_index is None:
+        kpi.position_index = await next_position(catalog_id, session)
     session.add(kpi)
-    session.commit()
-    session.refresh(kpi)
+    await session.commit()
+    await session.refresh(kpi)
     return kpi
 
 
@@ -135,16 +169,74 @@ def create_catalog_kpi(catalog_id: int, kpi_data: KpiCreate, session: SessionDep
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def get_kpis_by_catalog(catalog_id: int, session: SessionDep):
+async def get_kpis_by_catalog(catalog_id: int, session: AsyncSessionDep):
     """
     Obtiene todos los KPIs asociados a un catálogo específico.
 
     - **catalog_id**: ID del catálogo para filtrar los KPIs.
     """
-    catalog = session.exec(select(Catalog).where(Catalog.id == catalog_id)).first()
+    catalog = await session.get(Catalog, catalog_id)
     if not catalog:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Catalog not found"
         )
 
-    return catalog.kpis
+    kpis = await session.exec(
+        select(Kpi)
+        .where(Kpi.catalog_id == catalog_id)
+        .order_by(Kpi.position_index, Kpi.id)
+        .options(*KPI_READ)
+    )
+    return kpis.all()
+
+
+@router.put(
+    "/{catalog_id}/kpis/order",
+    response_model=List[Kpi],
+    status_code=status.HTTP_200_OK,
+    tags=["KPIs"],
+)
+async def reorder_catalog_kpis(
+    catalog_id: int, order: KpiReorder, session: AsyncSessionDep
+):
+    """
+    Aplica un nuevo orden a todos los KPIs de un catálogo en una sola transacción.
+
+    - **catalog_id**: ID del catálogo.
+    - **order**: IDs de todos los KPIs del catálogo en el orden deseado.
+
+    Solo se actualizan los KPIs cuya posición tiene que cambiar: mover un KPI
+    actualiza una fila. Las posiciones se leen con el bloqueo de escritura
+    tomado, para que otra reordenación o un KPI nuevo no cambien los huecos
+    entre la lectura y la escritura. Retorna los KPIs en el nuevo orden.
+    """
+    await begin_immediate(session)
+    kpis = {
+        kpi.id: kpi
+        for kpi in (
+            await session.exec(select(Kpi).where(Kpi.catalog_id == catalog_id))
+        ).all()
+    }
+    if not kpis and not await session.get(Catalog, catalog_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Catalog not found"
+        )
+    if len(order.kpi_ids) != len(kpis) or set(order.kpi_ids) != set(kpis):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="kpi_ids must list every KPI of the catalog exactly once",
+        )
+
+    ordered = [kpis[kpi_id] for kpi_id in order.kpi_ids]
+    positions = plan_positions([kpi.position_index for kpi in ordered])
+    changes = [
+        {"id": kpi.id, "position_index": position}
+        for kpi, position in zip(ordered, positions)
+        if kpi.position_index != position
+    ]
+    if changes:
+        await session.execute(update(Kpi), changes)
+        await session.commit()
+        for kpi, position in zip(ordered, positions):
+            kpi.position_index = position
+    return ordered
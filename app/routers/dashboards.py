@@ -1,6 +1,6 @@
 from fastapi import APIRouter, status
 
-from app.db import SessionDep
+from app.db import AsyncSessionDep
 from app.crud.dashboards import delete_dashboard
 
 router = APIRouter()
@@ -11,8 +11,8 @@ router = APIRouter()
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Dashboards"],
 )
-def delete_dashboard_handler(dashboard_id: int, session: SessionDep) -> None:
+async def delete_dashboard_handler(dashboard_id: int, session: AsyncSessionDep) -> None:
     """
     Elimina un Dashboard si no tiene ningún Board asociado.
     """
-    delete_dashboard(dashboard_id, session)
+    await delete_dashboard(dashboard_id, session)
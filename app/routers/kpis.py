@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Response, status
+from sqlalchemy import delete
 from sqlmodel import select
-from typing import List
-
-from app.db import SessionDep
+from typing import List, Optional
+
+from app.crud.stats import get_stats
+from app.db import AsyncSessionDep
+from app.etags import ETag
+from app.fast_json import json_response
+from app.formulas import compile_formula, evaluate_formula_series, invalidate_formula
+from app.positions import next_position
 from app.models.kpis import Kpi
 from app.schemas.kpis import KpiCreate, MoveKpiRequest, PositionUpdate
+from app.schemas.records import BucketWidth, RecordAggregate
 
 router = APIRouter()
 
@@ -15,26 +23,26 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def count_all_kpis(session: SessionDep):
+async def count_all_kpis(session: AsyncSessionDep):
     """
-    Obtiene todos los KPIs disponibles.
+    Obtiene el número de KPIs registrados.
     """
-    kpis = session.exec(select(Kpi)).all()
-    return len(kpis)
+    return (await get_stats(session)).kpis
 
 
 @router.get(
     "/kpis",
     response_model=List[Kpi],
     status_code=status.HTTP_200_OK,
+    dependencies=[ETag("kpi")],
     tags=["KPIs"],
 )
-def get_all_kpis(session: SessionDep):
+async def get_all_kpis(session: AsyncSessionDep, response: Response):
     """
     Obtiene todos los KPIs disponibles.
     """
-    kpis = session.exec(select(Kpi)).all()
-    return kpis
+    kpis = (await session.exec(select(Kpi))).all()
+    return json_response(List[Kpi], kpis, response)
 
 
 @router.get(
@@ -43,11 +51,11 @@ def get_all_kpis(session: SessionDep):
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def get_kpi(kpi_id: int, session: SessionDep):
+async def get_kpi(kpi_id: int, session: AsyncSessionDep):
     """
     Obtiene un KPI por su ID.
     """
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
@@ -61,22 +69,29 @@ def get_kpi(kpi_id: int, session: SessionDep):
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def update_kpi(kpi_id: int, kpi_data: KpiCreate, session: SessionDep):
+async def update_kpi(kpi_id: int, kpi_data: KpiCreate, session: AsyncSessionDep):
     """
     Actualiza un KPI por su ID.
     """
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
         )
 
-    for field, value in kpi_data.model_dump(exclude_unset=True).items():
+    update_data = kpi_data.model_dump(exclude_unset=True)
+    formula_changed = "formula" in update_data and update_data["formula"] != kpi.formula
+    if formula_changed and update_data["formula"]:
+        compile_formula(update_data["formula"])
+
+    for field, value in update_data.items():
         setattr(kpi, field, value)
 
     session.add(kpi)
-    session.commit()
-    session.refresh(kpi)
+    await session.commit()
+    await session.refresh(kpi)
+    if formula_changed:
+        invalidate_formula(kpi_id)
 
     return kpi
 
@@ -87,35 +102,71 @@ def update_kpi(kpi_id: int, kpi_data: KpiCreate, session: SessionDep):
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def delete_kpi(kpi_id: int, session: SessionDep):
+async def delete_kpi(kpi_id: int, session: AsyncSessionDep):
     """
-    Elimina un KPI por su ID.
+    Elimina un KPI por su ID, junto con sus registros y rollups.
     """
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
         )
 
-    session.delete(kpi)
-    session.commit()
+    await session.execute(delete(Kpi).where(Kpi.id == kpi_id))
+    await session.commit()
+    invalidate_formula(kpi_id)
 
     return kpi
 
 
+@router.get(
+    "/kpis/{kpi_id}/formula/series",
+    response_model=List[RecordAggregate],
+    status_code=status.HTTP_200_OK,
+    tags=["KPIs"],
+)
+async def get_kpi_formula_series(
+    kpi_id: int,
+    session: AsyncSessionDep,
+    bucket: BucketWidth = BucketWidth.hour,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Calcula la serie de un KPI derivado evaluando su fórmula.
+
+    - **bucket**: Intervalo al que se alinean los registros de los KPIs referenciados.
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+    """
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
+    if not kpi:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
+        )
+    if not kpi.formula:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="KPI has no formula"
+        )
+
+    return await evaluate_formula_series(
+        kpi_id, kpi.formula, bucket, since, until, session
+    )
+
+
 @router.patch(
     "/kpis/{kpi_id}/position",
     response_model=Kpi,
     status_code=status.HTTP_200_OK,
     tags=["KPIs"],
 )
-def update_kpi_position(
-    kpi_id: int, position_data: PositionUpdate, session: SessionDep
+async def update_kpi_position(
+    kpi_id: int, position_data: PositionUpdate, session: AsyncSessionDep
 ):
     """
     Actualiza la posición de un KPI.
     """
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
@@ -123,28 +174,29 @@ def update_kpi_position(
 
     kpi.position_index = position_data.position_index
     session.add(kpi)
-    session.commit()
-    session.refresh(kpi)
+    await session.commit()
+    await session.refresh(kpi)
 
     return kpi
 
 
 @router.patch("/kpis/{kpi_id}/move", status_code=200, tags=["KPIs"])
 async def move_kpi_to_another_catalog(
-    kpi_id: int, kpi_data: MoveKpiRequest, session: SessionDep
+    kpi_id: int, kpi_data: MoveKpiRequest, session: AsyncSessionDep
 ):
     """
     Mueve un KPI a otro catálogo.
     """
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(status_code=404, detail="KPI not found")
 
     if kpi.catalog_id != kpi_data.new_catalog_id:
+        kpi.position_index = await next_position(kpi_data.new_catalog_id, session)
         kpi.catalog_id = kpi_data.new_catalog_id
 
-    session.commit()
-    session.refresh(kpi)
+    await session.commit()
+    await session.refresh(kpi)
 
     return {
         "message": "KPI moved successfully",
@@ -0,0 +1,73 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+
+from app import live
+from app.db import AsyncSessionDep
+from app.models.boards import Board
+from app.models.catalogs import Catalog
+from app.models.kpis import Kpi
+
+router = APIRouter()
+
+
+@router.get(
+    "/live/records",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    tags=["Live"],
+)
+async def subscribe_records(
+    session: AsyncSessionDep,
+    kpi_ids: List[int] = Query(default=[]),
+    board_id: Optional[int] = None,
+):
+    """
+    Suscripción en vivo (Server-Sent Events) a los registros nuevos de un
+    conjunto de KPIs o de todos los KPIs de un board.
+
+    - **kpi_ids**: IDs de los KPIs (se puede repetir el parámetro).
+    - **board_id**: ID del board; se suscribe a los KPIs que tiene al conectarse.
+
+    Cada evento `records` trae una lista de registros con el formato de
+    `GET /kpis/{kpi_id}/records`. Un evento `resync` indica que el cliente se
+    atrasó y perdió registros, y debe volver a pedirlos por la API.
+    """
+    if not kpi_ids and board_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="kpi_ids or board_id is required",
+        )
+
+    subscribed = set(kpi_ids)
+    if subscribed:
+        found = set(
+            (await session.exec(select(Kpi.id).where(Kpi.id.in_(subscribed)))).all()
+        )
+        if found != subscribed:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="KPI not found"
+            )
+    if board_id is not None:
+        board = (
+            await session.exec(select(Board.id).where(Board.id == board_id))
+        ).first()
+        if board is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Board not found"
+            )
+        subscribed.update(
+            (
+                await session.exec(
+                    select(Kpi.id).join(Catalog).where(Catalog.board_id == board_id)
+                )
+            ).all()
+        )
+
+    return StreamingResponse(
+        live.stream_events(subscribed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Response, status
+
+from app.metrics import METRICS_CONTENT_TYPE, render_metrics
+from app.slow_queries import slow_query_log
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_class=Response,
+    status_code=status.HTTP_200_OK,
+    tags=["Metrics"],
+)
+async def get_metrics():
+    """
+    Métricas del proceso en formato de texto de Prometheus: latencia por ruta,
+    peticiones en curso, sentencias SQL y tiempo en la base de datos por
+    petición.
+    """
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/metrics/slow-queries", status_code=status.HTTP_200_OK, tags=["Metrics"])
+async def get_slow_queries():
+    """
+    Consultas que superaron `SLOW_QUERY_MS` en este proceso, agrupadas por
+    huella y ordenadas por tiempo total: SQL normalizado, tipos de los
+    parámetros, ocurrencias por ruta y plan de `EXPLAIN QUERY PLAN`.
+    """
+    return slow_query_log.report()
@@ -1,17 +1,50 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select, Session
-from typing import List
+import json
+import tempfile
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
 
-from app.db import SessionDep
+from app.crud.records import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    aggregate_records,
+    create_records_bulk,
+    export_records,
+    list_records,
+)
+from app.db import AsyncSessionDep
+from app import live
+from app.fast_json import rows_json_response
+from app.importer import (
+    ImportFileError,
+    import_connection,
+    import_records,
+    read_records,
+)
 from app.models.kpis import Kpi
 from app.models.records import Records
-from app.schemas.records import RecordCreate
+from app.rollups import apply_records, remove_records
+from app import write_behind
+from app.schemas.records import (
+    AggregateFunction,
+    BucketWidth,
+    ExportFormat,
+    ImportFormat,
+    RecordAggregate,
+    RecordBulkCreate,
+    RecordBulkResult,
+    RecordCreate,
+)
 
 router = APIRouter()
 
 
-def get_kpi(session: Session, kpi_id: int) -> Kpi:
-    kpi = session.exec(select(Kpi).where(Kpi.id == kpi_id)).first()
+async def get_kpi(session: AsyncSession, kpi_id: int) -> Kpi:
+    kpi = (await session.exec(select(Kpi).where(Kpi.id == kpi_id))).first()
     if not kpi:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="KPI no encontrado"
@@ -25,28 +58,118 @@ def get_kpi(session: Session, kpi_id: int) -> Kpi:
     status_code=status.HTTP_201_CREATED,
     tags=["Records"],
 )
-def create_record(kpi_id: int, record_data: RecordCreate, session: SessionDep):
-    get_kpi(session, kpi_id)
+async def create_record(
+    kpi_id: int, record_data: RecordCreate, session: AsyncSessionDep
+):
     new_record = Records(**record_data.dict(), kpi_id=kpi_id)
+    if write_behind.record_writer is not None:
+        # El escritor valida los KPIs del lote; la petición no usa la sesión
+        # para no retener una conexión mientras espera.
+        return await write_behind.record_writer.submit(
+            kpi_id, new_record.value, new_record.created_at
+        )
+
+    await get_kpi(session, kpi_id)
     session.add(new_record)
-    session.commit()
-    session.refresh(new_record)
+    await apply_records([(kpi_id, new_record.value, new_record.created_at)], session)
+    await session.commit()
+    await session.refresh(new_record)
+    live.publish(
+        [
+            live.record_event(
+                new_record.id, kpi_id, new_record.value, new_record.created_at
+            )
+        ]
+    )
     return new_record
 
 
+@router.post(
+    "/records/bulk",
+    response_model=RecordBulkResult,
+    status_code=status.HTTP_200_OK,
+    tags=["Records"],
+)
+async def create_records_bulk_handler(
+    bulk_data: RecordBulkCreate, session: AsyncSessionDep
+):
+    """
+    Crea muchos registros de uno o varios KPIs en una sola transacción.
+
+    - **bulk_data**: Lista de registros con `kpi_id`, `value` y `created_at` opcional.
+    - **response**: Número de registros creados y fallidos, y el estado de cada elemento.
+    """
+    return await create_records_bulk(bulk_data, session)
+
+
+def _import_progress(file, key, chunks):
+    # Generador síncrono: se consume en el threadpool mientras se envía la
+    # respuesta, y es el dueño del archivo temporal y de la conexión.
+    try:
+        with import_connection() as connection:
+            for progress in import_records(key, chunks, connection):
+                yield json.dumps(progress) + "\n"
+    finally:
+        file.close()
+
+
+@router.post(
+    "/records/import",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    tags=["Records"],
+)
+async def import_records_handler(
+    request: Request, format: ImportFormat = ImportFormat.csv
+):
+    """
+    Importa registros históricos desde el cuerpo de la petición, en CSV o Parquet.
+
+    - **format**: Formato del archivo (csv, parquet). Parquet requiere pyarrow.
+
+    Columnas: `kpi_id` (o `kpi`, con el nombre del KPI), `created_at` y `value`.
+    El cuerpo se guarda en un archivo temporal y se importa por bloques, con
+    una transacción por bloque. La respuesta es NDJSON: una línea de progreso
+    por bloque, con los errores de sus filas, y una línea final con `done`.
+    """
+    file = tempfile.TemporaryFile()
+    try:
+        async for chunk in request.stream():
+            file.write(chunk)
+        file.seek(0)
+        key, chunks = await run_in_threadpool(read_records, file, format)
+    except ImportFileError as exc:
+        file.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except BaseException:
+        file.close()
+        raise
+    return StreamingResponse(
+        iterate_in_threadpool(_import_progress(file, key, chunks)),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.delete(
     "/records/{record_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Records"],
 )
-def delete_record(record_id: int, session: SessionDep):
-    record = session.get(Records, record_id)
+async def delete_record(record_id: int, session: AsyncSessionDep):
+    record = await session.get(Records, record_id)
     if not record:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Registro no encontrado"
         )
-    session.delete(record)
-    session.commit()
+    await session.delete(record)
+    await session.flush()
+    # Un registro compactado resta todas sus muestras, con su promedio.
+    await remove_records(
+        [(record.kpi_id, record.value, record.created_at)],
+        session,
+        samples=record.sample_count,
+    )
+    await session.commit()
 
 
 @router.get(
@@ -55,7 +178,97 @@ def delete_record(record_id: int, session: SessionDep):
     status_code=status.HTTP_200_OK,
     tags=["Records"],
 )
-def get_records_by_kpi(kpi_id: int, session: SessionDep):
-    get_kpi(session, kpi_id)
-    records = session.exec(select(Records).where(Records.kpi_id == kpi_id)).all()
-    return records
+async def get_records_by_kpi(
+    kpi_id: int,
+    session: AsyncSessionDep,
+    response: Response,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Lista los registros de un KPI por páginas, ordenados por fecha de creación.
+
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+    - **cursor**: Valor de la cabecera `X-Next-Cursor` de la página anterior.
+    - **limit**: Tamaño máximo de la página.
+
+    Si hay más registros, la respuesta incluye la cabecera `X-Next-Cursor`.
+    """
+    await get_kpi(session, kpi_id)
+    records, next_cursor = await list_records(
+        kpi_id, since, until, cursor, limit, session
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows_json_response(Records, records, response)
+
+
+@router.get(
+    "/kpis/{kpi_id}/records/aggregate",
+    response_model=List[RecordAggregate],
+    status_code=status.HTTP_200_OK,
+    tags=["Records"],
+)
+async def get_records_aggregate(
+    kpi_id: int,
+    session: AsyncSessionDep,
+    bucket: BucketWidth = BucketWidth.hour,
+    function: AggregateFunction = AggregateFunction.avg,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Obtiene los registros de un KPI agregados por intervalos de tiempo.
+
+    - **bucket**: Ancho del intervalo (minute, hour, day, week, month).
+    - **function**: Función de agregación (avg, min, max, sum, count, last).
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+
+    El tamaño de la respuesta depende del número de intervalos, no del número de registros.
+    """
+    await get_kpi(session, kpi_id)
+    return await aggregate_records(kpi_id, bucket, function, since, until, session)
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+@router.get(
+    "/kpis/{kpi_id}/records/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    tags=["Records"],
+)
+async def export_records_by_kpi(
+    kpi_id: int,
+    session: AsyncSessionDep,
+    format: ExportFormat = ExportFormat.ndjson,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Exporta el historial completo de un KPI en NDJSON o CSV.
+
+    - **format**: Formato de salida (ndjson, csv).
+    - **since**: Inicio del rango (inclusivo).
+    - **until**: Fin del rango (exclusivo).
+
+    Las filas se envían a medida que se leen de la base de datos.
+    """
+    await get_kpi(session, kpi_id)
+    return StreamingResponse(
+        export_records(kpi_id, format, since, until),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="kpi_{kpi_id}_records.{format.value}"'
+            )
+        },
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, status
+
+from app.crud.stats import get_stats
+from app.db import AsyncSessionDep
+from app.schemas.stats import Stats
+
+router = APIRouter()
+
+
+@router.get(
+    "/stats",
+    response_model=Stats,
+    status_code=status.HTTP_200_OK,
+    tags=["Stats"],
+)
+async def get_stats_handler(session: AsyncSessionDep):
+    """
+    Obtiene el número de usuarios, boards, catálogos, KPIs, dashboards y registros.
+    """
+    return await get_stats(session)
@@ -5,7 +5,11 @@ from fastapi import APIRouter, status, HTTPException
 from sqlmodel import SQLModel
 
 from app.crud.boards import list_boards_user
-from app.crud.dashboards import create_dashboard, get_user_dashboard
+from app.crud.dashboards import (
+    create_dashboard,
+    get_dashboard_tree,
+    get_user_dashboard,
+)
 from app.crud.users import (
     authenticate_with_microsoft,
     count_users,
@@ -15,11 +19,12 @@ from app.crud.users import (
     DeleteUserRequest,
     GetUserInfoRequest,
 )
-from app.db import SessionDep
+from app.db import AsyncSessionDep
+from app.fast_json import json_response
 from app.models.dashboards import Dashboard
 from app.models.users import User
 from app.schemas.boards import BoardRead
-from app.schemas.dahboards import DashboardCreate, DashboardRead
+from app.schemas.dahboards import DashboardCreate, DashboardRead, DashboardTree
 from app.schemas.users import UserInfoRead
 
 router = APIRouter()
@@ -41,7 +46,9 @@ class MicrosoftAuthRequest(SQLModel):
     status_code=status.HTTP_200_OK,
     tags=["Users"],
 )
-def create_user_handler(auth_request: MicrosoftAuthRequest, session: SessionDep):
+async def create_user_handler(
+    auth_request: MicrosoftAuthRequest, session: AsyncSessionDep
+):
     """
     Autentica a un usuario usando un token de Microsoft.
     Si el usuario no existe, crea uno nuevo.
@@ -50,7 +57,7 @@ def create_user_handler(auth_request: MicrosoftAuthRequest, session: SessionDep)
     - **response**: Información del usuario autenticado o creado.
     """
     try:
-        user = authenticate_with_microsoft(auth_request.token, session=session)
+        user = await authenticate_with_microsoft(auth_request.token, session=session)
         return user
     except HTTPException as e:
         raise e
@@ -66,14 +73,16 @@ def create_user_handler(auth_request: MicrosoftAuthRequest, session: SessionDep)
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Users"],
 )
-def delete_user_handler(delete_request: DeleteUserRequest, session: SessionDep) -> None:
+async def delete_user_handler(
+    delete_request: DeleteUserRequest, session: AsyncSessionDep
+) -> None:
     """
     Elimina un usuario de la base de datos por su ID.
 
     - **delete_request**: JSON con el ID del usuario a eliminar.
     """
     try:
-        delete_user(delete_request.user_id, session=session)
+        await delete_user(delete_request.user_id, session=session)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -89,7 +98,9 @@ def delete_user_handler(delete_request: DeleteUserRequest, session: SessionDep)
     status_code=status.HTTP_200_OK,
     tags=["Users"],
 )
-def get_user_handler(request: GetUserInfoRequest, session: SessionDep) -> UserInfoRead:
+async def get_user_handler(
+    request: GetUserInfoRequest, session: AsyncSessionDep
+) -> UserInfoRead:
     """
     Obtiene la información de un usuario a partir de su ID.
 
@@ -97,7 +108,7 @@ def get_user_handler(request: GetUserInfoRequest, session: SessionDep) -> UserIn
     - **response**: Información del usuario.
     """
     try:
-        return get_user_info(request, session=session)
+        return await get_user_info(request, session=session)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -113,14 +124,14 @@ def get_user_handler(request: GetUserInfoRequest, session: SessionDep) -> UserIn
     status_code=status.HTTP_200_OK,
     tags=["Users"],
 )
-def get_all_users_handler(session: SessionDep):
+async def get_all_users_handler(session: AsyncSessionDep):
     """
     Obtiene todos los usuarios registrados en la base de datos.
 
     - **response**: Lista de todos los usuarios.
     """
-    users = get_all_users(session=session)
-    return users
+    users = await get_all_users(session=session)
+    return json_response(List[User], users)
 
 
 @router.get(
@@ -129,13 +140,13 @@ def get_all_users_handler(session: SessionDep):
     status_code=status.HTTP_200_OK,
     tags=["Users"],
 )
-def get_active_users_count(session: SessionDep) -> int:
+async def get_active_users_count(session: AsyncSessionDep) -> int:
     """
     Obtiene el número de usuarios activos registrados en la base de datos.
 
     - **response**: Número de usuarios activos.
     """
-    return count_users(session)
+    return await count_users(session)
 
 
 @router.get(
@@ -146,14 +157,14 @@ def get_active_users_count(session: SessionDep) -> int:
     description="Recupera todos los tableros asociados a un usuario específico.",
     tags=["Boards"],
 )
-def list_boards_handler_user(user_id: uuid.UUID, session: SessionDep):
+async def list_boards_handler_user(user_id: uuid.UUID, session: AsyncSessionDep):
     """
     Recupera todos los tableros asociados a un usuario específico.
 
     - **user_id**: ID del usuario.
     - **response**: Lista de tableros asociados.
     """
-    boards = list_boards_user(user_id, session)
+    boards = await list_boards_user(user_id, session)
     return boards
 
 
@@ -163,13 +174,13 @@ def list_boards_handler_user(user_id: uuid.UUID, session: SessionDep):
     status_code=status.HTTP_201_CREATED,
     tags=["Dashboards"],
 )
-def create_dashboard_handler(
-    payload: DashboardCreate, session: SessionDep
+async def create_dashboard_handler(
+    payload: DashboardCreate, session: AsyncSessionDep
 ) -> Dashboard:
     """
     Crea un nuevo dashboard para un usuario basado en un JSON con el user_id.
     """
-    return create_dashboard(payload.user_id, session)
+    return await create_dashboard(payload.user_id, session)
 
 
 @router.get(
@@ -178,7 +189,9 @@ def create_dashboard_handler(
     status_code=status.HTTP_200_OK,
     tags=["Dashboards"],
 )
-def get_dashboard_by_user_handler(user_id: str, session: SessionDep) -> Dashboard:
+async def get_dashboard_by_user_handler(
+    user_id: str, session: AsyncSessionDep
+) -> Dashboard:
     """
     Obtiene el Dashboard de un Usuario basado en un parámetro de ruta.
     """
@@ -190,4 +203,21 @@ def get_dashboard_by_user_handler(user_id: str, session: SessionDep) -> Dashboar
             detail="Formato de user_id inválido. Debe ser un UUID válido.",
         )
 
-    return get_user_dashboard(user_uuid, session)
+    return await get_user_dashboard(user_uuid, session)
+
+
+@router.get(
+    "/users/{user_id}/dashboards/tree",
+    response_model=DashboardTree,
+    status_code=status.HTTP_200_OK,
+    tags=["Dashboards"],
+)
+async def get_dashboard_tree_handler(user_id: uuid.UUID, session: AsyncSessionDep):
+    """
+    Obtiene en una sola respuesta el Dashboard de un Usuario con sus boards,
+    catálogos y KPIs, incluyendo el color, el gráfico y el último valor de
+    cada KPI.
+
+    - **user_id**: ID del usuario.
+    """
+    return await get_dashboard_tree(user_id, session)
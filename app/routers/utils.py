@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, status
+from sqlalchemy import delete
 from sqlmodel import select
 from typing import List
 
 from app.models.utils import Color, ColorBase, Chart, ChartBase, Icon, IconBase
-from app.db import SessionDep
+from app import reference_cache
+from app.db import AsyncSessionDep
+from app.etags import ETag
 
 router = APIRouter()
 
@@ -14,10 +17,8 @@ router = APIRouter()
     status_code=status.HTTP_201_CREATED,
     tags=["Colors"],
 )
-def create_color(color: ColorBase, session: SessionDep):
-    existing_color = session.exec(
-        select(Color).where(Color.abbrev == color.abbrev)
-    ).first()
+async def create_color(color: ColorBase, session: AsyncSessionDep):
+    existing_color = await reference_cache.colors.get_by_abbrev(color.abbrev, session)
     if existing_color:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -25,8 +26,9 @@ def create_color(color: ColorBase, session: SessionDep):
         )
     new_color = Color.model_validate(color)
     session.add(new_color)
-    session.commit()
-    session.refresh(new_color)
+    await session.commit()
+    await session.refresh(new_color)
+    reference_cache.colors.invalidate()
     return new_color
 
 
@@ -35,15 +37,15 @@ def create_color(color: ColorBase, session: SessionDep):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Colors"],
 )
-def delete_color(color_id: int, session: SessionDep):
-    color = session.get(Color, color_id)
-    if not color:
+async def delete_color(color_id: int, session: AsyncSessionDep):
+    result = await session.execute(delete(Color).where(Color.id == color_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Color not found.",
         )
-    session.delete(color)
-    session.commit()
+    await session.commit()
+    reference_cache.colors.invalidate()
     return
 
 
@@ -52,9 +54,9 @@ def delete_color(color_id: int, session: SessionDep):
     response_model=List[Color],
     tags=["Colors"],
 )
-def get_colors(session: SessionDep):
-    colors = session.exec(select(Color)).all()
-    return colors
+async def get_colors(session: AsyncSessionDep, versions: List[int] = ETag("color")):
+    # La versión que leyó el ETag sirve también para validar la caché.
+    return await reference_cache.colors.all(session, versions[0])
 
 
 @router.post(
@@ -63,10 +65,8 @@ def get_colors(session: SessionDep):
     status_code=status.HTTP_201_CREATED,
     tags=["Charts"],
 )
-def create_chart(chart: ChartBase, session: SessionDep):
-    existing_chart = session.exec(
-        select(Chart).where(Chart.abbrev == chart.abbrev)
-    ).first()
+async def create_chart(chart: ChartBase, session: AsyncSessionDep):
+    existing_chart = await reference_cache.charts.get_by_abbrev(chart.abbrev, session)
     if existing_chart:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -74,8 +74,9 @@ def create_chart(chart: ChartBase, session: SessionDep):
         )
     new_chart = Chart.model_validate(chart)
     session.add(new_chart)
-    session.commit()
-    session.refresh(new_chart)
+    await session.commit()
+    await session.refresh(new_chart)
+    reference_cache.charts.invalidate()
     return new_chart
 
 
@@ -84,15 +85,15 @@ def create_chart(chart: ChartBase, session: SessionDep):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Charts"],
 )
-def delete_chart(chart_id: int, session: SessionDep):
-    chart = session.get(Chart, chart_id)
-    if not chart:
+async def delete_chart(chart_id: int, session: AsyncSessionDep):
+    result = await session.execute(delete(Chart).where(Chart.id == chart_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chart not found.",
         )
-    session.delete(chart)
-    session.commit()
+    await session.commit()
+    reference_cache.charts.invalidate()
     return
 
 
@@ -101,9 +102,8 @@ def delete_chart(chart_id: int, session: SessionDep):
     response_model=List[Chart],
     tags=["Charts"],
 )
-def get_charts(session: SessionDep):
-    charts = session.exec(select(Chart)).all()
-    return charts
+async def get_charts(session: AsyncSessionDep, versions: List[int] = ETag("chart")):
+    return await reference_cache.charts.all(session, versions[0])
 
 
 @router.post(
@@ -112,8 +112,8 @@ def get_charts(session: SessionDep):
     status_code=status.HTTP_201_CREATED,
     tags=["Icons"],
 )
-def create_icon(icon: IconBase, session: SessionDep):
-    existing_icon = session.exec(select(Icon).where(Icon.abbrev == icon.abbrev)).first()
+async def create_icon(icon: IconBase, session: AsyncSessionDep):
+    existing_icon = await reference_cache.icons.get_by_abbrev(icon.abbrev, session)
     if existing_icon:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -121,8 +121,9 @@ def create_icon(icon: IconBase, session: SessionDep):
         )
     new_icon = Icon.model_validate(icon)
     session.add(new_icon)
-    session.commit()
-    session.refresh(new_icon)
+    await session.commit()
+    await session.refresh(new_icon)
+    reference_cache.icons.invalidate()
     return new_icon
 
 
@@ -131,15 +132,15 @@ def create_icon(icon: IconBase, session: SessionDep):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["Icons"],
 )
-def delete_icon(icon_id: int, session: SessionDep):
-    icon = session.get(Icon, icon_id)
-    if not icon:
+async def delete_icon(icon_id: int, session: AsyncSessionDep):
+    result = await session.execute(delete(Icon).where(Icon.id == icon_id))
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Icon not found.",
         )
-    session.delete(icon)
-    session.commit()
+    await session.commit()
+    reference_cache.icons.invalidate()
     return
 
 
@@ -148,16 +149,17 @@ def delete_icon(icon_id: int, session: SessionDep):
     response_model=List[Icon],
     tags=["Icons"],
 )
-def get_icons(session: SessionDep):
-    icons = session.exec(select(Icon)).all()
-    return icons
+async def get_icons(session: AsyncSessionDep, versions: List[int] = ETag("icon")):
+    return await reference_cache.icons.all(session, versions[0])
 
 
 @router.put(
     "/{icon_id}", response_model=Icon, status_code=status.HTTP_200_OK, tags=["Icons"]
 )
-def update_icon_handler(icon_id: int, icon: IconBase, session: SessionDep) -> Icon:
-    db_icon = session.exec(select(Icon).where(Icon.id == icon_id)).first()
+async def update_icon_handler(
+    icon_id: int, icon: IconBase, session: AsyncSessionDep
+) -> Icon:
+    db_icon = (await session.exec(select(Icon).where(Icon.id == icon_id))).first()
     if not db_icon:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Icon not found"
@@ -168,7 +170,8 @@ def update_icon_handler(icon_id: int, icon: IconBase, session: SessionDep) -> Ic
     for key, value in icon_data.items():
         setattr(db_icon, key, value)
 
-    session.commit()
-    session.refresh(db_icon)
+    await session.commit()
+    await session.refresh(db_icon)
+    reference_cache.icons.invalidate()
 
     return db_icon
@@ -1,9 +1,14 @@
 from typing import List, Optional
 import uuid
+from pydantic import BaseModel, Field
 from app.models.boards import BoardBase
 from app.models.catalogs import Catalog
 from app.models.users import User
 
+# Cada usuario es un parámetro de la consulta `IN` que los valida; SQLite
+# admite hasta 32766 parámetros por sentencia.
+MAX_BOARD_MEMBERS = 10000
+
 
 class BoardUpdate(BoardBase):
     users: List[User]
@@ -23,5 +28,14 @@ class BoardCreate(BoardBase):
 
 
 class BoardCreateUsers(BoardBase):
-    user_ids: List[uuid.UUID]
+    user_ids: List[uuid.UUID] = Field(max_length=MAX_BOARD_MEMBERS)
     pass
+
+
+class BoardMembers(BaseModel):
+    user_ids: List[uuid.UUID] = Field(max_length=MAX_BOARD_MEMBERS)
+
+
+class BoardMembersDelta(BaseModel):
+    add: List[uuid.UUID] = Field(default=[], max_length=MAX_BOARD_MEMBERS)
+    remove: List[uuid.UUID] = Field(default=[], max_length=MAX_BOARD_MEMBERS)
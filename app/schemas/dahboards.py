@@ -1,7 +1,13 @@
 import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
 from sqlmodel import SQLModel
-from app.models.boards import Board
+from app.models.boards import Board, BoardBase
+from app.models.catalogs import CatalogBase
 from app.models.dashboards import DashboardBase
+from app.models.kpis import KpiBase
+from app.models.utils import Chart, Color, Icon
 
 
 class DashboardRead(DashboardBase):
@@ -11,3 +17,31 @@ class DashboardRead(DashboardBase):
 
 class DashboardCreate(SQLModel):
     user_id: uuid.UUID
+
+
+class KpiTree(KpiBase):
+    id: int
+    catalog_id: int
+    color_schema: Optional[int] = None
+    chart_type: Optional[int] = None
+    color: Optional[Color] = None
+    chart: Optional[Chart] = None
+    latest_value: Optional[Decimal] = None
+    latest_at: Optional[datetime] = None
+
+
+class CatalogTree(CatalogBase):
+    id: int
+    board_id: int
+    kpis: List[KpiTree] = []
+
+
+class BoardTree(BoardBase):
+    id: int
+    icon: Optional[Icon] = None
+    catalogs: List[CatalogTree] = []
+
+
+class DashboardTree(DashboardBase):
+    id: int
+    boards: List[BoardTree] = []
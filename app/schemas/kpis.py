@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.models.kpis import KpiBase
 from app.models.records import Records
@@ -8,8 +8,9 @@ from app.models.records import Records
 class KpiRead(KpiBase):
     id: int
     catalog_id: int
-    color_schema: int
-    chart_type: int
+    # Se ponen a NULL al eliminar el color o el gráfico.
+    color_schema: Optional[int]
+    chart_type: Optional[int]
     records: List["Records"]
 
 
@@ -24,3 +25,10 @@ class PositionUpdate(BaseModel):
 
 class MoveKpiRequest(BaseModel):
     new_catalog_id: int
+
+
+MAX_REORDER_KPIS = 1000
+
+
+class KpiReorder(BaseModel):
+    kpi_ids: List[int] = Field(min_length=1, max_length=MAX_REORDER_KPIS)
@@ -1,6 +1,68 @@
-from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from decimal import Decimal
 
 
 class RecordCreate(BaseModel):
     value: Decimal
+
+
+MAX_BULK_RECORDS = 10000
+
+
+class RecordBulkItem(BaseModel):
+    kpi_id: int
+    value: Decimal
+    created_at: Optional[datetime] = None
+
+
+class RecordBulkCreate(BaseModel):
+    records: List[RecordBulkItem] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+
+
+class RecordBulkItemStatus(BaseModel):
+    index: int
+    kpi_id: int
+    created: bool
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class RecordBulkResult(BaseModel):
+    created: int
+    failed: int
+    items: List[RecordBulkItemStatus]
+
+
+class BucketWidth(str, Enum):
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class AggregateFunction(str, Enum):
+    avg = "avg"
+    min = "min"
+    max = "max"
+    sum = "sum"
+    count = "count"
+    last = "last"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+
+class RecordAggregate(BaseModel):
+    bucket: datetime
+    value: Optional[float]
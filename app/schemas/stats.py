@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class Stats(BaseModel):
+    users: int
+    boards: int
+    catalogs: int
+    kpis: int
+    dashboards: int
+    records: int
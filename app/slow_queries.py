@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Engine, event
+
+# Registro de consultas lentas.
+#
+# Cada sentencia que tarda más de `SLOW_QUERY_MS` milisegundos se agrupa por
+# su huella (el SQL normalizado, sin literales ni tamaño de las listas IN) y
+# la primera vez se registra con los tipos de sus parámetros, la ruta que la
+# ejecutó y el plan de `EXPLAIN QUERY PLAN`. Las repeticiones solo suman en
+# su entrada y se vuelven a registrar al llegar a 2, 4, 8... ocurrencias.
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv("SLOW_QUERY_MAX_ENTRIES", "500"))
+
+# Sentencias sin plan de consulta.
+_NO_PLAN = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "slow_query_scope", default=None
+)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    SQL sin literales, con las listas de `?` de IN y de VALUES reducidas a
+    una, para agrupar las ejecuciones de la misma consulta.
+    """
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _VALUES_LIST.sub(r"\1, ...", sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _type_runs(values) -> str:
+    # ("int", "int", "str") -> "int x2, str"
+    runs: List[List[Any]] = []
+    for value in values:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return ", ".join(name if n == 1 else f"{name} x{n}" for name, n in runs)
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """
+    Tipos de los parámetros, sin sus valores: `(int, str x3)`, o
+    `500 x (int, float)` en un executemany.
+    """
+    if executemany:
+        rows = list(parameters or ())
+        first = rows[0] if rows else ()
+        return f"{len(rows)} x {parameter_shape(first, False)}"
+    if isinstance(parameters, dict):
+        return (
+            "{"
+            + ", ".join(
+                f"{key}: {type(value).__name__}" for key, value in parameters.items()
+            )
+            + "}"
+        )
+    return f"({_type_runs(parameters or ())})"
+
+
+def _route() -> str:
+    scope = _scope.get()
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+def _explain(conn, statement: str, parameters, executemany: bool) -> List[str]:
+    if statement.lstrip().upper().startswith(_NO_PLAN):
+        return []
+    if executemany:
+        parameters = next(iter(parameters or ()), ())
+    # Cursor aparte para no pisar el resultado de la consulta original.
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        rows = cursor.fetchall()
+    except Exception as exc:
+        return [f"(sin plan: {exc})"]
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+class SlowQuery:
+    """
+    Consultas lentas con la misma huella.
+    """
+
+    def __init__(self, sql: str, fingerprint: str, parameters: str, plan: List[str]):
+        self.sql = sql
+        self.fingerprint = fingerprint
+        self.parameters = parameters
+        self.plan = plan
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.routes: Dict[str, int] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "parameters": self.parameters,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "routes": self.routes,
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, max_entries: int):
+        self.threshold = threshold_ms / 1000
+        self.max_entries = max_entries
+        self.entries: Dict[str, SlowQuery] = {}
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+        self.record(conn, statement, parameters, executemany, elapsed)
+
+    def record(self, conn, statement, parameters, executemany, elapsed) -> None:
+        sql = normalize_sql(statement)
+        key = fingerprint(sql)
+        route = _route()
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_entries:
+                return
+            # El plan se pide fuera del lock: es otra consulta a la base de datos.
+            plan = _explain(conn, statement, parameters, executemany)
+            entry = SlowQuery(sql, key, parameter_shape(parameters, executemany), plan)
+            with self._lock:
+                entry = self.entries.setdefault(key, entry)
+
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry.count += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.routes[route] = entry.routes.get(route, 0) + 1
+            count = entry.count
+
+        if count == 1:
+            logger.warning(
+                "Consulta lenta %s (%.1f ms) en %s\n  SQL: %s\n  Parámetros: %s\n"
+                "  Plan:\n%s",
+                key,
+                elapsed_ms,
+                route,
+                sql,
+                entry.parameters,
+                "\n".join(f"    {line}" for line in entry.plan) or "    -",
+            )
+        elif count & (count - 1) == 0:
+            logger.warning(
+                "Consulta lenta %s: %d veces, %.1f ms en total, máximo %.1f ms",
+                key,
+                count,
+                entry.total_ms,
+                entry.max_ms,
+            )
+
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Entradas ordenadas por tiempo total, de mayor a menor.
+        """
+        with self._lock:
+            entries = [entry.as_dict() for entry in self.entries.values()]
+        return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_MAX_ENTRIES)
+
+
+def instrument(engine: Engine) -> None:
+    """
+    Registra el log de consultas lentas en un engine síncrono (para un engine
+    asíncrono, pasar `async_engine.sync_engine`). No hace nada si
+    `SLOW_QUERY_MS` es 0.
+    """
+    if SLOW_QUERY_MS <= 0:
+        return
+    event.listen(engine, "before_cursor_execute", slow_query_log.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", slow_query_log.after_cursor_execute)
+
+
+class SlowQueryMiddleware:
+    """
+    Middleware ASGI que deja la petición en curso a mano del log, para
+    atribuir cada consulta lenta a su ruta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
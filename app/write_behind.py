@@ -0,0 +1,201 @@
+import asyncio
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import live
+from app.buckets import to_utc_naive
+from app.db import async_engine
+from app.models.kpis import Kpi
+from app.models.records import Records
+from app.rollups import apply_records
+
+# Escritura agrupada (group commit) de `POST /kpis/{kpi_id}/records`.
+#
+# Con SQLite cada commit es una escritura a disco y solo puede haber un
+# escritor a la vez, así que con muchas peticiones concurrentes el límite es
+# la latencia del commit. Con `RECORD_GROUP_COMMIT=1` los registros se
+# encolan en memoria y un único escritor por proceso los inserta en una
+# transacción cada `RECORD_GROUP_COMMIT_MS` milisegundos o cada
+# `RECORD_GROUP_COMMIT_ROWS` registros. Cada petición responde cuando el
+# lote que contiene su registro se ha confirmado.
+#
+# Con `RECORD_GROUP_COMMIT_MS=0` (por defecto) no se espera: un lote se
+# escribe en cuanto termina el anterior, y los registros que llegan durante
+# un commit forman el siguiente.
+RECORD_GROUP_COMMIT = os.getenv("RECORD_GROUP_COMMIT", "0") == "1"
+RECORD_GROUP_COMMIT_MS = int(os.getenv("RECORD_GROUP_COMMIT_MS", "0"))
+RECORD_GROUP_COMMIT_ROWS = int(os.getenv("RECORD_GROUP_COMMIT_ROWS", "500"))
+
+PendingRecord = Tuple[int, Decimal, datetime, asyncio.Future]
+
+
+class RecordWriter:
+    """
+    Cola de registros pendientes y la tarea que los escribe por lotes.
+
+    - **interval**: Segundos máximos que espera un registro antes de escribirse.
+    - **max_rows**: Registros que provocan la escritura inmediata del lote.
+    """
+
+    def __init__(self, interval: float, max_rows: int):
+        self.interval = interval
+        self.max_rows = max_rows
+        self._pending: List[PendingRecord] = []
+        self._first_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self, kpi_id: int, value: Decimal, created_at: datetime
+    ) -> Records:
+        """
+        Encola un registro y espera a que se confirme su lote.
+
+        Retorna el registro tal como quedó en la base de datos. Lanza una
+        excepción HTTP 404 si el KPI no existe al escribir el lote.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._first_at = loop.time()
+        self._pending.append((kpi_id, value, to_utc_naive(created_at), future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        return await future
+
+    def start(self) -> None:
+        """
+        Arranca la tarea que escribe los lotes.
+
+        Se llama desde el ciclo de vida de la aplicación y no desde una
+        petición: la tarea copia las variables de contexto de quien la crea,
+        y con las de una petición sus consultas se contarían en ella.
+        """
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Escribe los registros pendientes y detiene la tarea.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._first_at + self.interval - loop.time()
+            if delay > 0 and len(self._pending) < self.max_rows:
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[: self.max_rows]
+            self._pending = self._pending[self.max_rows :]
+            if len(self._pending) < self.max_rows and not self._closing:
+                self._full.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingRecord]) -> None:
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                # La petición no comprueba el KPI: se validan aquí los de todo
+                # el lote con una consulta, y los que no existen reciben el
+                # mismo 404 que sin agrupar.
+                kpi_ids = {kpi_id for kpi_id, _, _, _ in batch}
+                existing = set(
+                    (
+                        await session.exec(select(Kpi.id).where(Kpi.id.in_(kpi_ids)))
+                    ).all()
+                )
+                accepted = [item for item in batch if item[0] in existing]
+                rows = []
+                if accepted:
+                    rows = (
+                        await session.execute(
+                            insert(Records).returning(
+                                Records.id,
+                                Records.kpi_id,
+                                Records.value,
+                                Records.created_at,
+                                sort_by_parameter_order=True,
+                            ),
+                            [
+                                {"kpi_id": kpi_id, "value": value, "created_at": at}
+                                for kpi_id, value, at, _ in accepted
+                            ],
+                        )
+                    ).all()
+                    await apply_records(
+                        ((kpi_id, value, at) for kpi_id, value, at, _ in accepted),
+                        session,
+                    )
+                    await session.commit()
+        except Exception as exc:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for row, (*_, future) in zip(rows, accepted):
+            if not future.done():
+                future.set_result(Records(**row._mapping))
+        for kpi_id, _, _, future in batch:
+            if kpi_id not in existing and not future.done():
+                future.set_exception(
+                    HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="KPI no encontrado",
+                    )
+                )
+        if rows and live.listening():
+            live.publish(
+                [
+                    live.record_event(row.id, row.kpi_id, row.value, row.created_at)
+                    for row in rows
+                ]
+            )
+
+
+# Se crea en `start()`, dentro del event loop de la aplicación: sus eventos y
+# su tarea pertenecen a ese loop, y cada arranque usa uno nuevo.
+record_writer: Optional[RecordWriter] = None
+
+
+def start() -> None:
+    global record_writer
+    if RECORD_GROUP_COMMIT and record_writer is None:
+        record_writer = RecordWriter(
+            RECORD_GROUP_COMMIT_MS / 1000, RECORD_GROUP_COMMIT_ROWS
+        )
+        record_writer.start()
+
+
+async def stop() -> None:
+    global record_writer
+    if record_writer is None:
+        return
+    await record_writer.close()
+    record_writer = None
@@ -0,0 +1,43 @@
+import argparse
+import json
+
+# Compara dos resultados de `benchmarks.run`, por ejemplo de dos commits.
+
+METRICS = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "    -"
+    return f"{(after - before) / before * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmark")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(
+        f"{before.get('label') or before.get('commit')}"
+        f" -> {after.get('label') or after.get('commit')}"
+    )
+    for name, stats in after["scenarios"].items():
+        previous = before["scenarios"].get(name)
+        if previous is None:
+            continue
+        print(name)
+        for metric in METRICS:
+            print(
+                f"  {metric:10} {previous[metric]:>10} -> {stats[metric]:>10}"
+                f"  {_change(previous[metric], stats[metric])}"
+            )
+
+
+if __name__ == "__main__":
+    main()
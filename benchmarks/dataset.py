@@ -0,0 +1,198 @@
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+# Generador de datos sintéticos para los benchmarks.
+#
+# Crea la base de datos `db.sqlite3` en el directorio indicado con el mismo
+# esquema que la aplicación (tablas, migraciones, triggers) y la llena con
+# executemany directamente sobre la conexión de SQLite, sin pasar por la API.
+
+# Formato con el que SQLAlchemy guarda los datetime en SQLite.
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+RECORDS_CHUNK = 100_000
+
+
+def _insert(cursor, table: str, columns: List[str], rows: List[tuple]) -> None:
+    placeholders = ", ".join("?" for _ in columns)
+    names = ", ".join(f'"{column}"' for column in columns)
+    cursor.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})', rows)
+
+
+def generate(
+    directory: str,
+    users: int = 100,
+    boards: int = 50,
+    members_per_board: int = 5,
+    catalogs_per_board: int = 3,
+    kpis_per_catalog: int = 5,
+    records: int = 1_000_000,
+    days: int = 90,
+    seed: int = 0,
+) -> None:
+    """
+    Crea una base de datos nueva en `directory` con datos sintéticos.
+
+    - **users**: Usuarios, cada uno con su dashboard.
+    - **boards**: Boards, compartidos cada uno con `members_per_board` usuarios.
+    - **catalogs_per_board**, **kpis_per_catalog**: Catálogos y KPIs de cada board.
+    - **records**: Registros repartidos entre todos los KPIs en los últimos `days` días.
+    """
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    if os.path.exists("db.sqlite3"):
+        os.remove("db.sqlite3")
+
+    import app.main  # noqa: F401  registra todos los modelos
+    from sqlmodel import Session
+
+    from app.db import engine, init_db
+    from app.rollups import rebuild_rollups
+
+    init_db()
+    rng = random.Random(seed)
+    connection = engine.raw_connection()
+    try:
+        # Solo para esta conexión: los datos se pueden volver a generar.
+        connection.execute("PRAGMA synchronous = OFF")
+        cursor = connection.cursor()
+        for table in ("color", "chart", "icon"):
+            _insert(
+                cursor,
+                table,
+                ["id", "name", "description", "abbrev"],
+                [
+                    (i, f"{table} {i}", f"{table} {i}", f"{table[0]}{i}")
+                    for i in (1, 2, 3)
+                ],
+            )
+
+        user_ids = [uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(users)]
+        _insert(
+            cursor,
+            "user",
+            ["id", "name"],
+            [(u, f"user {i}") for i, u in enumerate(user_ids)],
+        )
+        _insert(cursor, "dashboard", ["user_id"], [(u,) for u in user_ids])
+
+        _insert(
+            cursor,
+            "board",
+            ["id", "name", "icon_id"],
+            [(i, f"board {i}", rng.randint(1, 3)) for i in range(1, boards + 1)],
+        )
+        _insert(
+            cursor,
+            "dboards",
+            ["board_id", "user_id"],
+            [
+                (board_id, user_id)
+                for board_id in range(1, boards + 1)
+                for user_id in rng.sample(user_ids, min(members_per_board, users))
+            ],
+        )
+
+        catalogs = [
+            (catalog_id, f"catalog {catalog_id}", board_id)
+            for catalog_id, board_id in enumerate(
+                (b for b in range(1, boards + 1) for _ in range(catalogs_per_board)),
+                start=1,
+            )
+        ]
+        _insert(cursor, "catalog", ["id", "name", "board_id"], catalogs)
+
+        kpis = []
+        for catalog_id, _, _ in catalogs:
+            for position in range(1, kpis_per_catalog + 1):
+                kpis.append(
+                    (
+                        len(kpis) + 1,
+                        f"kpi {len(kpis) + 1}",
+                        catalog_id,
+                        position * 1024,
+                        rng.randint(1, 3),
+                        rng.randint(1, 3),
+                    )
+                )
+        _insert(
+            cursor,
+            "kpi",
+            [
+                "id",
+                "name",
+                "catalog_id",
+                "position_index",
+                "color_schema",
+                "chart_type",
+            ],
+            kpis,
+        )
+        connection.commit()
+
+        start = datetime.utcnow() - timedelta(days=days)
+        span = days * 86400
+        kpi_count = len(kpis)
+        written = 0
+        while kpi_count and written < records:
+            size = min(RECORDS_CHUNK, records - written)
+            _insert(
+                cursor,
+                "records",
+                ["kpi_id", "value", "created_at"],
+                [
+                    (
+                        rng.randint(1, kpi_count),
+                        round(rng.uniform(0, 1000), 2),
+                        (start + timedelta(seconds=rng.uniform(0, span))).strftime(
+                            DATETIME_FORMAT
+                        ),
+                    )
+                    for _ in range(size)
+                ],
+            )
+            connection.commit()
+            written += size
+    finally:
+        connection.close()
+
+    with Session(engine) as session:
+        rebuild_rollups(session)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera datos sintéticos para benchmarks"
+    )
+    parser.add_argument("--dir", required=True, help="Directorio de la base de datos")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--members-per-board", type=int, default=5)
+    parser.add_argument("--catalogs-per-board", type=int, default=3)
+    parser.add_argument("--kpis-per-catalog", type=int, default=5)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(
+        os.path.abspath(args.dir),
+        users=args.users,
+        boards=args.boards,
+        members_per_board=args.members_per_board,
+        catalogs_per_board=args.catalogs_per_board,
+        kpis_per_catalog=args.kpis_per_catalog,
+        records=args.records,
+        days=args.days,
+        seed=args.seed,
+    )
+    print(f"Datos generados en {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from benchmarks.scenarios import SCENARIOS, Dataset
+
+# Ejecuta los escenarios contra la aplicación en el mismo proceso (por
+# defecto), contra un uvicorn local que se arranca para la ocasión
+# (`--uvicorn`) o contra un servidor ya levantado (`--url`), y guarda el
+# resultado en JSON para compararlo entre commits con `benchmarks.compare`.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    scenario,
+    dataset: Dataset,
+    rng: random.Random,
+    deadline: float,
+    latencies: Optional[List[float]],
+    errors: Dict[str, int],
+) -> None:
+    while time.perf_counter() < deadline:
+        method, path, body, expected = scenario(dataset, rng)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        elapsed = time.perf_counter() - started
+        if latencies is None:
+            continue
+        if status == expected:
+            latencies.append(elapsed)
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    dataset: Dataset,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    Ejecuta un escenario con `concurrency` clientes durante `duration`
+    segundos, después de `warmup` segundos sin medir.
+    """
+    scenario = SCENARIOS[name]
+    rngs = [random.Random(seed + n) for n in range(concurrency)]
+    errors: Dict[str, int] = {}
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(
+            *(
+                _worker(client, scenario, dataset, rng, deadline, None, errors)
+                for rng in rngs
+            )
+        )
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(
+        *(
+            _worker(client, scenario, dataset, rng, deadline, latencies, errors)
+            for rng in rngs
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    # La base de datos es `db.sqlite3` del directorio actual.
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=60
+        ) as client:
+            yield client
+
+
+@asynccontextmanager
+async def http_client(url: str, concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        yield client
+
+
+@asynccontextmanager
+async def uvicorn_client(
+    port: int, workers: int, concurrency: int
+) -> AsyncIterator[httpx.AsyncClient]:
+    url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)]
+    command += ["--workers", str(workers), "--log-level", "warning"]
+    server = subprocess.Popen(command, env=env)
+    try:
+        async with http_client(url, concurrency) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn no respondió")
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    dataset = Dataset(os.path.join(args.dir, "db.sqlite3"))
+    if args.url:
+        mode, client = "url", http_client(args.url, args.concurrency)
+    elif args.uvicorn:
+        mode = "uvicorn"
+        client = uvicorn_client(args.port, args.workers, args.concurrency)
+    else:
+        mode, client = "in-process", in_process_client()
+
+    result = {
+        "label": args.label,
+        "commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "mode": mode,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "dataset": dataset.stats,
+        "scenarios": {},
+    }
+    async with client as http:
+        for name in args.scenarios:
+            stats = await run_scenario(
+                http,
+                name,
+                dataset,
+                args.concurrency,
+                args.duration,
+                args.warmup,
+                args.seed,
+            )
+            result["scenarios"][name] = stats
+            print(
+                f"{name:16} {stats['throughput']:>8} req/s"
+                f"  p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms"
+                f"  p99 {stats['p99_ms']:>8} ms  errores {sum(stats['errors'].values())}"
+            )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta los escenarios de benchmark")
+    parser.add_argument("--dir", required=True, help="Directorio con db.sqlite3")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=sorted(SCENARIOS),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--label", default=None, help="Nombre de la ejecución")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Servidor ya en ejecución")
+    target.add_argument(
+        "--uvicorn", action="store_true", help="Arranca uvicorn en --dir"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    args.dir = os.path.abspath(args.dir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(args.dir)
+
+    result = asyncio.run(run(args))
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(f"Resultados en {output}")
+
+
+if __name__ == "__main__":
+    main()
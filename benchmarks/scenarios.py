@@ -0,0 +1,73 @@
+import random
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Cada escenario genera la siguiente petición a partir de los IDs del
+# dataset: (método, ruta, cuerpo JSON, código esperado).
+Request = Tuple[str, str, Optional[Dict[str, Any]], int]
+
+
+class Dataset:
+    """
+    IDs existentes en la base de datos del benchmark, para construir rutas.
+    """
+
+    def __init__(self, path: str, sample: int = 1000):
+        connection = sqlite3.connect(path)
+        try:
+            self.member_ids: List[str] = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT DISTINCT user_id FROM dboards ORDER BY random() LIMIT ?",
+                    (sample,),
+                )
+            ]
+            self.kpi_ids: List[int] = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT id FROM kpi ORDER BY random() LIMIT ?", (sample,)
+                )
+            ]
+            self.stats: Dict[str, int] = {
+                name: rows
+                for name, rows in connection.execute(
+                    "SELECT name, rows FROM tablecounter"
+                )
+            }
+        finally:
+            connection.close()
+
+
+def dashboard_load(dataset: Dataset, rng: random.Random) -> Request:
+    user_id = rng.choice(dataset.member_ids)
+    return "GET", f"/users/{user_id}/dashboards/tree", None, 200
+
+
+def record_ingest(dataset: Dataset, rng: random.Random) -> Request:
+    kpi_id = rng.choice(dataset.kpi_ids)
+    body = {"value": round(rng.uniform(0, 1000), 2)}
+    return "POST", f"/kpis/{kpi_id}/records", body, 201
+
+
+def record_history(dataset: Dataset, rng: random.Random) -> Request:
+    kpi_id = rng.choice(dataset.kpi_ids)
+    return "GET", f"/kpis/{kpi_id}/records?limit=500", None, 200
+
+
+def board_listing(dataset: Dataset, rng: random.Random) -> Request:
+    user_id = rng.choice(dataset.member_ids)
+    return "GET", f"/users/{user_id}/boards", None, 200
+
+
+def ping(dataset: Dataset, rng: random.Random) -> Request:
+    # Sin base de datos: mide el coste fijo de cada petición (middlewares).
+    return "GET", "/", None, 200
+
+
+SCENARIOS: Dict[str, Callable[[Dataset, random.Random], Request]] = {
+    "dashboard_load": dashboard_load,
+    "record_ingest": record_ingest,
+    "record_history": record_history,
+    "board_listing": board_listing,
+    "ping": ping,
+}
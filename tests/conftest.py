@@ -0,0 +1,113 @@
+import os
+import tempfile
+import uuid
+from typing import List
+
+import pytest
+
+# La aplicación usa `db.sqlite3` del directorio actual: las pruebas se
+# ejecutan en un directorio temporal con su propia base de datos.
+os.chdir(tempfile.mkdtemp(prefix="sig-api-tests-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models.dashboards import Dashboard  # noqa: E402
+from app.models.users import User  # noqa: E402
+from app.models.utils import Chart, Color, Icon  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    upgrade(engine)
+    return engine
+
+
+@pytest.fixture
+def client():
+    # Un ciclo de vida de la aplicación por prueba.
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def references(database):
+    """
+    Un color, un gráfico y un icono, compartidos por todas las pruebas.
+    """
+    with Session(database) as session:
+        color = Color(name="Verde", description="Verde", abbrev="test-green")
+        chart = Chart(name="Líneas", description="Líneas", abbrev="test-line")
+        icon = Icon(name="Panel", description="Panel", abbrev="test-panel")
+        session.add_all([color, chart, icon])
+        session.commit()
+        return {"color": color.id, "chart": chart.id, "icon": icon.id}
+
+
+def create_users(count: int) -> List[uuid.UUID]:
+    """
+    Crea `count` usuarios con su dashboard y retorna sus ids.
+    """
+    user_ids = [uuid.uuid4() for _ in range(count)]
+    with Session(engine) as session:
+        session.add_all(User(id=user_id, name="Usuario") for user_id in user_ids)
+        session.commit()
+        session.add_all(Dashboard(user_id=user_id) for user_id in user_ids)
+        session.commit()
+    return user_ids
+
+
+def create_board(
+    client: TestClient, references, user_ids: List[uuid.UUID], kpis: int = 1
+) -> dict:
+    """
+    Crea un board compartido por `user_ids` con un catálogo y `kpis` KPIs.
+    """
+    response = client.post(
+        "/boards/multiple-users/",
+        json={
+            "name": "Board",
+            "icon_id": references["icon"],
+            "user_ids": [str(user_id) for user_id in user_ids],
+        },
+    )
+    assert response.status_code == 201, response.text
+    board = response.json()[0]
+    catalog = client.post(f"/boards/{board['id']}/catalogs/", json={"name": "Catálogo"})
+    assert catalog.status_code == 201, catalog.text
+    board["catalog_id"] = catalog.json()["id"]
+    board["kpi_ids"] = []
+    for n in range(kpis):
+        kpi = client.post(
+            f"/catalogs/{board['catalog_id']}/kpis",
+            json={
+                "name": f"KPI {n}",
+                "color_schema": references["color"],
+                "chart_type": references["chart"],
+            },
+        )
+        assert kpi.status_code == 201, kpi.text
+        board["kpi_ids"].append(kpi.json()["id"])
+    return board
+
+
+def create_records(client: TestClient, records: List[tuple]) -> List[int]:
+    """
+    Crea registros `(kpi_id, value, created_at)` con fecha y retorna sus ids.
+    """
+    response = client.post(
+        "/records/bulk",
+        json={
+            "records": [
+                {"kpi_id": kpi_id, "value": str(value), "created_at": created_at}
+                for kpi_id, value, created_at in records
+            ]
+        },
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["failed"] == 0, result
+    return [item["id"] for item in result["items"]]
@@ -0,0 +1,96 @@
+import pytest
+
+from tests.conftest import create_board, create_records, create_users
+
+RECORDS = [
+    # Domingo: última semana que empieza el lunes 1 de enero.
+    (1, "2024-01-07T23:00:00"),
+    # Lunes 8: semana nueva.
+    (3, "2024-01-08T00:00:00"),
+    (5, "2024-01-08T01:00:00"),
+    # El 31 de enero y el 1 de febrero: misma semana, distinto mes.
+    (7, "2024-01-31T23:59:59"),
+    (9, "2024-02-01T00:00:00"),
+]
+
+
+@pytest.fixture
+def kpi_id(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    create_records(client, [(kpi_id, value, at) for value, at in RECORDS])
+    return kpi_id
+
+
+def aggregate(client, kpi_id, **params):
+    response = client.get(f"/kpis/{kpi_id}/records/aggregate", params=params)
+    assert response.status_code == 200, response.text
+    return [(point["bucket"], point["value"]) for point in response.json()]
+
+
+def test_week_and_month_boundaries(client, kpi_id):
+    assert aggregate(client, kpi_id, bucket="week", function="sum") == [
+        ("2024-01-01T00:00:00", 1.0),
+        ("2024-01-08T00:00:00", 8.0),
+        ("2024-01-29T00:00:00", 16.0),
+    ]
+    assert aggregate(client, kpi_id, bucket="month", function="count") == [
+        ("2024-01-01T00:00:00", 4.0),
+        ("2024-02-01T00:00:00", 1.0),
+    ]
+
+
+@pytest.mark.parametrize(
+    "function, values",
+    [
+        ("avg", [1.0, 4.0, 7.0, 9.0]),
+        ("min", [1.0, 3.0, 7.0, 9.0]),
+        ("max", [1.0, 5.0, 7.0, 9.0]),
+        ("sum", [1.0, 8.0, 7.0, 9.0]),
+        ("count", [1.0, 2.0, 1.0, 1.0]),
+        ("last", [1.0, 5.0, 7.0, 9.0]),
+    ],
+)
+def test_functions_per_day(client, kpi_id, function, values):
+    points = aggregate(client, kpi_id, bucket="day", function=function)
+    assert [bucket for bucket, _ in points] == [
+        "2024-01-07T00:00:00",
+        "2024-01-08T00:00:00",
+        "2024-01-31T00:00:00",
+        "2024-02-01T00:00:00",
+    ]
+    assert [value for _, value in points] == values
+
+
+def test_range_filters_and_rollups_agree(client, kpi_id):
+    # Rango alineado a días: se lee de los rollups.
+    aligned = aggregate(
+        client,
+        kpi_id,
+        bucket="day",
+        function="sum",
+        since="2024-01-08T00:00:00",
+        until="2024-02-01T00:00:00",
+    )
+    # Desalineado: se agrega desde los registros.
+    unaligned = aggregate(
+        client,
+        kpi_id,
+        bucket="day",
+        function="sum",
+        since="2024-01-07T23:30:00",
+        until="2024-01-31T23:59:59.5",
+    )
+    assert (
+        aligned
+        == unaligned
+        == [
+            ("2024-01-08T00:00:00", 8.0),
+            ("2024-01-31T00:00:00", 7.0),
+        ]
+    )
+
+
+def test_unknown_kpi(client):
+    response = client.get("/kpis/999999/records/aggregate")
+    assert response.status_code == 404
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+
+CLIENT_ID = "00000000-0000-0000-0000-00000000c11e"
+TENANT_ID = "00000000-0000-0000-0000-0000000000aa"
+
+
+class MicrosoftStandIn:
+    """
+    Servidor local con el JWKS y el `/me` de Graph, que cuenta las peticiones
+    que recibe. `keys` son las claves publicadas, por `kid`.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.jwks_requests = 0
+        self.graph_requests = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/keys":
+                    stand_in.jwks_requests += 1
+                    body = {"keys": [stand_in.jwk(kid) for kid in stand_in.keys]}
+                elif self.path == "/me":
+                    stand_in.graph_requests += 1
+                    token = self.headers["Authorization"].removeprefix("Bearer ")
+                    claims = jwt.decode(token, options={"verify_signature": False})
+                    body = {"id": claims["oid"], "displayName": "Graph"}
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def add_key(self, kid: str) -> None:
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def jwk(self, kid: str) -> dict:
+        public = json.loads(
+            jwt.algorithms.RSAAlgorithm.to_jwk(self.keys[kid].public_key())
+        )
+        return {**public, "kid": kid, "use": "sig", "alg": "RS256"}
+
+    def token(self, kid: str, oid: uuid.UUID, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "aud": CLIENT_ID,
+            "iss": f"https://login.microsoftonline.com/{TENANT_ID}/v2.0",
+            "tid": TENANT_ID,
+            "oid": str(oid),
+            "name": "Claims",
+            "iat": now,
+            "exp": now + 3600,
+            **claims,
+        }
+        key = self.keys.get(kid) or rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def microsoft(monkeypatch):
+    stand_in = MicrosoftStandIn()
+    stand_in.add_key("key-1")
+    monkeypatch.setattr(auth, "MICROSOFT_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setattr(auth, "MICROSOFT_TENANT_ID", TENANT_ID)
+    monkeypatch.setattr(auth, "MICROSOFT_GRAPH_URL", f"{stand_in.url}/me")
+    monkeypatch.setattr(
+        auth, "jwks_cache", auth.JwksCache(f"{stand_in.url}/keys", auth.JWKS_CACHE_TTL)
+    )
+    yield stand_in
+    stand_in.close()
+
+
+def login(client, token: str):
+    return client.post("/auth/microsoft", json={"token": token})
+
+
+def test_graph_is_only_called_for_new_users(client, microsoft):
+    oid = uuid.uuid4()
+    token = microsoft.token("key-1", oid)
+
+    first = login(client, token)
+    assert first.status_code == 200, first.text
+    assert first.json()["name"] == "Graph"
+    assert login(client, token).status_code == 200
+    assert microsoft.graph_requests == 1
+    assert microsoft.jwks_requests == 1
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [{"aud": "otra-aplicacion"}, {"exp": 1}, {"tid": "otro-tenant"}],
+    ids=["audience", "expired", "tenant"],
+)
+def test_invalid_claims_are_rejected(client, microsoft, claims):
+    token = microsoft.token("key-1", uuid.uuid4(), **claims)
+    assert login(client, token).status_code == 400
+    assert microsoft.graph_requests == 0
+
+
+def test_unknown_kid_is_rejected(client, microsoft):
+    assert login(client, microsoft.token("key-1", uuid.uuid4())).status_code == 200
+    assert login(client, microsoft.token("unknown", uuid.uuid4())).status_code == 400
+
+
+def test_key_rotation_refreshes_jwks(client, microsoft, monkeypatch):
+    monkeypatch.setattr(auth, "JWKS_MIN_REFRESH_INTERVAL", 0)
+    oid = uuid.uuid4()
+    assert login(client, microsoft.token("key-1", oid)).status_code == 200
+
+    microsoft.keys.pop("key-1")
+    microsoft.add_key("key-2")
+    assert login(client, microsoft.token("key-2", oid)).status_code == 200
+    assert microsoft.jwks_requests == 2
+
+
+def test_unknown_kids_refresh_jwks_at_most_once_per_interval(client, microsoft):
+    assert login(client, microsoft.token("key-1", uuid.uuid4())).status_code == 200
+    # Recién descargado: un kid desconocido no provoca otra descarga.
+    assert login(client, microsoft.token("unknown", uuid.uuid4())).status_code == 400
+    assert microsoft.jwks_requests == 1
+
+    auth.jwks_cache._fetched_at -= auth.JWKS_MIN_REFRESH_INTERVAL + 1
+    for kid in ("unknown-1", "unknown-2", "unknown-3"):
+        assert login(client, microsoft.token(kid, uuid.uuid4())).status_code == 400
+    assert microsoft.jwks_requests == 2
+
+
+def test_client_survives_application_restart(microsoft):
+    # El cliente HTTP que se cierra al apagar la aplicación no se reutiliza
+    # en el siguiente arranque.
+    oid = uuid.uuid4()
+    for _ in range(2):
+        with TestClient(app) as client:
+            response = login(client, microsoft.token("key-1", oid))
+            assert response.status_code == 200, response.text
+    assert microsoft.jwks_requests == 1
@@ -0,0 +1,59 @@
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models.records import Records
+from app.models.rollups import RecordRollupHourly
+from app.schemas.records import MAX_BULK_RECORDS
+from tests.conftest import create_board, create_users
+
+
+def test_unknown_kpis_fail_without_failing_the_rest(client, references):
+    (user_id,) = create_users(1)
+    first, second = create_board(client, references, [user_id], kpis=2)["kpi_ids"]
+    items = [
+        {"kpi_id": first, "value": "1.5", "created_at": "2024-01-01T10:00:00"},
+        {"kpi_id": 999999, "value": "2"},
+        {"kpi_id": second, "value": "3", "created_at": "2024-01-01T12:00:00+02:00"},
+        {"kpi_id": first, "value": "4", "created_at": "2024-01-01T10:30:00"},
+    ]
+
+    response = client.post("/records/bulk", json={"records": items})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["created"], result["failed"]) == (3, 1)
+    assert [item["created"] for item in result["items"]] == [True, False, True, True]
+    assert [item["index"] for item in result["items"]] == [0, 1, 2, 3]
+    assert result["items"][1]["detail"] == "KPI no encontrado"
+    assert result["items"][1]["id"] is None
+
+    ids = [item["id"] for item in result["items"] if item["created"]]
+    with Session(engine) as session:
+        records = {
+            record.id: record
+            for record in session.exec(select(Records).where(Records.id.in_(ids)))
+        }
+        rollup = session.exec(
+            select(RecordRollupHourly).where(RecordRollupHourly.kpi_id == first)
+        ).one()
+    # Cada id corresponde a su elemento, en el orden de la petición.
+    assert [(records[i].kpi_id, float(records[i].value)) for i in ids] == [
+        (first, 1.5),
+        (second, 3.0),
+        (first, 4.0),
+    ]
+    assert records[ids[1]].created_at.isoformat() == "2024-01-01T10:00:00"
+    assert (rollup.count, rollup.sum) == (2, 5.5)
+
+
+def test_all_unknown_kpis(client):
+    response = client.post(
+        "/records/bulk", json={"records": [{"kpi_id": 999999, "value": "1"}]}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 0
+
+
+def test_batch_size_is_limited(client):
+    items = [{"kpi_id": 1, "value": "1"}] * (MAX_BULK_RECORDS + 1)
+    assert client.post("/records/bulk", json={"records": items}).status_code == 422
+    assert client.post("/records/bulk", json={"records": []}).status_code == 422
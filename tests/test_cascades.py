@@ -0,0 +1,56 @@
+from sqlmodel import Session, func, select
+
+from app.db import engine
+from app.models.catalogs import Catalog
+from app.models.kpis import Kpi
+from app.models.records import Records
+from tests.conftest import create_board, create_users
+
+
+def test_deleting_references_keeps_kpis_listable(client, references):
+    (user_id,) = create_users(1)
+    color = client.post(
+        "/colors/", json={"name": "Azul", "description": "Azul", "abbrev": "tmp-blue"}
+    ).json()
+    chart = client.post(
+        "/charts/",
+        json={"name": "Barras", "description": "Barras", "abbrev": "tmp-bar"},
+    ).json()
+    board = create_board(
+        client, {**references, "color": color["id"], "chart": chart["id"]}, [user_id]
+    )
+
+    assert client.delete(f"/colors/{color['id']}").status_code == 204
+    assert client.delete(f"/charts/{chart['id']}").status_code == 204
+
+    response = client.get(f"/catalogs/{board['catalog_id']}/kpis")
+    assert response.status_code == 200, response.text
+    (kpi,) = response.json()
+    assert kpi["color_schema"] is None
+    assert kpi["chart_type"] is None
+
+
+def test_deleting_a_board_removes_its_tree(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=2)
+    for kpi_id in board["kpi_ids"]:
+        response = client.post(
+            f"/kpis/{kpi_id}/records",
+            json={"value": "1", "created_at": "2024-01-01T00:00:00"},
+        )
+        assert response.status_code == 201, response.text
+
+    assert client.delete(f"/boards/{board['id']}").status_code == 204
+
+    with Session(engine) as session:
+        catalogs = session.exec(
+            select(func.count()).where(Catalog.board_id == board["id"])
+        ).one()
+        kpis = session.exec(
+            select(func.count()).where(Kpi.id.in_(board["kpi_ids"]))
+        ).one()
+        records = session.exec(
+            select(func.count()).where(Records.kpi_id.in_(board["kpi_ids"]))
+        ).one()
+    assert (catalogs, kpis, records) == (0, 0, 0)
+    assert client.get(f"/users/{user_id}/boards").json() == []
@@ -0,0 +1,43 @@
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.crud.stats import STATS_TABLES
+from app.db import engine
+from app.query_counter import count_queries
+from tests.conftest import create_board, create_records, create_users
+
+
+def table_counts():
+    with Session(engine) as session:
+        return {
+            field: session.exec(text(f'SELECT COUNT(*) FROM "{table}"')).one()[0]
+            for field, table in STATS_TABLES.items()
+        }
+
+
+def assert_counters_match(client):
+    counts = table_counts()
+    with count_queries() as queries:
+        stats = client.get("/stats").json()
+    assert queries.count == 1
+    assert stats == counts
+    assert client.get("/users/active").json() == counts["users"]
+    assert client.get("/kpis/active").json() == counts["kpis"]
+    assert client.get("/boards/count/").json() == counts["boards"]
+
+
+def test_counters_follow_inserts_and_cascading_deletes(client, references):
+    assert_counters_match(client)
+    owner, member = create_users(2)
+    board = create_board(client, references, [owner, member], kpis=3)
+    create_records(
+        client,
+        [(kpi_id, 1, "2024-01-01T00:00:00") for kpi_id in board["kpi_ids"]],
+    )
+    assert_counters_match(client)
+
+    assert client.delete(f"/kpis/{board['kpi_ids'][0]}").status_code == 200
+    assert_counters_match(client)
+    # Borra en cascada catálogos, KPIs y registros.
+    assert client.delete(f"/boards/{board['id']}").status_code == 204
+    assert_counters_match(client)
@@ -0,0 +1,51 @@
+from app.query_counter import count_queries
+from tests.conftest import create_board, create_users
+
+
+def conditional_get(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_not_modified_until_a_write(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id])
+
+    response = client.get("/boards/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    with count_queries() as queries:
+        response = conditional_get(client, "/boards/", etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    # Solo las versiones: no se consultan las filas.
+    assert queries.count == 1
+    # Varios candidatos, con y sin el prefijo débil.
+    assert conditional_get(client, "/boards/", f'"x", {etag[2:]}').status_code == 304
+    assert conditional_get(client, "/boards/", "*").status_code == 304
+
+    # Escribir en una de las tablas de la respuesta cambia el ETag.
+    response = client.post(
+        f"/boards/{board['id']}/catalogs/", json={"name": "Otro catálogo"}
+    )
+    assert response.status_code == 201, response.text
+    response = conditional_get(client, "/boards/", etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_unrelated_writes_keep_the_etag(client, references):
+    etag = client.get("/colors/").headers["ETag"]
+    create_users(1)
+    assert conditional_get(client, "/colors/", etag).status_code == 304
+
+    response = client.post(
+        "/colors/",
+        json={"name": "Gris", "description": "Gris", "abbrev": "tmp-grey"},
+    )
+    assert response.status_code == 201, response.text
+    assert conditional_get(client, "/colors/", etag).status_code == 200
+    assert client.delete(f"/colors/{response.json()['id']}").status_code == 204
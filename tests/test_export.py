@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.crud import records as crud_records
+from tests.conftest import create_board, create_records, create_users
+
+
+@pytest.fixture
+def kpi(client, references, monkeypatch):
+    # Varias lecturas del cursor por exportación.
+    monkeypatch.setattr(crud_records, "EXPORT_FETCH_SIZE", 2)
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    ids = create_records(
+        client,
+        [
+            (kpi_id, "1.50", "2024-01-01T00:00:00"),
+            (kpi_id, "2", "2024-01-01T00:00:00"),
+            (kpi_id, "-3.25", "2024-01-02T00:00:00.500000"),
+            (kpi_id, "4", "2024-01-03T00:00:00"),
+            (kpi_id, "5", "2024-01-04T00:00:00"),
+        ],
+    )
+    return kpi_id, ids
+
+
+def test_ndjson_export(client, kpi):
+    kpi_id, ids = kpi
+    response = client.get(f"/kpis/{kpi_id}/records/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == (
+        f'attachment; filename="kpi_{kpi_id}_records.ndjson"'
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # El mismo formato que GET /kpis/{kpi_id}/records.
+    listed = client.get(f"/kpis/{kpi_id}/records").json()
+    assert [line["value"] for line in lines] == [record["value"] for record in listed]
+    assert [line["id"] for line in lines] == ids
+    assert lines[2] == {
+        "id": ids[2],
+        "kpi_id": kpi_id,
+        "value": "-3.2500000000",
+        "created_at": "2024-01-02T00:00:00.500000",
+    }
+
+
+def test_csv_export_with_range(client, kpi):
+    kpi_id, ids = kpi
+    response = client.get(
+        f"/kpis/{kpi_id}/records/export",
+        params={
+            "format": "csv",
+            "since": "2024-01-01T00:00:00",
+            "until": "2024-01-04T00:00:00",
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "kpi_id", "value", "created_at"]
+    assert [int(row[0]) for row in rows[1:]] == ids[:4]
+    assert rows[1][2:] == ["1.5000000000", "2024-01-01T00:00:00"]
+
+
+def test_export_of_unknown_kpi(client):
+    assert client.get("/kpis/999999/records/export").status_code == 404
@@ -0,0 +1,43 @@
+import pytest
+
+from app import fast_json
+from tests.conftest import create_board, create_records, create_users
+
+
+def get_both(client, monkeypatch, path, **params):
+    bodies = []
+    for enabled in (False, True):
+        monkeypatch.setattr(fast_json, "FAST_JSON", enabled)
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        bodies.append(response)
+    return bodies
+
+
+def test_records_match_the_standard_serializer(client, references, monkeypatch):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    create_records(
+        client,
+        [
+            (kpi_id, "1.50", "2024-01-01T10:00:00"),
+            (kpi_id, "-0.000001", "2024-01-01T10:00:00.123456"),
+            (kpi_id, "12345678.9", "2024-01-01T12:30:00+02:00"),
+            (kpi_id, "0", "2024-02-29T23:59:59.000001"),
+        ],
+    )
+
+    standard, fast = get_both(client, monkeypatch, f"/kpis/{kpi_id}/records", limit=3)
+    assert fast.content == standard.content
+    assert fast.headers["content-type"] == standard.headers["content-type"]
+    assert fast.headers["X-Next-Cursor"] == standard.headers["X-Next-Cursor"]
+    assert len(standard.json()) == 3
+
+
+@pytest.mark.parametrize("path", ["/users", "/kpis", "/boards/"])
+def test_listings_match_the_standard_serializer(client, references, monkeypatch, path):
+    create_board(client, references, create_users(2))
+
+    standard, fast = get_both(client, monkeypatch, path)
+    assert fast.content == standard.content
+    assert fast.headers.get("ETag") == standard.headers.get("ETag")
@@ -0,0 +1,100 @@
+import pytest
+from fastapi import HTTPException
+
+from app.formulas import compile_formula, get_compiled_formula, invalidate_formula
+from tests.conftest import create_board, create_records, create_users
+
+
+def test_compile_collects_referenced_kpis():
+    compiled = compile_formula("(kpi_3 - kpi_4) / kpi_4 * 100 + kpi_3")
+    assert compiled.kpi_ids == (3, 4)
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        "kpi_1.real",
+        "__import__('os')",
+        "open(kpi_1)",
+        "kpi_1.__class__",
+        "x + kpi_1",
+        "kpi_1 if kpi_2 else 0",
+        "[kpi_1]",
+        "kpi_1 + 'a'",
+        "round(kpi_1, ndigits=2)",
+        "abs(kpi_1, kpi_2)",
+        "2 + 3",
+        "kpi_1 +",
+    ],
+)
+def test_disallowed_formulas_are_rejected(formula):
+    with pytest.raises(HTTPException) as error:
+        compile_formula(formula)
+    assert error.value.status_code == 400
+
+
+def test_evaluation_is_elementwise():
+    compiled = compile_formula("(kpi_1 - kpi_2) / kpi_2 * 100")
+    assert compiled.evaluate({1: [110.0, 50.0], 2: [100.0, 50.0]}) == [10.0, 0.0]
+
+
+def test_invalid_values_become_none():
+    compiled = compile_formula("kpi_1 / kpi_2")
+    assert compiled.evaluate({1: [1.0, 1.0, None], 2: [0.0, 2.0, 1.0]}) == [
+        None,
+        0.5,
+        None,
+    ]
+
+
+def test_functions():
+    assert compile_formula("round(kpi_1, 2)").evaluate({1: [1.2345, 2.5]}) == [
+        1.23,
+        2.5,
+    ]
+    assert compile_formula("round(kpi_1)").evaluate({1: [1.6]}) == [2.0]
+    assert compile_formula("max(kpi_1, kpi_2, 0)").evaluate(
+        {1: [-1.0, 3.0], 2: [-2.0, 1.0]}
+    ) == [0.0, 3.0]
+    assert compile_formula("abs(-kpi_1)").evaluate({1: [-4.0]}) == [4.0]
+
+
+def test_huge_powers_do_not_hang():
+    assert compile_formula("kpi_1 * 10 ** 10 ** 10").evaluate({1: [1.0]}) == [None]
+
+
+def test_compiled_formulas_are_cached_until_invalidated():
+    first = get_compiled_formula(1, "kpi_2 * 2")
+    assert get_compiled_formula(1, "kpi_2 * 2") is first
+    invalidate_formula(1)
+    assert get_compiled_formula(1, "kpi_2 * 2") is not first
+
+
+def test_formula_series(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=2)
+    first, second = board["kpi_ids"]
+    create_records(
+        client,
+        [
+            (first, 10, "2024-01-01T10:30:00"),
+            (first, 20, "2024-01-01T10:45:00"),
+            (second, 4, "2024-01-01T10:30:00"),
+            # Sin datos del segundo KPI en este intervalo: no se evalúa.
+            (first, 1, "2024-01-01T11:30:00"),
+        ],
+    )
+    kpi = {
+        "name": "Derivado",
+        "formula": f"round(kpi_{first} / kpi_{second}, 1)",
+        "color_schema": references["color"],
+        "chart_type": references["chart"],
+    }
+    response = client.post(f"/catalogs/{board['catalog_id']}/kpis", json=kpi)
+    assert response.status_code == 201, response.text
+    derived = response.json()["id"]
+    series = client.get(f"/kpis/{derived}/formula/series").json()
+    assert series == [{"bucket": "2024-01-01T10:00:00", "value": 3.8}]
+
+    response = client.put(f"/kpis/{derived}", json={**kpi, "formula": "kpi_1.real"})
+    assert response.status_code == 400
@@ -0,0 +1,36 @@
+import io
+
+from app import importer
+from app.db import engine
+from tests.conftest import create_board, create_users
+
+
+def records_counter(connection) -> int:
+    return connection.exec_driver_sql(
+        "SELECT rows FROM tablecounter WHERE name = 'records'"
+    ).scalar()
+
+
+def test_import_keeps_counter_without_schema_changes(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    lines = ["kpi_id,created_at,value"]
+    lines += [f"{kpi_id},2024-01-01T00:{minute:02d}:00,{minute}" for minute in range(5)]
+    lines.append("999999,2024-01-01T00:00:00,1")
+
+    with importer.import_connection() as connection:
+        before = records_counter(connection)
+        schema = connection.exec_driver_sql("PRAGMA schema_version").scalar()
+        key, chunks = importer.read_records(
+            io.BytesIO("\n".join(lines).encode()), chunk_rows=2
+        )
+        progress = list(importer.import_records(key, chunks, connection))
+
+        assert progress[-1]["created"] == 5
+        assert progress[-1]["failed"] == 1
+        assert records_counter(connection) == before + 5
+        assert connection.exec_driver_sql("PRAGMA schema_version").scalar() == schema
+
+    with engine.connect() as connection:
+        count = connection.exec_driver_sql("SELECT COUNT(*) FROM records").scalar()
+        assert records_counter(connection) == count
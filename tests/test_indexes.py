@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import event, select
+
+from app.db import async_engine, engine
+from app.models.utils import Chart, Color, Icon
+from tests.conftest import create_board, create_users
+
+Statement = Tuple[str, tuple]
+
+# Tablas que no se deben recorrer completas en las consultas de las rutas.
+SCANNED_TABLES = tuple(
+    f"SCAN {table}" for table in ("records", "dboards", "kpi", "catalog")
+)
+
+
+@contextmanager
+def capture_selects() -> Iterator[List[Statement]]:
+    """
+    SELECT, UPDATE y DELETE ejecutados por los dos engines dentro del bloque.
+    """
+    statements: List[Statement] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb in ("SELECT", "UPDATE", "DELETE") and not many:
+            statements.append((statement, tuple(parameters or ())))
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plans(statements: List[Statement]) -> List[List[str]]:
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+            plans.append([row[3] for row in rows])
+    return plans
+
+
+def assert_uses_indexes(statements: List[Statement], *indexes: str) -> None:
+    plans = query_plans(statements)
+    details = [detail for plan in plans for detail in plan]
+    for plan, (statement, _) in zip(plans, statements):
+        for detail in plan:
+            assert not detail.startswith(SCANNED_TABLES), (
+                statement,
+                plan,
+            )
+    for index in indexes:
+        # "USING INDEX ix_..." o "USING COVERING INDEX ix_...".
+        assert any(
+            detail.startswith("SEARCH") and f" INDEX {index} " in detail
+            for detail in details
+        ), (index, details)
+
+
+def test_records_listing_uses_kpi_created_at_index(client, references):
+    board = create_board(client, references, create_users(1))
+    kpi_id = board["kpi_ids"][0]
+    for value in range(3):
+        client.post(f"/kpis/{kpi_id}/records", json={"value": value})
+
+    with capture_selects() as statements:
+        response = client.get(
+            f"/kpis/{kpi_id}/records",
+            params={"since": "2000-01-01T00:00:00", "limit": 2},
+        )
+        assert response.status_code == 200
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get(f"/kpis/{kpi_id}/records", params={"cursor": cursor})
+        assert response.status_code == 200
+    assert_uses_indexes(statements, "ix_records_kpi_id_created_at")
+
+
+def test_board_listing_uses_membership_indexes(client, references):
+    (user_id,) = create_users(1)
+    create_board(client, references, [user_id])
+
+    with capture_selects() as statements:
+        assert client.get(f"/users/{user_id}/boards").status_code == 200
+    assert_uses_indexes(
+        statements,
+        "ix_dboards_user_id_board_id",
+        "ix_dboards_board_id_user_id",
+        "ix_catalog_board_id",
+    )
+
+
+def test_dashboard_tree_uses_indexes(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=2)
+    client.post(f"/kpis/{board['kpi_ids'][0]}/records", json={"value": 1})
+
+    with capture_selects() as statements:
+        response = client.get(f"/users/{user_id}/dashboards/tree")
+        assert response.status_code == 200
+    assert_uses_indexes(
+        statements,
+        "ix_dashboard_user_id",
+        "ix_dboards_user_id_board_id",
+        "ix_catalog_board_id",
+        "ix_kpi_catalog_id_position_index",
+        "ix_records_kpi_id_created_at",
+    )
+
+
+def test_catalog_listings_use_indexes(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=2)
+
+    with capture_selects() as statements:
+        response = client.get(f"/catalogs/boards/{board['id']}/")
+        assert response.status_code == 200, response.text
+    assert_uses_indexes(statements, "ix_catalog_board_id")
+
+    with capture_selects() as statements:
+        response = client.get(f"/catalogs/{board['catalog_id']}/kpis")
+        assert response.status_code == 200, response.text
+    assert_uses_indexes(
+        statements, "ix_kpi_catalog_id_position_index", "ix_records_kpi_id_created_at"
+    )
+
+
+def test_membership_changes_use_indexes(client, references):
+    owner, member = create_users(2)
+    board = create_board(client, references, [owner])
+
+    with capture_selects() as statements:
+        for change in ({"add": [str(member)]}, {"remove": [str(member)]}):
+            response = client.patch(f"/boards/{board['id']}/users", json=change)
+            assert response.status_code == 200, response.text
+    assert_uses_indexes(statements, "ix_dboards_board_id_user_id")
+
+
+def test_abbrev_lookups_use_indexes(references):
+    # Las rutas las resuelven desde `reference_cache`; el índice sirve a las
+    # consultas por `abbrev` hechas directamente sobre la base de datos.
+    statements = []
+    for model in (Color, Chart, Icon):
+        compiled = select(model.id).where(model.abbrev == "test").compile(engine)
+        statements.append((str(compiled), tuple(compiled.params.values())))
+    assert_uses_indexes(
+        statements, "ix_color_abbrev", "ix_chart_abbrev", "ix_icon_abbrev"
+    )
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from app import live, metrics
+
+
+def events(kpi_id: int, count: int):
+    return [
+        live.record_event(n, kpi_id, Decimal(n), datetime(2024, 1, 1))
+        for n in range(count)
+    ]
+
+
+def dropped() -> float:
+    return metrics.live_relay_dropped._values.get((), 0)
+
+
+def test_relay_delivers_to_other_workers(tmp_path):
+    async def scenario():
+        sender = live.SocketRelay(str(tmp_path), live.Broadcaster(), name="a")
+        receiver = live.SocketRelay(str(tmp_path), live.Broadcaster(), name="b")
+        receiver.start()
+        sender.start()
+        subscription = receiver.broadcaster.subscribe([1], 100)
+        try:
+            sender.send(events(1, 3) + events(2, 3))
+            received = await subscription.get(1)
+        finally:
+            sender.stop()
+            receiver.stop()
+        return received
+
+    received = asyncio.run(scenario())
+    assert [(event["kpi_id"], event["id"]) for event in received] == [
+        (1, 0),
+        (1, 1),
+        (1, 2),
+    ]
+
+
+def test_relay_sends_resync_after_dropping_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_PEER_REFRESH", 0.05)
+
+    async def scenario():
+        sender = live.SocketRelay(str(tmp_path), live.Broadcaster(), name="a")
+        receiver = live.SocketRelay(str(tmp_path), live.Broadcaster(), name="b")
+        receiver.start()
+        sender.start()
+        subscription = receiver.broadcaster.subscribe([1], 100)
+        other = receiver.broadcaster.subscribe([2], 100)
+        loop = asyncio.get_running_loop()
+        try:
+            # El receptor deja de leer hasta que su cola de datagramas se llena.
+            loop.remove_reader(receiver._socket.fileno())
+            before = dropped()
+            for _ in range(1000):
+                sender.send(events(1, 1))
+                if dropped() > before:
+                    break
+            lost = dropped() - before
+            loop.add_reader(receiver._socket.fileno(), receiver._receive)
+
+            # Los eventos que sí llegaron, y después el aviso de resync.
+            received = []
+            while True:
+                batch = await subscription.get(1)
+                if batch is None:
+                    break
+                assert batch, "no llegó el resync"
+                received += batch
+            other_events = await other.get(0.2)
+        finally:
+            sender.stop()
+            receiver.stop()
+        return lost, received, other_events
+
+    lost, received, other_events = asyncio.run(scenario())
+    assert lost > 0
+    assert received
+    # El resync solo afecta a los KPIs de los eventos perdidos.
+    assert other_events == []
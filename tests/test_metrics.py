@@ -0,0 +1,61 @@
+from typing import Dict
+
+from app.metrics import METRICS_CONTENT_TYPE, Histogram
+from tests.conftest import create_board, create_users
+
+
+def scrape(client) -> Dict[str, float]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == METRICS_CONTENT_TYPE
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_requests_are_measured_by_route_template(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id])
+    route = 'method="GET",route="/boards/{board_id}"'
+
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get(f"/boards/{board['id']}").status_code == 200
+    assert client.get("/boards/999999").status_code == 404
+    client.get("/no/existe")
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta(f'http_requests_total{{{route},status="200"}}') == 3
+    assert delta(f'http_requests_total{{{route},status="404"}}') == 1
+    assert (
+        delta('http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    )
+    assert delta(f"http_request_duration_seconds_count{{{route}}}") == 4
+    assert delta(f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == 4
+    # Cada petición consulta la base de datos al menos una vez.
+    assert delta(f"http_request_sql_queries_sum{{{route}}}") >= 4
+    assert delta(f"http_request_db_seconds_count{{{route}}}") == 4
+    # Solo cuenta como en curso la propia petición a /metrics.
+    assert after['http_requests_in_progress{method="GET"}'] == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Prueba.", (0.1, 1))
+    labels = (("route", "/x"),)
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(labels, value)
+    assert histogram.render() == [
+        "# HELP test_seconds Prueba.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/x",le="0.1"} 2',
+        'test_seconds_bucket{route="/x",le="1.0"} 3',
+        'test_seconds_bucket{route="/x",le="+Inf"} 4',
+        'test_seconds_sum{route="/x"} 3.65',
+        'test_seconds_count{route="/x"} 4',
+    ]
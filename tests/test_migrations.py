@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+
+from app.migrations import MIGRATIONS, upgrade
+from tests.conftest import create_board, create_users
+
+
+@pytest.fixture
+def empty_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_applies_every_migration(empty_engine):
+    assert upgrade(empty_engine) == MIGRATIONS[-1][0]
+    # Sin migraciones pendientes, no hace nada.
+    assert upgrade(empty_engine) == MIGRATIONS[-1][0]
+
+
+def test_duplicate_memberships_are_removed(empty_engine):
+    upgrade(empty_engine)
+    user_id = uuid.uuid4().hex
+    with empty_engine.begin() as connection:
+        # Una base de datos anterior a la migración 6.
+        connection.exec_driver_sql("DROP INDEX ix_dboards_board_id_user_id")
+        connection.exec_driver_sql("PRAGMA user_version = 5")
+        connection.exec_driver_sql('INSERT INTO "user" (id) VALUES (?)', (user_id,))
+        connection.exec_driver_sql("INSERT INTO board (name) VALUES ('Board')")
+        for _ in range(3):
+            connection.exec_driver_sql(
+                "INSERT INTO dboards (board_id, user_id) VALUES (1, ?)", (user_id,)
+            )
+
+    upgrade(empty_engine)
+    with empty_engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT id FROM dboards").all() == [(1,)]
+        with pytest.raises(IntegrityError):
+            connection.exec_driver_sql(
+                "INSERT INTO dboards (board_id, user_id) VALUES (1, ?)", (user_id,)
+            )
+
+
+def test_adding_an_existing_member_is_ignored(client, references):
+    owner, member = create_users(2)
+    board = create_board(client, references, [owner])
+    for _ in range(2):
+        response = client.patch(
+            f"/boards/{board['id']}/users", json={"add": [str(member)]}
+        )
+        assert response.status_code == 200, response.text
+
+    users = client.get(f"/boards/{board['id']}").json()["users"]
+    assert sorted(user["id"] for user in users) == sorted([str(owner), str(member)])
@@ -0,0 +1,59 @@
+from tests.conftest import create_board, create_records, create_users
+
+
+def test_cursor_pages_cover_duplicate_timestamps(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    # Varios registros por fecha: el cursor desempata por id.
+    created = create_records(
+        client,
+        [(kpi_id, n, f"2024-01-01T10:0{n // 3}:00") for n in range(8)],
+    )
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/kpis/{kpi_id}/records", params=params)
+        assert response.status_code == 200, response.text
+        pages.append([record["id"] for record in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [2, 2, 2, 2]
+    assert [record_id for page in pages for record_id in page] == created
+
+
+def test_time_range_filters(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    first, second, third = create_records(
+        client,
+        [
+            (kpi_id, 1, "2024-01-01T00:00:00"),
+            (kpi_id, 2, "2024-01-02T00:00:00"),
+            (kpi_id, 3, "2024-01-03T00:00:00"),
+        ],
+    )
+
+    response = client.get(
+        f"/kpis/{kpi_id}/records",
+        params={"since": "2024-01-02T00:00:00", "until": "2024-01-03T00:00:00"},
+    )
+    assert [record["id"] for record in response.json()] == [second]
+    assert "X-Next-Cursor" not in response.headers
+    # Con zona horaria: se convierte a UTC.
+    response = client.get(
+        f"/kpis/{kpi_id}/records", params={"since": "2024-01-02T01:00:00+02:00"}
+    )
+    assert [record["id"] for record in response.json()] == [second, third]
+
+
+def test_invalid_cursor(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    response = client.get(f"/kpis/{kpi_id}/records", params={"cursor": "no-válido"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Cursor inválido"}
@@ -0,0 +1,122 @@
+import threading
+
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models.kpis import Kpi
+from app.positions import POSITION_GAP, plan_positions, rebalance
+from tests.conftest import create_board, create_users
+
+GAP = POSITION_GAP
+
+
+def test_ordered_positions_are_kept():
+    assert plan_positions([GAP, 2 * GAP, 3 * GAP]) == [GAP, 2 * GAP, 3 * GAP]
+
+
+def test_moving_one_element_changes_one_position():
+    # El último pasa al principio: el resto es la subsecuencia creciente.
+    assert plan_positions([4 * GAP, GAP, 2 * GAP, 3 * GAP]) == [
+        GAP // 2,
+        GAP,
+        2 * GAP,
+        3 * GAP,
+    ]
+    # Al final: toma el siguiente hueco después del último.
+    assert plan_positions([2 * GAP, 3 * GAP, GAP]) == [2 * GAP, 3 * GAP, 4 * GAP]
+    # En medio: el punto medio entre sus nuevos vecinos.
+    assert plan_positions([GAP, 3 * GAP, 2 * GAP, 4 * GAP]) == [
+        GAP,
+        GAP + GAP // 2,
+        2 * GAP,
+        4 * GAP,
+    ]
+
+
+def test_longest_increasing_run_is_kept():
+    planned = plan_positions([5 * GAP, 6 * GAP, GAP, 2 * GAP, 3 * GAP])
+    assert planned[2:] == [GAP, 2 * GAP, 3 * GAP]
+    assert planned == sorted(planned)
+    assert len(set(planned)) == len(planned)
+
+
+def test_missing_positions_are_filled():
+    assert plan_positions([None, None]) == rebalance(2)
+    assert plan_positions([GAP, None, 2 * GAP]) == [GAP, GAP + GAP // 2, 2 * GAP]
+
+
+def test_exhausted_gap_renumbers_everything():
+    assert plan_positions([2, 1]) == rebalance(2)
+    assert plan_positions([10, 11, 12, 5]) == [10, 11, 12, 12 + GAP]
+    assert plan_positions([10, 12, 11, 13]) == rebalance(4)
+
+
+def positions(catalog_id: int):
+    with Session(engine) as session:
+        return session.exec(
+            select(Kpi.id, Kpi.position_index)
+            .where(Kpi.catalog_id == catalog_id)
+            .order_by(Kpi.position_index)
+        ).all()
+
+
+def test_reorder_endpoint(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=4)
+    catalog_id, kpi_ids = board["catalog_id"], board["kpi_ids"]
+    before = dict(positions(catalog_id))
+
+    order = kpi_ids[1:] + kpi_ids[:1]
+    response = client.put(f"/catalogs/{catalog_id}/kpis/order", json={"kpi_ids": order})
+    assert response.status_code == 200, response.text
+    assert [kpi["id"] for kpi in response.json()] == order
+    assert [kpi_id for kpi_id, _ in positions(catalog_id)] == order
+    after = dict(positions(catalog_id))
+    assert [kpi_id for kpi_id in kpi_ids if after[kpi_id] != before[kpi_id]] == [
+        kpi_ids[0]
+    ]
+
+    listed = client.get(f"/catalogs/{catalog_id}/kpis").json()
+    assert [kpi["id"] for kpi in listed] == order
+
+    response = client.put(
+        f"/catalogs/{catalog_id}/kpis/order", json={"kpi_ids": order[:-1]}
+    )
+    assert response.status_code == 400
+    response = client.put("/catalogs/999999/kpis/order", json={"kpi_ids": [1]})
+    assert response.status_code == 404
+
+
+def test_reorder_waits_for_concurrent_writes(client, references):
+    (user_id,) = create_users(1)
+    board = create_board(client, references, [user_id], kpis=3)
+    catalog_id, kpi_ids = board["catalog_id"], board["kpi_ids"]
+    first, second, third = kpi_ids
+    order = [second, first, third]
+    responses = []
+
+    with engine.connect() as connection:
+        # Otra escritura en curso sobre el catálogo: mueve el primer KPI al
+        # final. Planificado con las posiciones anteriores, el nuevo orden
+        # solo movería el segundo y el primero quedaría al final.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        connection.exec_driver_sql(
+            "UPDATE kpi SET position_index = ? WHERE id = ?", (5 * GAP, first)
+        )
+        reorder = threading.Thread(
+            target=lambda: responses.append(
+                client.put(
+                    f"/catalogs/{catalog_id}/kpis/order", json={"kpi_ids": order}
+                )
+            )
+        )
+        reorder.start()
+        reorder.join(0.3)
+        # No ha leído las posiciones mientras la otra escritura seguía abierta.
+        assert reorder.is_alive()
+        connection.exec_driver_sql("COMMIT")
+    reorder.join()
+
+    (response,) = responses
+    assert response.status_code == 200, response.text
+    assert [kpi_id for kpi_id, _ in positions(catalog_id)] == order
@@ -0,0 +1,51 @@
+from app.query_counter import count_queries
+from tests.conftest import create_board, create_users
+
+# El número de consultas de cada listado no debe depender de cuántas filas
+# retorna: se compara un resultado de una fila con uno de varias.
+BOARDS = 5
+
+
+def count(client, path: str) -> int:
+    with count_queries() as queries:
+        response = client.get(path)
+        assert response.status_code == 200, response.text
+    return queries.count
+
+
+def user_with_boards(client, references, boards: int, kpis: int):
+    user_id, *others = create_users(3)
+    for _ in range(boards):
+        board = create_board(client, references, [user_id, *others], kpis=kpis)
+        for kpi_id in board["kpi_ids"]:
+            client.post(f"/kpis/{kpi_id}/records", json={"value": 1})
+    return user_id, board
+
+
+def test_board_listing_queries_do_not_depend_on_boards(client, references):
+    one, _ = user_with_boards(client, references, boards=1, kpis=1)
+    many, _ = user_with_boards(client, references, boards=BOARDS, kpis=3)
+
+    assert count(client, f"/users/{one}/boards") == count(
+        client, f"/users/{many}/boards"
+    )
+
+
+def test_dashboard_tree_queries_do_not_depend_on_boards(client, references):
+    one, _ = user_with_boards(client, references, boards=1, kpis=1)
+    many, _ = user_with_boards(client, references, boards=BOARDS, kpis=3)
+
+    # La primera petición recarga la caché de colores, gráficos e iconos.
+    count(client, f"/users/{one}/dashboards/tree")
+    queries = count(client, f"/users/{one}/dashboards/tree")
+    assert queries == count(client, f"/users/{many}/dashboards/tree")
+    assert queries <= 5
+
+
+def test_catalog_kpis_queries_do_not_depend_on_kpis(client, references):
+    _, one = user_with_boards(client, references, boards=1, kpis=1)
+    _, many = user_with_boards(client, references, boards=1, kpis=BOARDS)
+
+    assert count(client, f"/catalogs/{one['catalog_id']}/kpis") == count(
+        client, f"/catalogs/{many['catalog_id']}/kpis"
+    )
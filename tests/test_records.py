@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from app import live
+from app.db import engine
+from app.models.records import Records
+from app.models.rollups import RecordRollupDaily, RecordRollupHourly
+from tests.conftest import create_board, create_records, create_users
+
+
+def test_deleting_a_compacted_record_removes_all_its_samples(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    first, *others, _ = create_records(
+        client,
+        [
+            (kpi_id, 1, "2024-01-01T10:00:00"),
+            (kpi_id, 2, "2024-01-01T10:01:00"),
+            (kpi_id, 6, "2024-01-01T10:02:00"),
+            # Otro registro en la misma hora.
+            (kpi_id, 10, "2024-01-01T10:03:00"),
+        ],
+    )
+
+    # Lo que haría la retención: un registro con el promedio de tres.
+    with Session(engine) as session:
+        for record_id in others:
+            session.delete(session.get(Records, record_id))
+        record = session.get(Records, first)
+        record.value, record.sample_count = 3, 3
+        session.commit()
+
+    assert client.delete(f"/records/{first}").status_code == 204
+    with Session(engine) as session:
+        for model in (RecordRollupHourly, RecordRollupDaily):
+            rollup = session.exec(select(model).where(model.kpi_id == kpi_id)).one()
+            assert (rollup.count, rollup.sum) == (1, 10)
+
+
+def test_live_event_matches_records_listing(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    create_records(client, [(kpi_id, "1.5", "2024-01-01T10:00:00")])
+
+    (listed,) = client.get(f"/kpis/{kpi_id}/records").json()
+    event = live.record_event(
+        listed["id"],
+        kpi_id,
+        listed["value"],
+        datetime.fromisoformat(listed["created_at"]),
+    )
+    assert event.keys() == listed.keys()
+    assert event["sample_count"] == listed["sample_count"]
@@ -0,0 +1,48 @@
+from sqlmodel import Session
+
+from app.db import engine
+from app.models.utils import Color
+from app.query_counter import count_queries
+from tests.conftest import create_board, create_users
+
+
+def test_listing_reuses_etag_version(client, references):
+    client.get("/colors/")
+    with count_queries() as queries:
+        response = client.get("/colors/")
+    assert response.status_code == 200
+    # Solo la versión de la tabla, leída una vez para el ETag y la caché.
+    assert queries.count == 1
+
+
+def test_writes_from_other_processes_are_seen(client, references):
+    client.get("/colors/")
+    # Sin pasar por la API, como haría otro worker.
+    with Session(engine) as session:
+        session.add(Color(name="Rojo", description="Rojo", abbrev="test-red"))
+        session.commit()
+
+    abbrevs = {color["abbrev"] for color in client.get("/colors/").json()}
+    assert "test-red" in abbrevs
+    duplicate = {"name": "Rojo", "description": "Rojo", "abbrev": "test-red"}
+    assert client.post("/colors/", json=duplicate).status_code == 400
+
+
+def test_dashboard_tree_uses_cached_references(client, references):
+    (user_id,) = create_users(1)
+    create_board(client, references, [user_id])
+
+    tree = client.get(f"/users/{user_id}/dashboards/tree").json()
+    board = tree["boards"][0]
+    kpi = board["catalogs"][0]["kpis"][0]
+    assert board["icon"]["abbrev"] == "test-panel"
+    assert kpi["color"]["abbrev"] == "test-green"
+    assert kpi["chart"]["abbrev"] == "test-line"
+
+    icon = {"name": "Panel", "description": "Panel", "abbrev": "test-panel-2"}
+    client.put(f"/{references['icon']}", json=icon)
+    try:
+        tree = client.get(f"/users/{user_id}/dashboards/tree").json()
+        assert tree["boards"][0]["icon"]["abbrev"] == "test-panel-2"
+    finally:
+        client.put(f"/{references['icon']}", json={**icon, "abbrev": "test-panel"})
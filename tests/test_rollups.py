@@ -0,0 +1,64 @@
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models.rollups import RecordRollupDaily, RecordRollupHourly
+from app.rollups import rebuild_rollups
+from tests.conftest import create_board, create_records, create_users
+
+
+def rollups(kpi_id: int):
+    with Session(engine) as session:
+        return {
+            model.__name__: [
+                (
+                    rollup.bucket.isoformat(),
+                    rollup.count,
+                    rollup.sum,
+                    rollup.min,
+                    rollup.max,
+                )
+                for rollup in session.exec(
+                    select(model).where(model.kpi_id == kpi_id).order_by(model.bucket)
+                )
+            ]
+            for model in (RecordRollupHourly, RecordRollupDaily)
+        }
+
+
+def test_rollups_follow_inserts_and_deletes(client, references):
+    (user_id,) = create_users(1)
+    (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+    low, middle, high, other = create_records(
+        client,
+        [
+            (kpi_id, 2, "2024-01-01T10:05:00"),
+            (kpi_id, 5, "2024-01-01T10:10:00"),
+            (kpi_id, 9, "2024-01-01T10:55:00"),
+            (kpi_id, 1, "2024-01-01T11:00:00"),
+        ],
+    )
+    assert rollups(kpi_id) == {
+        "RecordRollupHourly": [
+            ("2024-01-01T10:00:00", 3, 16, 2, 9),
+            ("2024-01-01T11:00:00", 1, 1, 1, 1),
+        ],
+        "RecordRollupDaily": [("2024-01-01T00:00:00", 4, 17, 1, 9)],
+    }
+
+    # Un valor intermedio: no cambian el mínimo ni el máximo.
+    assert client.delete(f"/records/{middle}").status_code == 204
+    # El máximo: se recalcula desde los registros del intervalo.
+    assert client.delete(f"/records/{high}").status_code == 204
+    # El único registro de su hora: desaparece el intervalo.
+    assert client.delete(f"/records/{other}").status_code == 204
+    assert rollups(kpi_id) == {
+        "RecordRollupHourly": [("2024-01-01T10:00:00", 1, 2, 2, 2)],
+        "RecordRollupDaily": [("2024-01-01T00:00:00", 1, 2, 2, 2)],
+    }
+
+    create_records(client, [(kpi_id, 7, "2024-01-01T10:30:00")])
+    incremental = rollups(kpi_id)
+    with Session(engine) as session:
+        rebuild_rollups(session, kpi_id=kpi_id)
+    assert rollups(kpi_id) == incremental
+    assert incremental["RecordRollupHourly"] == [("2024-01-01T10:00:00", 2, 9, 2, 7)]
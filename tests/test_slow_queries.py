@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.db import async_engine, engine
+from app.main import app
+from app.routers import metrics as metrics_router
+from app.slow_queries import (
+    SlowQueryLog,
+    SlowQueryMiddleware,
+    fingerprint,
+    normalize_sql,
+    parameter_shape,
+)
+from tests.conftest import create_board, create_users
+
+
+def test_normalize_groups_executions_of_the_same_query():
+    first = normalize_sql("SELECT * FROM kpi WHERE id IN (?, ?, ?) AND name = 'a'")
+    second = normalize_sql("SELECT *\n  FROM kpi WHERE id IN (?,?) AND name = 'b''c'")
+    assert first == second == "SELECT * FROM kpi WHERE id IN (?, ...) AND name = ?"
+    assert fingerprint(first) == fingerprint(second)
+    assert normalize_sql("INSERT INTO t VALUES (?, ?), (?, ?), (?, ?)") == (
+        "INSERT INTO t VALUES (?, ...), ..."
+    )
+    assert normalize_sql("SELECT kpi_1 FROM t LIMIT 10") == (
+        "SELECT kpi_1 FROM t LIMIT ?"
+    )
+
+
+def test_parameter_shape():
+    assert parameter_shape((1, 2, "a", 1.5), False) == "(int x2, str, float)"
+    assert parameter_shape([(1, 2.0)] * 3, True) == "3 x (int, float)"
+    assert parameter_shape({"id": 1}, False) == "{id: int}"
+
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    # Umbral 0: todas las sentencias cuentan como lentas.
+    log = SlowQueryLog(0, 100)
+    monkeypatch.setattr(metrics_router, "slow_query_log", log)
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", log.before_cursor_execute)
+        event.listen(target, "after_cursor_execute", log.after_cursor_execute)
+    yield log
+    for target in engines:
+        event.remove(target, "before_cursor_execute", log.before_cursor_execute)
+        event.remove(target, "after_cursor_execute", log.after_cursor_execute)
+
+
+def test_slow_queries_are_logged_with_route_and_plan(references, slow_log, caplog):
+    (user_id,) = create_users(1)
+    with TestClient(SlowQueryMiddleware(app)) as client:
+        board = create_board(client, references, [user_id])
+        slow_log.reset()
+        with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+            for _ in range(2):
+                assert client.get(f"/catalogs/boards/{board['id']}/").status_code == 200
+        report = client.get("/metrics/slow-queries").json()
+
+    (entry,) = [entry for entry in report if "FROM catalog" in entry["sql"]]
+    assert entry["count"] == 2
+    assert entry["routes"] == {"GET /catalogs/boards/{board_id}/": 2}
+    assert entry["parameters"] == "(int)"
+    assert any("ix_catalog_board_id" in line for line in entry["plan"])
+    assert entry["max_ms"] <= entry["total_ms"]
+    # Completa la primera vez; la segunda se resume (2 es potencia de 2).
+    messages = [
+        r.getMessage() for r in caplog.records if entry["fingerprint"] in r.getMessage()
+    ]
+    assert len(messages) == 2
+    assert "Plan:" in messages[0] and "2 veces" in messages[1]
+
+
+def test_entries_are_bounded():
+    log = SlowQueryLog(0, 1)
+    for table in ("a", "b"):
+        log.record(None, f"BEGIN /* {table} */", (), False, 0.01)
+    assert len(log.report()) == 1
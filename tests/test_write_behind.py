@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import write_behind
+from app.main import app
+from app.query_counter import QueryCountMiddleware, count_queries
+from tests.conftest import create_board, create_users
+
+
+@pytest.fixture
+def group_commit(monkeypatch):
+    monkeypatch.setattr(write_behind, "RECORD_GROUP_COMMIT", True)
+    # Un intervalo largo para que las dos peticiones caigan en el mismo lote.
+    monkeypatch.setattr(write_behind, "RECORD_GROUP_COMMIT_MS", 200)
+
+
+def test_unknown_kpi_gets_404_without_failing_the_batch(group_commit, references):
+    with TestClient(app) as client:
+        (user_id,) = create_users(1)
+        board = create_board(client, references, [user_id])
+        (kpi_id,) = board["kpi_ids"]
+        record = {"value": "1.5", "created_at": "2024-01-01T00:00:00"}
+
+        async def post(path):
+            return await asyncio.to_thread(client.post, path, json=record)
+
+        async def scenario():
+            return await asyncio.gather(
+                post(f"/kpis/{kpi_id}/records"), post("/kpis/999999/records")
+            )
+
+        created, missing = asyncio.run(scenario())
+
+    assert created.status_code == 201, created.text
+    assert created.json()["kpi_id"] == kpi_id
+    assert missing.status_code == 404
+    assert missing.json() == {"detail": "KPI no encontrado"}
+
+
+def test_writer_survives_lifespan_restarts(group_commit, references):
+    (user_id,) = create_users(1)
+    record = {"value": "2", "created_at": "2024-01-01T00:00:00"}
+    for _ in range(2):
+        with TestClient(app) as client:
+            board = create_board(client, references, [user_id])
+            response = client.post(f"/kpis/{board['kpi_ids'][0]}/records", json=record)
+            assert response.status_code == 201, response.text
+        assert write_behind.record_writer is None
+
+
+def test_flushes_are_not_counted_in_requests(group_commit, references):
+    (user_id,) = create_users(1)
+    record = {"value": "3", "created_at": "2024-01-01T00:00:00"}
+    with TestClient(QueryCountMiddleware(app)) as client:
+        (kpi_id,) = create_board(client, references, [user_id])["kpi_ids"]
+        with count_queries() as first:
+            response = client.post(f"/kpis/{kpi_id}/records", json=record)
+        first_count = first.count
+        second = client.post(f"/kpis/{kpi_id}/records", json=record)
+
+    assert response.status_code == second.status_code == 201
+    # La petición no consulta nada: el lote lo escribe la tarea del escritor.
+    assert response.headers["X-Query-Count"] == "0"
+    assert second.headers["X-Query-Count"] == "0"
+    # Ni el lote de la segunda petición se cuenta en la primera.
+    assert first.count == first_count == 0